@@ -0,0 +1,299 @@
+# _kernels.py
+"""
+数值计算内核模块
+功能：技术指标和因子计算中的热点循环（numba加速，未安装numba时按纯Python执行）
+"""
+
+import numpy as np
+
+from ..core._njit import njit, prange
+
+
+@njit(cache=True)
+def return_moments(close, periods):
+    """
+    一次性计算多个窗口的日收益率统计量
+
+    收益率定义与 close.pct_change().iloc[-period:].dropna() 一致，
+    方差为样本方差，偏度/峰度采用与pandas相同的无偏修正公式。
+
+    Args:
+        close: 收盘价数组（float64）
+        periods: 窗口长度数组（int64）
+
+    Returns:
+        np.ndarray: shape为 (len(periods), 5)，每行为 [样本数, 均值, 方差, 偏度, 峰度]
+    """
+    n = close.shape[0]
+    n_periods = periods.shape[0]
+    out = np.full((n_periods, 5), np.nan)
+
+    for j in range(n_periods):
+        start = max(n - periods[j], 1)
+
+        # 单遍在线算法（Welford，扩展到三、四阶中心矩），一次扫描窗口得到全部统计量
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        m3 = 0.0
+        m4 = 0.0
+        for i in range(start, n):
+            r = close[i] / close[i - 1] - 1.0
+            if np.isnan(r):
+                continue
+            prev_count = count
+            count += 1
+            delta = r - mean
+            delta_n = delta / count
+            delta_n2 = delta_n * delta_n
+            term1 = delta * delta_n * prev_count
+            mean += delta_n
+            m4 += (term1 * delta_n2 * (count * count - 3 * count + 3)
+                   + 6.0 * delta_n2 * m2 - 4.0 * delta_n * m3)
+            m3 += term1 * delta_n * (count - 2) - 3.0 * delta_n * m2
+            m2 += term1
+
+        out[j, 0] = count
+        if count == 0:
+            continue
+        out[j, 1] = mean
+        _fill_higher_moments(out, j, count, m2, m3, m4)
+
+    return out
+
+
+@njit(cache=True)
+def _fill_higher_moments(out, j, count, m2, m3, m4):
+    """根据中心矩之和写入方差、偏度、峰度（与pandas nanvar/nanskew/nankurt一致）"""
+    # 消除浮点误差
+    if abs(m2) < 1e-14:
+        m2 = 0.0
+    if abs(m3) < 1e-14:
+        m3 = 0.0
+
+    if count >= 2:
+        out[j, 2] = m2 / (count - 1)
+
+    if count >= 3:
+        if m2 == 0.0:
+            out[j, 3] = 0.0
+        else:
+            out[j, 3] = (count * (count - 1) ** 0.5 / (count - 2)) * (m3 / m2 ** 1.5)
+
+    if count >= 4:
+        adj = 3.0 * (count - 1) ** 2 / ((count - 2) * (count - 3))
+        numerator = count * (count + 1) * (count - 1) * m4
+        denominator = (count - 2) * (count - 3) * m2 * m2
+        if abs(numerator) < 1e-14:
+            numerator = 0.0
+        if abs(denominator) < 1e-14:
+            denominator = 0.0
+        if denominator == 0.0:
+            out[j, 4] = 0.0
+        else:
+            out[j, 4] = numerator / denominator - adj
+
+
+@njit(cache=True)
+def ema(x, alpha):
+    """
+    单遍指数移动平均，结果与 pandas ewm(alpha=alpha, adjust=False).mean() 一致
+
+    Args:
+        x: 输入数组（float64或float32，可含NaN）
+        alpha: 平滑系数，span=s 对应 2/(s+1)，com=c 对应 1/(1+c)
+
+    Returns:
+        np.ndarray: 与x等长、同dtype的EMA数组，首个有效值之前为NaN
+    """
+    n = x.shape[0]
+    out = np.empty_like(x)
+    if n == 0:
+        return out
+
+    old_wt_factor = 1.0 - alpha
+    weighted = x[0]
+    old_wt = 1.0
+    out[0] = weighted
+
+    for i in range(1, n):
+        cur = x[i]
+        is_obs = not np.isnan(cur)
+        if not np.isnan(weighted):
+            # 缺失值同样衰减旧权重（对应 ignore_na=False）
+            old_wt *= old_wt_factor
+            if is_obs:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif is_obs:
+            weighted = cur
+        out[i] = weighted
+
+    return out
+
+
+@njit(cache=True)
+def rolling_means(x, periods):
+    """
+    一次遍历同时计算多条简单移动平均线，结果与 pandas rolling(window=p).mean() 一致
+
+    Args:
+        x: 输入数组（float64或float32，可含NaN）
+        periods: 均线周期数组（int64）
+
+    Returns:
+        np.ndarray: shape为 (len(periods), len(x))、与x同dtype，第j行为周期periods[j]的均线；
+                    窗口未满或窗口内含NaN时为NaN
+    """
+    n = x.shape[0]
+    n_periods = periods.shape[0]
+    out = np.full((n_periods, n), np.nan, dtype=x.dtype)
+    # 累加和始终用float64，避免float32输入时长序列的累积误差
+    sums = np.zeros(n_periods)
+    nan_counts = np.zeros(n_periods, np.int64)
+
+    for i in range(n):
+        value = x[i]
+        value_is_nan = np.isnan(value)
+        for j in range(n_periods):
+            p = periods[j]
+            # 新值进入窗口
+            if value_is_nan:
+                nan_counts[j] += 1
+            else:
+                sums[j] += value
+            # 旧值移出窗口
+            if i >= p:
+                old = x[i - p]
+                if np.isnan(old):
+                    nan_counts[j] -= 1
+                else:
+                    sums[j] -= old
+            if i >= p - 1 and nan_counts[j] == 0:
+                out[j, i] = sums[j] / p
+
+    return out
+
+
+@njit(cache=True)
+def kdj_rsv(high, low, close, n):
+    """
+    一次遍历计算KDJ的RSV：单调队列维护窗口最高价/最低价，同一循环内算出RSV
+
+    窗口最值与 pandas rolling(window=n).max()/min() 一致（窗口未满或含NaN时为NaN），
+    RSV = 100 * (close - 最低价) / (最高价 - 最低价 + 1e-8)
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        n: 窗口长度
+
+    Returns:
+        np.ndarray: 与close等长、同dtype的RSV数组
+    """
+    size = close.shape[0]
+    rsv = np.full(size, np.nan, dtype=close.dtype)
+
+    # 单调队列（存下标）：最高价队列从头到尾递减，最低价队列递增，队头即窗口最值
+    max_q = np.empty(size, np.int64)
+    min_q = np.empty(size, np.int64)
+    max_head = 0
+    max_tail = 0
+    min_head = 0
+    min_tail = 0
+    high_nan = 0
+    low_nan = 0
+
+    for i in range(size):
+        h = high[i]
+        if np.isnan(h):
+            high_nan += 1
+        else:
+            while max_tail > max_head and high[max_q[max_tail - 1]] <= h:
+                max_tail -= 1
+            max_q[max_tail] = i
+            max_tail += 1
+
+        lo = low[i]
+        if np.isnan(lo):
+            low_nan += 1
+        else:
+            while min_tail > min_head and low[min_q[min_tail - 1]] >= lo:
+                min_tail -= 1
+            min_q[min_tail] = i
+            min_tail += 1
+
+        # 移出窗口的旧元素
+        if i >= n:
+            if np.isnan(high[i - n]):
+                high_nan -= 1
+            if np.isnan(low[i - n]):
+                low_nan -= 1
+        while max_head < max_tail and max_q[max_head] <= i - n:
+            max_head += 1
+        while min_head < min_tail and min_q[min_head] <= i - n:
+            min_head += 1
+
+        if i >= n - 1 and high_nan == 0 and low_nan == 0:
+            high_max = high[max_q[max_head]]
+            low_min = low[min_q[min_head]]
+            rsv[i] = 100 * (close[i] - low_min) / (high_max - low_min + 1e-8)
+
+    return rsv
+
+
+@njit(parallel=True, cache=True)
+def latest_macd(close, alpha_fast, alpha_slow, alpha_signal):
+    """
+    按股票并行计算最新一根K线的MACD，与 TechnicalIndicators.calculate_macd 的末行一致
+
+    Args:
+        close: 收盘价矩阵，shape为 (股票数, K线数)，K线数至少为1
+        alpha_fast: 快线EMA平滑系数
+        alpha_slow: 慢线EMA平滑系数
+        alpha_signal: 信号线EMA平滑系数
+
+    Returns:
+        np.ndarray: shape为 (3, 股票数)、与close同dtype，各行依次为DIF、DEA、MACD
+    """
+    n_symbols = close.shape[0]
+    out = np.empty((3, n_symbols), dtype=close.dtype)
+
+    for s in prange(n_symbols):
+        dif = ema(close[s], alpha_fast) - ema(close[s], alpha_slow)
+        dea = ema(dif, alpha_signal)
+        out[0, s] = dif[-1]
+        out[1, s] = dea[-1]
+        out[2, s] = (dif[-1] - dea[-1]) * 2
+
+    return out
+
+
+@njit(parallel=True, cache=True)
+def latest_kdj(high, low, close, n):
+    """
+    按股票并行计算最新一根K线的KDJ，与 TechnicalIndicators.calculate_kdj 的末行一致
+
+    Args:
+        high: 最高价矩阵，shape为 (股票数, K线数)，K线数至少为1
+        low: 最低价矩阵，shape同high
+        close: 收盘价矩阵，shape同high
+        n: RSV窗口长度
+
+    Returns:
+        np.ndarray: shape为 (3, 股票数)、与close同dtype，各行依次为K、D、J
+    """
+    n_symbols = close.shape[0]
+    out = np.empty((3, n_symbols), dtype=close.dtype)
+
+    for s in prange(n_symbols):
+        # com=2 对应 alpha=1/3
+        k = ema(kdj_rsv(high[s], low[s], close[s], n), 1.0 / 3)
+        d = ema(k, 1.0 / 3)
+        out[0, s] = k[-1]
+        out[1, s] = d[-1]
+        out[2, s] = 3 * k[-1] - 2 * d[-1]
+
+    return out
@@ -18,9 +18,24 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 from src.data.market_data import MarketDataManager
 from src.data.financial_data import FinancialDataManager
 from src.analysis.technical import TechnicalIndicators
+from src.analysis._kernels import return_moments
 
 warnings.filterwarnings('ignore')
 
+# 收益率统计类因子（夏普/方差/波动率/偏度/峰度）用到的全部窗口，由一次内核调用同时计算
+_MOMENT_PERIODS = np.array([10, 20, 60, 120], dtype=np.int64)
+
+
+def _last_window(series: pd.Series, period: int) -> np.ndarray:
+    """
+    取序列最后period个值组成的窗口（float64视图）
+    
+    因子只用到滚动统计量的最新值，对末端窗口直接求 mean/std(ddof=1)/sum，
+    与 rolling(window=period).xxx().iloc[-1] 结果一致（窗口内含NaN时同样为NaN），
+    无需先算出整条滚动序列
+    """
+    return series.to_numpy(dtype=np.float64)[-period:]
+
 
 class FactorCalculator:
     """多因子计算器：计算47个量化因子"""
@@ -41,6 +56,9 @@ class FactorCalculator:
         'sales_to_price_ratio'
     ]
     
+    # 因子名 -> 列索引（模块加载时确定，批量计算时按列直接写入ndarray）
+    FACTOR_INDEX = {name: idx for idx, name in enumerate(FACTOR_LIST)}
+    
     def __init__(self):
         """初始化因子计算器"""
         self.market_data_manager = MarketDataManager()
@@ -60,6 +78,27 @@ class FactorCalculator:
         Returns:
             Dict: 因子值字典，key为因子名，value为因子值
         """
+        values = self.calculate_all_factors_as_array(stock_code, end_date, lookback_days)
+        return dict(zip(self.FACTOR_LIST, values.tolist()))
+    
+    def calculate_all_factors_as_array(self, stock_code: str, end_date: str = None,
+                                       lookback_days: int = 250,
+                                       out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        计算所有因子，按FACTOR_LIST的列顺序写入ndarray
+        
+        Args:
+            stock_code: 股票代码
+            end_date: 截止日期，格式 'YYYYMMDD'，None表示使用当前日期
+            lookback_days: 回看天数（用于计算历史指标）
+            out: 预分配的输出数组（长度为因子数量），None则新建
+            
+        Returns:
+            np.ndarray: 因子值数组，第i个元素对应FACTOR_LIST[i]
+        """
+        if out is None:
+            out = np.empty(len(self.FACTOR_LIST), dtype=np.float64)
+        
         if end_date is None:
             end_date = datetime.now().strftime('%Y%m%d')
         
@@ -69,7 +108,8 @@ class FactorCalculator:
         
         if data is None or data.empty or len(data) < 120:
             # 如果数据不足，返回NaN
-            return {factor: np.nan for factor in self.FACTOR_LIST}
+            out.fill(np.nan)
+            return out
         
         # 获取财务数据
         financial_data = self.financial_data_manager.get_financial_data(stock_code, auto_download=False)
@@ -77,36 +117,38 @@ class FactorCalculator:
         # 获取市场数据（用于Beta等计算）
         market_data = self._get_market_index_data(end_date, lookback_days)
         
-        factors = {}
+        # 收益率统计量：所有窗口一次算完，供各统计类因子共用
+        moments = self._calculate_return_moments(data)
         
         # 计算所有因子
-        for factor_name in self.FACTOR_LIST:
+        for factor_name, col in self.FACTOR_INDEX.items():
             try:
-                factor_value = self._calculate_single_factor(factor_name, data, financial_data, market_data, end_date)
-                factors[factor_name] = factor_value if not pd.isna(factor_value) else 0.0
+                factor_value = self._calculate_single_factor(factor_name, data, financial_data, market_data,
+                                                             end_date, moments)
+                out[col] = factor_value if not pd.isna(factor_value) else 0.0
             except Exception as e:
                 # 如果计算失败，使用0.0作为默认值
-                factors[factor_name] = 0.0
+                out[col] = 0.0
                 # print(f"[警告] 计算因子 {factor_name} 失败: {e}")
         
-        return factors
+        return out
     
     def _calculate_single_factor(self, factor_name: str, data: pd.DataFrame,
                                  financial_data: Optional[Dict], market_data: Optional[pd.DataFrame],
-                                 end_date: str) -> float:
+                                 end_date: str, moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算单个因子"""
         if factor_name == 'momentum':
             return self._calculate_momentum(data, period=5)
         elif factor_name == 'beta':
             return self._calculate_beta(data, market_data)
         elif factor_name == 'sharpe_ratio_60':
-            return self._calculate_sharpe_ratio(data, period=60)
+            return self._calculate_sharpe_ratio(data, period=60, moments=moments)
         elif factor_name == 'sharpe_ratio_20':
-            return self._calculate_sharpe_ratio(data, period=20)
+            return self._calculate_sharpe_ratio(data, period=20, moments=moments)
         elif factor_name == 'Variance120':
-            return self._calculate_variance(data, period=120)
+            return self._calculate_variance(data, period=120, moments=moments)
         elif factor_name == 'Variance20':
-            return self._calculate_variance(data, period=20)
+            return self._calculate_variance(data, period=20, moments=moments)
         elif factor_name == 'natural_log_of_market_cap':
             return self._calculate_log_market_cap(data, financial_data)
         elif factor_name == 'cube_of_size':
@@ -126,17 +168,17 @@ class FactorCalculator:
         elif factor_name == 'intangible_asset_ratio':
             return self._calculate_intangible_asset_ratio(financial_data)
         elif factor_name == 'Kurtosis120':
-            return self._calculate_kurtosis(data, period=120)
+            return self._calculate_kurtosis(data, period=120, moments=moments)
         elif factor_name == 'Kurtosis60':
-            return self._calculate_kurtosis(data, period=60)
+            return self._calculate_kurtosis(data, period=60, moments=moments)
         elif factor_name == 'Kurtosis20':
-            return self._calculate_kurtosis(data, period=20)
+            return self._calculate_kurtosis(data, period=20, moments=moments)
         elif factor_name == 'Skewness120':
-            return self._calculate_skewness(data, period=120)
+            return self._calculate_skewness(data, period=120, moments=moments)
         elif factor_name == 'Skewness60':
-            return self._calculate_skewness(data, period=60)
+            return self._calculate_skewness(data, period=60, moments=moments)
         elif factor_name == 'Skewness20':
-            return self._calculate_skewness(data, period=20)
+            return self._calculate_skewness(data, period=20, moments=moments)
         elif factor_name == 'DAVOL10':
             return self._calculate_davol(data, period=10)
         elif factor_name == 'VR':
@@ -156,9 +198,9 @@ class FactorCalculator:
         elif factor_name == 'AR':
             return self._calculate_ar(data)
         elif factor_name == 'VOL120':
-            return self._calculate_volatility(data, period=120)
+            return self._calculate_volatility(data, period=120, moments=moments)
         elif factor_name == 'VOL10':
-            return self._calculate_volatility(data, period=10)
+            return self._calculate_volatility(data, period=10, moments=moments)
         elif factor_name == 'cash_flow_to_price_ratio':
             return self._calculate_cash_flow_to_price(financial_data, data)
         elif factor_name == 'cash_earnings_to_price_ratio':
@@ -229,53 +271,78 @@ class FactorCalculator:
             return 1.0
         return cov / market_var
     
-    def _calculate_sharpe_ratio(self, data: pd.DataFrame, period: int, risk_free_rate: float = 0.03) -> float:
+    def _calculate_sharpe_ratio(self, data: pd.DataFrame, period: int, risk_free_rate: float = 0.03,
+                                moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算夏普比率"""
         if len(data) < period:
             return 0.0
         
-        returns = data['close'].pct_change().iloc[-period:].dropna()
-        if len(returns) == 0 or returns.std() == 0:
+        count, mean, var = self._get_return_moments(data, period, moments)[:3]
+        std = np.sqrt(var)
+        if count == 0 or not std > 0:
             return 0.0
         
-        annual_return = returns.mean() * 252
-        annual_vol = returns.std() * np.sqrt(252)
-        sharpe = (annual_return - risk_free_rate) / annual_vol if annual_vol > 0 else 0.0
-        return sharpe * 100  # 转换为百分比形式
+        annual_return = mean * 252
+        annual_vol = std * np.sqrt(252)
+        sharpe = (annual_return - risk_free_rate) / annual_vol
+        return float(sharpe * 100)  # 转换为百分比形式
     
     # ========== 波动率因子 ==========
     
-    def _calculate_variance(self, data: pd.DataFrame, period: int) -> float:
+    def _calculate_return_moments(self, data: pd.DataFrame,
+                                  periods: np.ndarray = _MOMENT_PERIODS) -> Dict[int, np.ndarray]:
+        """
+        计算多个窗口的收益率统计量
+        
+        Returns:
+            Dict: 窗口长度 -> [样本数, 均值, 方差, 偏度, 峰度]
+        """
+        close = data['close'].to_numpy(dtype=np.float64)
+        stats = return_moments(close, periods)
+        return dict(zip(periods.tolist(), stats))
+    
+    def _get_return_moments(self, data: pd.DataFrame, period: int,
+                            moments: Optional[Dict[int, np.ndarray]] = None) -> np.ndarray:
+        """取指定窗口的收益率统计量，未预先计算时单独计算"""
+        if moments is None or period not in moments:
+            moments = self._calculate_return_moments(data, np.array([period], dtype=np.int64))
+        return moments[period]
+    
+    def _calculate_variance(self, data: pd.DataFrame, period: int,
+                            moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算波动率（收益率方差）"""
         if len(data) < period:
             return 0.0
-        returns = data['close'].pct_change().iloc[-period:].dropna()
-        return returns.var() * 10000  # 放大10000倍
+        var = self._get_return_moments(data, period, moments)[2]
+        return float(var * 10000)  # 放大10000倍
     
-    def _calculate_volatility(self, data: pd.DataFrame, period: int) -> float:
+    def _calculate_volatility(self, data: pd.DataFrame, period: int,
+                              moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算波动率（标准差）"""
         if len(data) < period:
             return 0.0
-        returns = data['close'].pct_change().iloc[-period:].dropna()
-        return returns.std() * 100  # 转换为百分比
+        var = self._get_return_moments(data, period, moments)[2]
+        return float(np.sqrt(var) * 100)  # 转换为百分比
     
-    def _calculate_kurtosis(self, data: pd.DataFrame, period: int) -> float:
+    def _calculate_kurtosis(self, data: pd.DataFrame, period: int,
+                            moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算峰度"""
         if len(data) < period:
             return 0.0
-        returns = data['close'].pct_change().iloc[-period:].dropna()
-        if len(returns) < 4:
+        stats = self._get_return_moments(data, period, moments)
+        if stats[0] < 4:
             return 0.0
-        return float(returns.kurtosis())
+        return float(stats[4])
     
-    def _calculate_skewness(self, data: pd.DataFrame, period: int) -> float:
+    def _calculate_skewness(self, data: pd.DataFrame, period: int,
+                            moments: Optional[Dict[int, np.ndarray]] = None) -> float:
         """计算偏度"""
         if len(data) < period:
             return 0.0
-        returns = data['close'].pct_change().iloc[-period:].dropna()
-        if len(returns) < 3:
+        stats = self._get_return_moments(data, period, moments)
+        if stats[0] < 3:
             return 0.0
-        return float(returns.skew())
+        return float(stats[3])
     
     def _calculate_atr(self, data: pd.DataFrame, period: int = 6) -> float:
         """计算平均真实波幅（ATR）"""
@@ -300,9 +367,8 @@ class FactorCalculator:
         """计算布林带下轨"""
         if len(data) < period:
             return 0.0
-        ma = data['close'].rolling(window=period).mean().iloc[-1]
-        std = data['close'].rolling(window=period).std().iloc[-1]
-        boll_down = ma - std_dev * std
+        window = _last_window(data['close'], period)
+        boll_down = window.mean() - std_dev * window.std(ddof=1)
         return float(boll_down) if not pd.isna(boll_down) else 0.0
     
     def _calculate_arbr(self, data: pd.DataFrame, period: int = 26) -> float:
@@ -353,12 +419,20 @@ class FactorCalculator:
         if len(data) < period + 1:
             return 50.0
         
-        typical_price = (data['high'] + data['low'] + data['close']) / 3
-        money_flow = typical_price * data['volume']
-        
-        positive_flow = money_flow.iloc[-period:][typical_price.iloc[-period:] > typical_price.iloc[-period-1:-1].shift(1)].sum()
-        negative_flow = money_flow.iloc[-period:][typical_price.iloc[-period:] < typical_price.iloc[-period-1:-1].shift(1)].sum()
-        
+        # 只取最后period+1根K线，在ndarray上一次性计算典型价格和资金流
+        high = data['high'].to_numpy(dtype=np.float64)[-period-1:]
+        low = data['low'].to_numpy(dtype=np.float64)[-period-1:]
+        close = data['close'].to_numpy(dtype=np.float64)[-period-1:]
+        volume = data['volume'].to_numpy(dtype=np.float64)[-period-1:]
+
+        typical_price = (high + low + close) / 3
+        money_flow = typical_price[1:] * volume[1:]
+
+        # 当日典型价格与前一日比较（两个切片视图直接相减，不做shift对齐）
+        tp_diff = typical_price[1:] - typical_price[:-1]
+        positive_flow = np.where(tp_diff > 0, money_flow, 0.0).sum()
+        negative_flow = np.where(tp_diff < 0, money_flow, 0.0).sum()
+
         if negative_flow == 0:
             return 100.0
         mfi = 100 - (100 / (1 + positive_flow / negative_flow))
@@ -380,9 +454,9 @@ class FactorCalculator:
         if len(data) < long:
             return 0.0
         
-        volume = data['volume'].iloc[-long:]
-        ma_short = volume.rolling(window=short).mean().iloc[-1]
-        ma_long = volume.rolling(window=long).mean().iloc[-1]
+        volume = _last_window(data['volume'], long)
+        ma_short = volume[-short:].mean()
+        ma_long = volume.mean()
         
         vosc = (ma_short - ma_long) / ma_long * 100 if ma_long != 0 else 0.0
         return float(vosc)
@@ -392,9 +466,10 @@ class FactorCalculator:
         if len(data) < period:
             return 0.0
         
-        ma = data['close'].rolling(window=period).mean().iloc[-1]
-        std = data['close'].rolling(window=period).std().iloc[-1]
-        current_price = data['close'].iloc[-1]
+        window = _last_window(data['close'], period)
+        ma = window.mean()
+        std = window.std(ddof=1)
+        current_price = window[-1]
         
         bbic = (current_price - ma) / std if std != 0 else 0.0
         return float(bbic)
@@ -420,7 +495,7 @@ class FactorCalculator:
         ema2 = ema1.ewm(span=period).mean()
         
         diff = ema1 - ema2
-        mass = diff.rolling(window=period).sum().iloc[-1]
+        mass = _last_window(diff, period).sum()
         return float(mass) if not pd.isna(mass) else 0.0
     
     # ========== 成交量因子 ==========
@@ -457,7 +532,7 @@ class FactorCalculator:
         """计算成交量移动平均"""
         if len(data) < period:
             return 0.0
-        tvma = data['volume'].rolling(window=period).mean().iloc[-1]
+        tvma = _last_window(data['volume'], period).mean()
         return float(tvma) if not pd.isna(tvma) else 0.0
     
     def _calculate_vpt(self, data: pd.DataFrame, period: int = 12, single_day: bool = False) -> float:
@@ -668,9 +743,9 @@ class FactorCalculator:
         Returns:
             DataFrame: 因子值DataFrame，行为股票代码，列为因子名
         """
-        results = {}
-        for stock_code in stock_list:
-            factors = self.calculate_all_factors(stock_code, end_date)
-            results[stock_code] = factors
+        # 预分配 (股票数 x 因子数) 矩阵，逐行原地写入，最后一次性构建DataFrame
+        out = np.empty((len(stock_list), len(self.FACTOR_LIST)), dtype=np.float64)
+        for s_idx, stock_code in enumerate(stock_list):
+            self.calculate_all_factors_as_array(stock_code, end_date, out=out[s_idx])
         
-        return pd.DataFrame(results).T
+        return pd.DataFrame(out, index=stock_list, columns=self.FACTOR_LIST)
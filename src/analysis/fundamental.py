@@ -8,6 +8,7 @@ import pandas as pd
 import numpy as np
 from typing import Optional, Dict
 import warnings
+from bisect import bisect_left, bisect_right
 
 warnings.filterwarnings('ignore')
 
@@ -15,10 +16,69 @@ warnings.filterwarnings('ignore')
 class FundamentalAnalyzer:
     """财务指标分析器：负责财务数据的评分和分析"""
     
+    # 评分区间表（元组字典）：字段 -> (区间边界, 各区间得分, 各区间标签, 二分查找方向, 是否仅对正值评分)
+    # side='right' 表示边界值归入上一区间（如 15 <= pe），side='left' 表示边界值归入下一区间（如 roe > 20）
+    # 单只股票用bisect查表，批量用np.searchsorted整列查表
+    _THRESHOLDS = {
+        # 市盈率 PE（0-20分）：<15 低，[15,30) 正常，>50 偏高
+        'pe': ((15.0, 30.0, float(np.nextafter(50.0, np.inf))),
+               (20, 10, 0, -10),
+               ('low', 'normal', None, 'high'), 'right', True),
+        # 市净率 PB（0-15分）：<2 低，[2,5) 正常，>10 偏高
+        'pb': ((2.0, 5.0, float(np.nextafter(10.0, np.inf))),
+               (15, 8, 0, -5),
+               ('low', 'normal', None, 'high'), 'right', True),
+        # 净资产收益率 ROE（0-25分）
+        'roe': ((5.0, 10.0, 15.0, 20.0),
+                (0, 8, 15, 20, 25),
+                (None, 'low', 'normal', 'good', 'excellent'), 'left', False),
+        # 净利润增长率（0-20分）
+        'profit_growth': ((0.0, 10.0, 20.0, 30.0),
+                          (0, 5, 10, 15, 20),
+                          (None, 'positive', 'normal', 'good', 'high'), 'left', False),
+        # 营业收入增长率（0-20分）
+        'revenue_growth': ((0.0, 5.0, 10.0, 20.0),
+                           (0, 5, 10, 15, 20),
+                           (None, 'positive', 'normal', 'good', 'high'), 'left', False),
+    }
+    
+    # 批量筛选条件：条件名 -> (字段, 是否为下限)
+    _FILTER_RULES = {
+        'min_pe': ('pe', True),
+        'max_pe': ('pe', False),
+        'min_pb': ('pb', True),
+        'max_pb': ('pb', False),
+        'min_roe': ('roe', True),
+        'min_profit_growth': ('profit_growth', True),
+    }
+    
     def __init__(self):
         """初始化财务指标分析器"""
         pass
     
+    def _score_buckets(self, df: pd.DataFrame):
+        """
+        按评分区间表对每个字段整列分桶
+        
+        Args:
+            df: 财务数据DataFrame，每行一只股票
+            
+        Returns:
+            list: [(字段名, 区间索引数组, 有效值掩码), ...]
+        """
+        buckets = []
+        for field, (edges, _, _, side, positive_only) in self._THRESHOLDS.items():
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                values = np.full(len(df), np.nan)
+            
+            valid = ~np.isnan(values)
+            if positive_only:
+                valid &= values > 0
+            buckets.append((field, np.searchsorted(edges, values, side=side), valid))
+        return buckets
+    
     def calculate_financial_score(self, financial_data: Dict) -> Optional[Dict]:
         """
         计算财务指标得分
@@ -34,80 +94,15 @@ class FundamentalAnalyzer:
         
         score = 0
         details = {}
-        
-        # 1. 市盈率 PE（0-20分）
-        pe = financial_data.get('pe')
-        if pe is not None and pe > 0:
-            if 0 < pe < 15:  # 低PE
-                score += 20
-                details['pe'] = 'low'
-            elif 15 <= pe < 30:
-                score += 10
-                details['pe'] = 'normal'
-            elif pe > 50:
-                score -= 10
-                details['pe'] = 'high'
-        
-        # 2. 市净率 PB（0-15分）
-        pb = financial_data.get('pb')
-        if pb is not None and pb > 0:
-            if 0 < pb < 2:
-                score += 15
-                details['pb'] = 'low'
-            elif 2 <= pb < 5:
-                score += 8
-                details['pb'] = 'normal'
-            elif pb > 10:
-                score -= 5
-                details['pb'] = 'high'
-        
-        # 3. 净资产收益率 ROE（0-25分）
-        roe = financial_data.get('roe')
-        if roe is not None:
-            if roe > 20:
-                score += 25
-                details['roe'] = 'excellent'
-            elif roe > 15:
-                score += 20
-                details['roe'] = 'good'
-            elif roe > 10:
-                score += 15
-                details['roe'] = 'normal'
-            elif roe > 5:
-                score += 8
-                details['roe'] = 'low'
-        
-        # 4. 净利润增长率（0-20分）
-        profit_growth = financial_data.get('profit_growth')
-        if profit_growth is not None:
-            if profit_growth > 30:
-                score += 20
-                details['profit_growth'] = 'high'
-            elif profit_growth > 20:
-                score += 15
-                details['profit_growth'] = 'good'
-            elif profit_growth > 10:
-                score += 10
-                details['profit_growth'] = 'normal'
-            elif profit_growth > 0:
-                score += 5
-                details['profit_growth'] = 'positive'
-        
-        # 5. 营业收入增长率（0-20分）
-        revenue_growth = financial_data.get('revenue_growth')
-        if revenue_growth is not None:
-            if revenue_growth > 20:
-                score += 20
-                details['revenue_growth'] = 'high'
-            elif revenue_growth > 10:
-                score += 15
-                details['revenue_growth'] = 'good'
-            elif revenue_growth > 5:
-                score += 10
-                details['revenue_growth'] = 'normal'
-            elif revenue_growth > 0:
-                score += 5
-                details['revenue_growth'] = 'positive'
+        for field, (edges, scores, labels, side, positive_only) in self._THRESHOLDS.items():
+            value = financial_data.get(field)
+            # 缺失值（None/NaN）不计分，PE/PB只对正值计分
+            if value is None or value != value or (positive_only and value <= 0):
+                continue
+            idx = bisect_right(edges, value) if side == 'right' else bisect_left(edges, value)
+            score += scores[idx]
+            if labels[idx] is not None:
+                details[field] = labels[idx]
         
         return {
             'score': score,
@@ -115,6 +110,28 @@ class FundamentalAnalyzer:
             'details': details
         }
     
+    def calculate_financial_scores_batch(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        批量计算财务指标得分（整列向量化，评分规则与calculate_financial_score一致）
+        
+        Args:
+            df: 财务数据DataFrame，每行一只股票，列包含pe/pb/roe/profit_growth/revenue_growth（缺失列按无数据处理）
+            
+        Returns:
+            DataFrame: 与df同索引，包含各字段得分列（<字段>_score）和总分列score
+        """
+        result = pd.DataFrame(index=df.index)
+        total = np.zeros(len(df), dtype=np.int64)
+        
+        for field, bucket, valid in self._score_buckets(df):
+            contrib = np.take(self._THRESHOLDS[field][1], bucket)
+            contrib[~valid] = 0
+            result[f'{field}_score'] = contrib
+            total += contrib
+        
+        result['score'] = total
+        return result
+    
     def filter_financial_data(self, financial_data: Dict, filters: Dict) -> bool:
         """
         根据财务筛选条件过滤数据
@@ -129,6 +146,21 @@ class FundamentalAnalyzer:
         if financial_data is None:
             return False
         
+        # 按淘汰率从高到低排列检查顺序，多数股票在第一项就被淘汰：
+        # A股中ROE达标的比例最低，其次是净利润增长，PE/PB区间通常较宽
+        
+        # ROE筛选
+        roe = financial_data.get('roe')
+        if 'min_roe' in filters and roe is not None:
+            if roe < filters['min_roe']:
+                return False
+        
+        # 净利润增长率筛选
+        profit_growth = financial_data.get('profit_growth')
+        if 'min_profit_growth' in filters and profit_growth is not None:
+            if profit_growth < filters['min_profit_growth']:
+                return False
+        
         # PE筛选
         pe = financial_data.get('pe')
         if 'min_pe' in filters and pe is not None:
@@ -147,16 +179,35 @@ class FundamentalAnalyzer:
             if pb > filters['max_pb']:
                 return False
         
-        # ROE筛选
-        roe = financial_data.get('roe')
-        if 'min_roe' in filters and roe is not None:
-            if roe < filters['min_roe']:
-                return False
+        return True
+    
+    def filter_financial_data_batch(self, df: pd.DataFrame, filters: Dict) -> np.ndarray:
+        """
+        批量财务筛选（整列向量化，规则与filter_financial_data一致，缺失值视为不限制）
         
-        # 净利润增长率筛选
-        profit_growth = financial_data.get('profit_growth')
-        if 'min_profit_growth' in filters and profit_growth is not None:
-            if profit_growth < filters['min_profit_growth']:
-                return False
+        Args:
+            df: 财务数据DataFrame，每行一只股票
+            filters: 筛选条件字典
+            
+        Returns:
+            np.ndarray: 布尔掩码，True表示通过筛选
+        """
+        mask = np.ones(len(df), dtype=bool)
         
-        return True
+        # 一次性取出所需字段，避免重复按列索引
+        fields = [f for f in ('pe', 'pb', 'roe', 'profit_growth') if f in df.columns]
+        if not fields:
+            return mask
+        values = df[fields].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        columns = {field: values[:, i] for i, field in enumerate(fields)}
+        
+        for key, (field, is_lower) in self._FILTER_RULES.items():
+            if key not in filters or field not in columns:
+                continue
+            col = columns[field]
+            if is_lower:
+                mask &= ~(col < filters[key])
+            else:
+                mask &= ~(col > filters[key])
+        
+        return mask
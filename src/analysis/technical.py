@@ -9,20 +9,60 @@
 import numpy as np
 import pandas as pd
 from typing import Dict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import warnings
-import sys
 import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.core.config import ChartConfig
+from ..core.config import ChartConfig
+from ..core._njit import NUMBA_AVAILABLE
+from ._kernels import ema, rolling_means, kdj_rsv, latest_macd, latest_kdj
+
+# 未安装numba时rolling_means按纯Python逐点执行，此时若有bottleneck则改用其C实现的滑动均值
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None
 
 warnings.filterwarnings('ignore')
 
 
+def _calc_all_worker(symbol: str, data: pd.DataFrame, config: ChartConfig, dtype=np.float64):
+    """
+    子进程任务：计算单只股票的全部技术指标（模块级函数，便于进程池序列化）
+    
+    Args:
+        symbol: 股票代码
+        data: 股票数据
+        config: 图表配置
+        dtype: 指标计算精度
+        
+    Returns:
+        tuple: (股票代码, 指标字典)
+    """
+    return symbol, TechnicalIndicators(config, dtype=dtype).calculate_all(data)
+
+
 class TechnicalIndicators:
     """技术指标计算器"""
     
-    def __init__(self, config: ChartConfig = None):
+    def __init__(self, config: ChartConfig = None, dtype=np.float64):
+        """
+        Args:
+            config: 图表配置
+            dtype: 指标计算精度，np.float64（默认）或 np.float32。
+                   float32约有7位有效数字，足以表示股价（5位左右），可减半内存带宽，
+                   但均线交叉等比较在极接近时可能与float64结果不同
+        """
         self.config = config or ChartConfig()
+        self._dtype = np.dtype(dtype)
+        
+        # 指标参数在初始化时绑定到实例，计算时不再逐层查找配置字典
+        indicators = self.config.INDICATORS
+        self._ma_periods = tuple(indicators['ma_periods'])
+        self._ma_periods_arr = np.asarray(self._ma_periods, dtype=np.int64)
+        self._macd_alphas = tuple(2.0 / (indicators[key] + 1)
+                                  for key in ('macd_fast', 'macd_slow', 'macd_signal'))
+        self._kdj_period = indicators['kdj_period']
     
     def calculate_all(self, data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
         """
@@ -34,63 +74,193 @@ class TechnicalIndicators:
         Returns:
             Dict: 包含所有指标的字典
         """
+        return self.calculate_subset(data)
+    
+    def calculate_subset(self, data: pd.DataFrame,
+                         names=('ma', 'macd', 'kdj')) -> Dict[str, pd.DataFrame]:
+        """
+        只计算指定的技术指标组
+        
+        Args:
+            data: 股票数据
+            names: 需要计算的指标组，'ma'、'macd'、'kdj' 的任意组合
+            
+        Returns:
+            Dict: {指标组: 指标DataFrame}，只包含所选指标组
+        """
         indicators = {}
         
         # 移动平均线
-        indicators['ma'] = self.calculate_moving_averages(data)
+        if 'ma' in names:
+            indicators['ma'] = self.calculate_moving_averages(data)
         
         # MACD
-        indicators['macd'] = self.calculate_macd(data)
+        if 'macd' in names:
+            indicators['macd'] = self.calculate_macd(data)
         
         # KDJ
-        indicators['kdj'] = self.calculate_kdj(data)
+        if 'kdj' in names:
+            indicators['kdj'] = self.calculate_kdj(data)
         
         return indicators
     
+    def calculate_last(self, data: pd.DataFrame, names=('ma', 'macd', 'kdj')) -> Dict[str, float]:
+        """
+        只计算最新一根K线的指标值，不构建整条指标序列
+        
+        Args:
+            data: 股票数据
+            names: 需要计算的指标组，'ma'、'macd'、'kdj' 的任意组合
+            
+        Returns:
+            Dict: {指标名: 最新值}，指标名与calculate_all各DataFrame的列名一致，无法计算时为NaN
+        """
+        high, low, close = (data[field].to_numpy(dtype=self._dtype)[np.newaxis]
+                            for field in ('high', 'low', 'close'))
+        latest = self.calculate_latest_batch(high, low, close, indicators=names)
+        return {name: float(values[0]) for name, values in latest.items()}
+    
+    def calculate_all_batch(self, data_dict: Dict[str, pd.DataFrame],
+                            workers: int = None) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        多进程批量计算多只股票的技术指标
+        
+        Args:
+            data_dict: {股票代码: 股票数据}
+            workers: 进程数，默认为CPU核数
+            
+        Returns:
+            Dict: {股票代码: 指标字典}
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(data_dict) <= 1:
+            return {symbol: self.calculate_all(data) for symbol, data in data_dict.items()}
+        
+        symbols = list(data_dict)
+        # 股票数较多时按块分发，摊薄进程间通信开销
+        chunksize = max(1, len(symbols) // (workers * 4))
+        
+        # 使用spawn启动子进程：numba并行线程池（如TBB）不支持fork，fork后进程退出时可能卡死
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = executor.map(
+                _calc_all_worker,
+                symbols,
+                (data_dict[symbol] for symbol in symbols),
+                [self.config] * len(symbols),
+                [self._dtype] * len(symbols),
+                chunksize=chunksize
+            )
+            return dict(results)
+    
     def calculate_moving_averages(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算移动平均线"""
-        ma_data = pd.DataFrame()
-        for period in self.config.INDICATORS['ma_periods']:
-            ma_data[f'MA{period}'] = data['close'].rolling(window=period).mean()
-        return ma_data
+        close = data['close'].to_numpy(dtype=self._dtype)
+        if bn is not None and not NUMBA_AVAILABLE:
+            # move_mean默认要求窗口内全部为有效值，与rolling(window=p).mean()一致；
+            # 窗口大于序列长度时move_mean会报错，此时整行保持NaN
+            means = np.full((len(self._ma_periods), len(close)), np.nan, dtype=self._dtype)
+            for j, period in enumerate(self._ma_periods):
+                if period <= len(close):
+                    means[j] = bn.move_mean(close, window=period)
+        else:
+            # 所有周期的均线在一次遍历中同时计算
+            means = rolling_means(close, self._ma_periods_arr)
+        # (周期数, K线数) 的结果转置后直接作为DataFrame底层数据
+        return pd.DataFrame(means.T, index=data.index,
+                            columns=[f'MA{period}' for period in self._ma_periods], copy=False)
     
     def calculate_macd(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算MACD指标"""
-        close = data['close']
-        
-        # 计算EMA
-        ema_fast = close.ewm(span=self.config.INDICATORS['macd_fast'], adjust=False).mean()
-        ema_slow = close.ewm(span=self.config.INDICATORS['macd_slow'], adjust=False).mean()
-        
-        # 计算DIF、DEA、MACD
-        dif = ema_fast - ema_slow
-        dea = dif.ewm(span=self.config.INDICATORS['macd_signal'], adjust=False).mean()
-        macd = (dif - dea) * 2  # 传统MACD柱是2倍的(DIF-DEA)
-        
-        return pd.DataFrame({
-            'DIF': dif,
-            'DEA': dea,
-            'MACD': macd
-        })
+        close = data['close'].to_numpy(dtype=self._dtype)
+        
+        # DIF、DEA、MACD直接写入预分配的列连续数组
+        out = np.empty((len(close), 3), dtype=self._dtype, order='F')
+        self._fill_macd(close, out)
+        
+        return pd.DataFrame(out, index=data.index, columns=['DIF', 'DEA', 'MACD'], copy=False)
+    
+    def _fill_macd(self, close: np.ndarray, out: np.ndarray):
+        """在 (K线数, 3) 的数组中依次写入DIF、DEA、MACD"""
+        # 计算EMA（等价于 ewm(span=s, adjust=False)，alpha = 2/(s+1)）
+        alpha_fast, alpha_slow, alpha_signal = self._macd_alphas
+        ema_fast = ema(close, alpha_fast)
+        ema_slow = ema(close, alpha_slow)
+        
+        dif = np.subtract(ema_fast, ema_slow, out=out[:, 0])
+        dea = out[:, 1]
+        dea[:] = ema(dif, alpha_signal)
+        np.subtract(dif, dea, out=out[:, 2])
+        out[:, 2] *= 2  # 传统MACD柱是2倍的(DIF-DEA)
     
     def calculate_kdj(self, data: pd.DataFrame) -> pd.DataFrame:
         """计算KDJ指标"""
-        n = self.config.INDICATORS['kdj_period']
+        high = data['high'].to_numpy(dtype=self._dtype)
+        low = data['low'].to_numpy(dtype=self._dtype)
+        close = data['close'].to_numpy(dtype=self._dtype)
+        
+        # K、D、J直接写入预分配的列连续数组
+        out = np.empty((len(close), 3), dtype=self._dtype, order='F')
+        self._fill_kdj(high, low, close, out)
+        
+        return pd.DataFrame(out, index=data.index, columns=['K', 'D', 'J'], copy=False)
+    
+    def _fill_kdj(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, out: np.ndarray):
+        """在 (K线数, 3) 的数组中依次写入K、D、J"""
+        # 计算RSV（单调队列一次遍历得到周期内最高价/最低价）
+        rsv = kdj_rsv(high, low, close, self._kdj_period)
+        
+        # 计算K、D、J值（com=2 对应 alpha=1/3，即3日EMA）
+        k = out[:, 0]
+        d = out[:, 1]
+        k[:] = ema(rsv, 1.0 / 3)
+        d[:] = ema(k, 1.0 / 3)
+        np.subtract(3 * k, 2 * d, out=out[:, 2])
+    
+    def calculate_latest_batch(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                               indicators=('ma', 'macd', 'kdj')) -> Dict[str, np.ndarray]:
+        """
+        批量计算多只股票最新一根K线的均线、MACD、KDJ指标值
+        
+        Args:
+            high: 最高价矩阵，shape为 (股票数, K线数)
+            low: 最低价矩阵，shape同high
+            close: 收盘价矩阵，shape同high。K线数不足的股票在行首以NaN补齐
+            indicators: 需要计算的指标组，'ma'、'macd'、'kdj' 的任意组合
+            
+        Returns:
+            Dict: {指标名: (股票数,) 数组}，只包含所选指标组，指标名与calculate_all各DataFrame的列名一致
+        """
+        high = np.ascontiguousarray(high, dtype=self._dtype)
+        low = np.ascontiguousarray(low, dtype=self._dtype)
+        close = np.ascontiguousarray(close, dtype=self._dtype)
+        n_symbols, n_bars = close.shape
         
-        # 计算周期内的最低价和最高价
-        low_min = data['low'].rolling(window=n).min()
-        high_max = data['high'].rolling(window=n).max()
+        do_ma = 'ma' in indicators
+        do_macd = 'macd' in indicators
+        do_kdj = 'kdj' in indicators
+        ma = np.full((len(self._ma_periods), n_symbols), np.nan, dtype=self._dtype)
+        macd = np.full((3, n_symbols), np.nan, dtype=self._dtype)
+        kdj = np.full((3, n_symbols), np.nan, dtype=self._dtype)
         
-        # 计算RSV
-        rsv = 100 * (data['close'] - low_min) / (high_max - low_min + 1e-8)
+        if do_ma:
+            # 最新一根K线的均线只依赖最后p根收盘价，直接对整个截面取切片均值；
+            # 窗口内含NaN时结果为NaN，与rolling(window=p).mean()一致
+            for j, period in enumerate(self._ma_periods):
+                if period <= n_bars:
+                    ma[j] = close[:, -period:].mean(axis=1, dtype=np.float64)
         
-        # 计算K、D、J值
-        k = rsv.ewm(com=2, adjust=False).mean()  # 对应3日EMA
-        d = k.ewm(com=2, adjust=False).mean()
-        j = 3 * k - 2 * d
+        # MACD/KDJ为递推指标，由编译内核按股票并行计算
+        if n_bars > 0 and do_macd:
+            macd = latest_macd(close, *self._macd_alphas)
+        if n_bars > 0 and do_kdj:
+            kdj = latest_kdj(high, low, close, self._kdj_period)
         
-        return pd.DataFrame({
-            'K': k,
-            'D': d,
-            'J': j
-        })
+        latest = {}
+        if do_ma:
+            latest.update(zip([f'MA{period}' for period in self._ma_periods], ma))
+        if do_macd:
+            latest.update(zip(['DIF', 'DEA', 'MACD'], macd))
+        if do_kdj:
+            latest.update(zip(['K', 'D', 'J'], kdj))
+        return latest
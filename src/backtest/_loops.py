@@ -0,0 +1,166 @@
+# _loops.py
+"""
+回测循环内核模块
+功能：回测状态机的编译内核（numba加速，未安装numba时按纯Python执行）
+"""
+
+import numpy as np
+
+from ..core._njit import njit, prange
+
+# 交易动作编码
+ACTION_BUY = 1
+ACTION_SELL = -1
+
+
+@njit(cache=True)
+def _backtest_row(close, signals, initial_capital, commission_rate, slippage_rate,
+                  buy_val, sell_val, positions, equity,
+                  trade_idx, trade_prices, trade_shares, trade_capital, trade_actions):
+    """
+    单只股票的回测状态机（全仓买入/全部卖出），结果写入调用方提供的数组
+
+    Returns:
+        int: 成交笔数k，成交数组的前k个元素有效
+    """
+    n = close.shape[0]
+    k = 0
+
+    capital = initial_capital
+    position = 0.0  # 持仓数量
+    cash = capital  # 现金
+
+    for i in range(n):
+        current_price = close[i]
+        signal = signals[i]
+
+        if signal == buy_val and position == 0:
+            # 买入：考虑滑点和手续费
+            buy_price = current_price * (1 + slippage_rate)
+            commission = capital * commission_rate
+            position = (cash - commission) / buy_price
+            cash = 0.0
+
+            trade_idx[k] = i
+            trade_prices[k] = buy_price
+            trade_shares[k] = position
+            trade_capital[k] = capital
+            trade_actions[k] = ACTION_BUY
+            k += 1
+
+        elif signal == sell_val and position > 0:
+            # 卖出：考虑滑点和手续费
+            sell_price = current_price * (1 - slippage_rate)
+            cash = position * sell_price * (1 - commission_rate)
+            position = 0.0
+
+            trade_idx[k] = i
+            trade_prices[k] = sell_price
+            trade_shares[k] = 0.0
+            trade_capital[k] = cash
+            trade_actions[k] = ACTION_SELL
+            k += 1
+
+        # 计算当前权益
+        if position > 0:
+            current_equity = position * current_price
+        else:
+            current_equity = cash
+
+        positions[i] = position
+        equity[i] = current_equity
+        capital = current_equity
+
+    return k
+
+
+@njit(cache=True)
+def run_backtest_loop(close, signals, initial_capital, commission_rate, slippage_rate,
+                      buy_val, sell_val):
+    """
+    执行单只股票的回测状态机（全仓买入/全部卖出）
+
+    Args:
+        close: 收盘价数组（float64）
+        signals: 信号数组（int64）
+        initial_capital: 初始资金
+        commission_rate: 手续费率
+        slippage_rate: 滑点率
+        buy_val: 买入信号值
+        sell_val: 卖出信号值
+
+    Returns:
+        tuple: (每日持仓, 每日权益, 成交K线索引, 成交价, 成交后持股数, 成交时资金, 成交动作)，
+               后五项长度均为成交笔数
+    """
+    n = close.shape[0]
+    positions = np.empty(n)
+    equity = np.empty(n)
+    trade_idx = np.empty(n, np.int64)
+    trade_prices = np.empty(n)
+    trade_shares = np.empty(n)
+    trade_capital = np.empty(n)
+    trade_actions = np.empty(n, np.int8)
+
+    k = _backtest_row(close, signals, initial_capital, commission_rate, slippage_rate,
+                      buy_val, sell_val, positions, equity,
+                      trade_idx, trade_prices, trade_shares, trade_capital, trade_actions)
+
+    return (positions, equity, trade_idx[:k], trade_prices[:k],
+            trade_shares[:k], trade_capital[:k], trade_actions[:k])
+
+
+@njit(parallel=True, cache=True)
+def run_backtest_batch(close2d, sig2d, initial_capital, commission_rate, slippage_rate,
+                       buy_val, sell_val):
+    """
+    多只股票同时回测：按股票维度并行，每行执行与run_backtest_loop相同的状态机
+
+    Args:
+        close2d: 收盘价矩阵（float64，shape为 (股票数, K线数)）
+        sig2d: 信号矩阵（int64，shape同close2d）
+        initial_capital: 每只股票的初始资金
+        commission_rate: 手续费率
+        slippage_rate: 滑点率
+        buy_val: 买入信号值
+        sell_val: 卖出信号值
+
+    Returns:
+        tuple: (持仓矩阵, 权益矩阵, 成交笔数, 成交K线索引, 成交价, 成交后持股数, 成交时资金, 成交动作)，
+               成交类矩阵第s行的前 成交笔数[s] 个元素有效
+    """
+    n_symbols, n = close2d.shape
+    positions = np.empty((n_symbols, n))
+    equity = np.empty((n_symbols, n))
+    counts = np.zeros(n_symbols, np.int64)
+    trade_idx = np.empty((n_symbols, n), np.int64)
+    trade_prices = np.empty((n_symbols, n))
+    trade_shares = np.empty((n_symbols, n))
+    trade_capital = np.empty((n_symbols, n))
+    trade_actions = np.empty((n_symbols, n), np.int8)
+
+    for s in prange(n_symbols):
+        counts[s] = _backtest_row(close2d[s], sig2d[s], initial_capital, commission_rate,
+                                  slippage_rate, buy_val, sell_val, positions[s], equity[s],
+                                  trade_idx[s], trade_prices[s], trade_shares[s],
+                                  trade_capital[s], trade_actions[s])
+
+    return (positions, equity, counts, trade_idx, trade_prices,
+            trade_shares, trade_capital, trade_actions)
+
+
+def precompile():
+    """
+    用极小的数组调用一次各回测内核，触发编译并写入磁盘缓存
+
+    参数类型与BacktestEngine实际调用时一致（float64价格、int64信号），
+    之后的运行直接从__pycache__中的缓存加载编译结果。
+    pandas写时复制下to_numpy可能返回只读视图，numba对只读数组单独编译，因此两种都预编译。
+    """
+    for writeable in (True, False):
+        close = np.ones(2)
+        signals = np.zeros(2, dtype=np.int64)
+        close.flags.writeable = writeable
+        signals.flags.writeable = writeable
+        run_backtest_loop(close, signals, 1.0, 0.0, 0.0, 1, -1)
+        run_backtest_batch(close.reshape(1, 2), signals.reshape(1, 2), 1.0, 0.0, 0.0, 1, -1)
@@ -7,11 +7,12 @@
 import numpy as np
 import pandas as pd
 from typing import Dict
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.core.config import BacktestConfig
-from src.strategy.strategies import Signal
+from ..core.config import BacktestConfig
+from ..strategy.strategies import Signal
+
+# 信号取值（取出枚举值一次，编译内核和向量化比较只接收整数）
+_BUY = Signal.BUY.value
+_SELL = Signal.SELL.value
 
 
 class PerformanceAnalyzer:
@@ -34,55 +35,72 @@ class PerformanceAnalyzer:
         Returns:
             Dict: 性能指标字典
         """
-        equity = backtest_result['equity']
-        returns = backtest_result['returns'].dropna()
+        # 一次性取出底层数组和首尾净值，后续只做标量运算
+        equity = backtest_result['equity'].to_numpy(dtype=np.float64)
+        eq0 = equity[0]
+        eq_n = equity[-1]
+        risk_free_rate = self.risk_free_rate
+        
+        returns_all = backtest_result['returns'].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(returns_all)
+        returns = returns_all[valid]
+        returns_index = backtest_result.index[valid]
         
         # 总收益率
-        total_return = (equity.iloc[-1] / equity.iloc[0] - 1) * 100
+        total_return = (eq_n / eq0 - 1) * 100
         
         # 年化收益率
         days = len(backtest_result)
         years = days / 252  # 假设252个交易日
         if years > 0:
-            annual_return = ((equity.iloc[-1] / equity.iloc[0]) ** (1 / years) - 1) * 100
+            annual_return = ((eq_n / eq0) ** (1 / years) - 1) * 100
         else:
             annual_return = 0
         
-        # 波动率（年化）
-        volatility = returns.std() * np.sqrt(252) * 100
+        # 波动率（年化，样本标准差）
+        volatility = returns.std(ddof=1) * np.sqrt(252) * 100 if len(returns) > 1 else np.nan
         
         # 夏普比率
-        sharpe_ratio = (annual_return - self.risk_free_rate * 100) / volatility if volatility > 0 else 0
+        sharpe_ratio = (annual_return - risk_free_rate * 100) / volatility if volatility > 0 else 0
         
-        # 最大回撤
+        # 最大回撤（在ndarray上计算累计净值和历史最高点，再把位置映射回日期）
         cumulative = (1 + returns).cumprod()
-        running_max = cumulative.expanding().max()
+        running_max = np.maximum.accumulate(cumulative)
         drawdown = (cumulative / running_max - 1) * 100
-        max_drawdown = drawdown.min()
+        if len(drawdown) and not np.isnan(drawdown).all():
+            max_dd_pos = int(np.nanargmin(drawdown))
+            max_drawdown = drawdown[max_dd_pos]
+            max_dd_idx = returns_index[max_dd_pos]
+            # 最大回撤开始：回撤最低点之前的净值最高点
+            max_dd_start = returns_index[int(np.argmax(cumulative[:max_dd_pos + 1]))]
+        else:
+            max_drawdown = np.nan
+            max_dd_idx = max_dd_start = None
         
-        # 胜率
-        trade_returns = []
-        in_position = False
-        entry_price = 0
+        # 胜率：只保留买卖事件，去掉连续重复的同向信号后即为交替的买入/卖出序列
+        sig = backtest_result['signal'].to_numpy()
+        close = backtest_result['close'].to_numpy(dtype=np.float64)
+        mask = (sig == _BUY) | (sig == _SELL)
+        events_sig = sig[mask]
+        events_px = close[mask]
         
-        for i in range(len(backtest_result)):
-            if backtest_result['signal'].iloc[i] == Signal.BUY.value and not in_position:
-                in_position = True
-                entry_price = backtest_result['close'].iloc[i]
-            elif backtest_result['signal'].iloc[i] == Signal.SELL.value and in_position:
-                trade_return = (backtest_result['close'].iloc[i] / entry_price - 1) * 100
-                trade_returns.append(trade_return)
-                in_position = False
+        # 空仓时的卖出信号无效，因此把"前一个事件"初始化为卖出
+        prev_sig = np.empty_like(events_sig)
+        prev_sig[:1] = _SELL
+        prev_sig[1:] = events_sig[:-1]
+        events_px = events_px[events_sig != prev_sig]
         
-        win_rate = (sum(1 for r in trade_returns if r > 0) / len(trade_returns) * 100 
-                   if trade_returns else 0)
+        # 丢弃末尾未平仓的买入
+        if len(events_px) % 2:
+            events_px = events_px[:-1]
+        events_px = events_px.reshape(-1, 2)
+        trade_returns = (events_px[:, 1] / events_px[:, 0] - 1) * 100
         
-        # 基准对比
-        benchmark_total = backtest_result['benchmark_cumulative'].iloc[-1] * 100
+        win_rate = ((trade_returns > 0).mean() * 100 
+                   if len(trade_returns) else 0)
         
-        # 计算最大回撤期间
-        max_dd_idx = drawdown.idxmin()
-        max_dd_start = cumulative[:max_dd_idx].idxmax() if max_dd_idx is not None else None
+        # 基准对比
+        benchmark_total = backtest_result['benchmark_cumulative'].to_numpy()[-1] * 100
         
         return {
             '总收益率': f"{total_return:.2f}%",
@@ -6,11 +6,14 @@
 
 import numpy as np
 import pandas as pd
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.core.config import BacktestConfig
-from src.strategy.strategies import Signal
+from typing import List, Tuple
+from ..core.config import BacktestConfig
+from ..strategy.strategies import Signal
+from ._loops import run_backtest_loop, run_backtest_batch, precompile, ACTION_BUY
+
+# 信号取值（取出枚举值一次，编译内核和向量化比较只接收整数）
+_BUY = Signal.BUY.value
+_SELL = Signal.SELL.value
 
 
 class BacktestEngine:
@@ -30,6 +33,13 @@ class BacktestEngine:
         self.slippage_rate = slippage_rate or BacktestConfig.SLIPPAGE_RATE
         self.trades = None
     
+    @classmethod
+    def warmup(cls):
+        """
+        预编译回测内核（安装后运行一次即可，之后从磁盘缓存加载，避免首次回测时的编译等待）
+        """
+        precompile()
+    
     def run(self, data: pd.DataFrame, signals: pd.Series) -> pd.DataFrame:
         """
         执行回测
@@ -41,71 +51,90 @@ class BacktestEngine:
         Returns:
             DataFrame: 回测结果
         """
-        # 初始化
-        capital = self.initial_capital
-        position = 0  # 持仓数量
-        cash = capital  # 现金
+        # 一次性取出底层数组，状态机在编译内核中逐K线执行
+        close = data['close'].to_numpy(dtype=np.float64)
+        sig = signals.to_numpy(dtype=np.int64)
+        
+        (positions, equity, trade_idx, trade_prices,
+         trade_shares, trade_capital, trade_actions) = run_backtest_loop(
+            close, sig, float(self.initial_capital), float(self.commission_rate),
+            float(self.slippage_rate), _BUY, _SELL
+        )
+        
+        # 构建结果DataFrame：收益率和累计收益直接在ndarray上计算，一次性赋值
+        returns = self._pct_change(equity)
+        benchmark_returns = self._pct_change(close)
+        result = data.assign(
+            signal=signals,
+            position=positions,
+            equity=equity,
+            returns=returns,
+            cumulative_returns=self._cumulative(returns),
+            # 基准收益（买入持有）
+            benchmark_returns=benchmark_returns,
+            benchmark_cumulative=self._cumulative(benchmark_returns)
+        )
         
         # 记录每笔交易
-        trades = []
-        positions = []  # 每日持仓
-        equity = []  # 每日权益
+        self.trades = pd.DataFrame({
+            'date': data.index[trade_idx],
+            'action': np.where(trade_actions == ACTION_BUY, 'BUY', 'SELL'),
+            'price': trade_prices,
+            'shares': trade_shares,
+            'capital': trade_capital
+        })
+        return result
+    
+    @staticmethod
+    def _pct_change(values: np.ndarray) -> np.ndarray:
+        """逐期收益率（与 Series.pct_change() 一致，首个元素为NaN）"""
+        out = np.empty(len(values))
+        if len(values):
+            out[0] = np.nan
+            with np.errstate(divide='ignore', invalid='ignore'):
+                np.divide(values[1:], values[:-1], out=out[1:])
+            out[1:] -= 1
+        return out
+    
+    @staticmethod
+    def _cumulative(returns: np.ndarray) -> np.ndarray:
+        """累计收益（与 (1 + returns).cumprod() - 1 一致，NaN位置保持NaN且不中断累乘）"""
+        missing = np.isnan(returns)
+        out = np.nancumprod(1 + returns) - 1
+        out[missing] = np.nan
+        return out
+    
+    def run_batch(self, prices_2d: np.ndarray,
+                  signals_2d: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[pd.DataFrame]]:
+        """
+        批量回测多只股票（同一编译内核内按股票并行，规则与run一致）
         
-        for i in range(len(data)):
-            current_price = data['close'].iloc[i]
-            signal = signals.iloc[i]
-            
-            # 执行交易
-            if signal == Signal.BUY.value and position == 0:
-                # 买入：考虑滑点和手续费
-                buy_price = current_price * (1 + self.slippage_rate)
-                commission = capital * self.commission_rate
-                position = (cash - commission) / buy_price
-                cash = 0
-                
-                trades.append({
-                    'date': data.index[i],
-                    'action': 'BUY',
-                    'price': buy_price,
-                    'shares': position,
-                    'capital': capital
-                })
-            
-            elif signal == Signal.SELL.value and position > 0:
-                # 卖出：考虑滑点和手续费
-                sell_price = current_price * (1 - self.slippage_rate)
-                cash = position * sell_price * (1 - self.commission_rate)
-                position = 0
-                
-                trades.append({
-                    'date': data.index[i],
-                    'action': 'SELL',
-                    'price': sell_price,
-                    'shares': 0,
-                    'capital': cash
-                })
-            
-            # 计算当前权益
-            if position > 0:
-                current_equity = position * current_price
-            else:
-                current_equity = cash
+        Args:
+            prices_2d: 收盘价矩阵，shape为 (股票数, K线数)
+            signals_2d: 交易信号矩阵，shape同prices_2d
             
-            positions.append(position)
-            equity.append(current_equity)
-            capital = current_equity
-        
-        # 构建结果DataFrame
-        result = data.copy()
-        result['signal'] = signals
-        result['position'] = positions
-        result['equity'] = equity
-        result['returns'] = result['equity'].pct_change()
-        result['cumulative_returns'] = (1 + result['returns']).cumprod() - 1
+        Returns:
+            tuple: (权益矩阵, 持仓矩阵, 每只股票的交易记录列表)，
+                   交易记录的bar列为成交所在K线的位置
+        """
+        close2d = np.ascontiguousarray(prices_2d, dtype=np.float64)
+        sig2d = np.ascontiguousarray(signals_2d, dtype=np.int64)
+        if close2d.ndim != 2 or close2d.shape != sig2d.shape:
+            raise ValueError(f"价格矩阵与信号矩阵形状不一致: {close2d.shape} vs {sig2d.shape}")
         
-        # 计算基准收益（买入持有）
-        result['benchmark_returns'] = result['close'].pct_change()
-        result['benchmark_cumulative'] = (1 + result['benchmark_returns']).cumprod() - 1
+        (positions, equity, counts, trade_idx, trade_prices,
+         trade_shares, trade_capital, trade_actions) = run_backtest_batch(
+            close2d, sig2d, float(self.initial_capital), float(self.commission_rate),
+            float(self.slippage_rate), _BUY, _SELL
+        )
         
-        self.trades = pd.DataFrame(trades)
-        return result
+        trades = []
+        for s, k in enumerate(counts):
+            trades.append(pd.DataFrame({
+                'bar': trade_idx[s, :k],
+                'action': np.where(trade_actions[s, :k] == ACTION_BUY, 'BUY', 'SELL'),
+                'price': trade_prices[s, :k],
+                'shares': trade_shares[s, :k],
+                'capital': trade_capital[s, :k]
+            }))
+        return equity, positions, trades
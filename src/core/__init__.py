@@ -6,8 +6,10 @@ from .utils import (
     get_trading_days_count,
     get_next_trading_date,
     validate_stock_code,
+    validate_stock_codes,
     format_number
 )
+from .cache import DiskCache, next_market_close
 
 __all__ = [
     'ChartConfig',
@@ -18,5 +20,8 @@ __all__ = [
     'get_trading_days_count',
     'get_next_trading_date',
     'validate_stock_code',
+    'validate_stock_codes',
     'format_number',
+    'DiskCache',
+    'next_market_close',
 ]
@@ -0,0 +1,24 @@
+# _njit.py
+"""
+Numba兼容模块
+功能：提供可选的numba JIT装饰器，未安装numba时回退为普通Python函数
+"""
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """numba.njit的空实现：同时支持 @njit 和 @njit(...) 两种写法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
+
+
+__all__ = ['njit', 'prange', 'NUMBA_AVAILABLE']
@@ -0,0 +1,129 @@
+# cache.py
+"""
+磁盘缓存模块
+功能：按键把数据缓存到本地文件，过期后重新获取
+"""
+
+import os
+import re
+import pickle
+from datetime import datetime, timedelta, time
+from typing import Any, Callable, Union
+
+from .utils import get_next_trading_date
+
+# A股收盘时间
+_MARKET_CLOSE = time(15, 0)
+
+# 文件名中不允许出现的字符
+_UNSAFE_CHARS = re.compile(r'[^\w.\-]')
+
+
+def next_market_close(written_at: datetime) -> datetime:
+    """
+    行情缓存的过期时间：写入后的第一个收盘时刻
+    
+    收盘前写入的数据当天收盘后过期，收盘后写入的数据在下一个交易日收盘后过期。
+    
+    Args:
+        written_at: 写入时间
+        
+    Returns:
+        datetime: 过期时间
+    """
+    if written_at.time() < _MARKET_CLOSE:
+        return datetime.combine(written_at.date(), _MARKET_CLOSE)
+    next_date = datetime.strptime(get_next_trading_date(written_at.strftime('%Y%m%d')), '%Y%m%d')
+    return datetime.combine(next_date.date(), _MARKET_CLOSE)
+
+
+class DiskCache:
+    """磁盘缓存：每个键对应目录下的一个pickle文件，按文件修改时间判断是否过期"""
+    
+    def __init__(self, cache_dir: str,
+                 ttl: Union[timedelta, Callable[[datetime], datetime], None] = None):
+        """
+        Args:
+            cache_dir: 缓存目录，不存在时自动创建
+            ttl: 有效期。timedelta表示写入后的有效时长；
+                 函数表示由写入时间计算过期时间；None表示永不过期
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, _UNSAFE_CHARS.sub('_', key) + '.pkl')
+    
+    def _expired(self, written_at: datetime) -> bool:
+        if self.ttl is None:
+            return False
+        if isinstance(self.ttl, timedelta):
+            return datetime.now() >= written_at + self.ttl
+        return datetime.now() >= self.ttl(written_at)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        读取缓存
+        
+        Args:
+            key: 缓存键
+            default: 未命中或已过期时的返回值
+            
+        Returns:
+            缓存的数据
+        """
+        path = self._path(key)
+        try:
+            written_at = datetime.fromtimestamp(os.path.getmtime(path))
+            if self._expired(written_at):
+                return default
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return default
+    
+    def set(self, key: str, value: Any):
+        """
+        写入缓存（先写临时文件再替换，避免读到写了一半的文件）
+        
+        Args:
+            key: 缓存键
+            value: 可pickle的数据
+        """
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[警告] 写入缓存失败 {path}: {e}")
+    
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存，未命中时调用loader获取并写入缓存（loader返回None或空数据时不缓存）
+        
+        Args:
+            key: 缓存键
+            loader: 无参数的数据获取函数
+            
+        Returns:
+            缓存或新获取的数据
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        value = loader()
+        if value is not None and not _is_empty(value):
+            self.set(key, value)
+        return value
+
+
+def _is_empty(value: Any) -> bool:
+    """判断数据是否为空（DataFrame、dict、list等按长度判断）"""
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
@@ -6,6 +6,15 @@
 日期：2026.1.5
 """
 
+from typing import Final
+
+# 技术指标默认参数（模块级常量，供 ChartConfig.INDICATORS 引用）
+_MA_PERIODS: Final = (5, 10, 20)  # 均线周期
+_MACD_FAST: Final = 12
+_MACD_SLOW: Final = 26
+_MACD_SIGNAL: Final = 9
+_KDJ_PERIOD: Final = 9
+
 
 class ChartConfig:
     """图表配置类"""
@@ -49,11 +58,11 @@ class ChartConfig:
 
     # 技术指标参数
     INDICATORS = {
-        'ma_periods': [5, 10, 20],  # 均线周期
-        'macd_fast': 12,
-        'macd_slow': 26,
-        'macd_signal': 9,
-        'kdj_period': 9,
+        'ma_periods': _MA_PERIODS,  # 均线周期
+        'macd_fast': _MACD_FAST,
+        'macd_slow': _MACD_SLOW,
+        'macd_signal': _MACD_SIGNAL,
+        'kdj_period': _KDJ_PERIOD,
     }
 
 
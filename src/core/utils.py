@@ -6,10 +6,23 @@
 日期：2026.1.5
 """
 
+import re
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Iterable
+import numpy as np
 import pandas as pd
 
+# 股票代码格式：6位数字 + .SZ/.SH
+_STOCK_RE = re.compile(r'\d{6}\.(?:SZ|SH)')
+
+# 数字单位：(阈值/除数, 后缀)，从大到小排列
+_NUMBER_UNITS = ((1e8, '亿'), (1e4, '万'))
+
+# 日期格式
+_YMD = '%Y%m%d'
+_Y_M_D = '%Y-%m-%d'
+
 
 def format_date(date_input) -> str:
     """
@@ -25,23 +38,45 @@ def format_date(date_input) -> str:
         return None
     
     if isinstance(date_input, str):
-        # 如果是YYYY-MM-DD格式，转换为YYYYMMDD
-        if '-' in date_input:
-            try:
-                dt = datetime.strptime(date_input, '%Y-%m-%d')
-                return dt.strftime('%Y%m%d')
-            except:
-                pass
-        # 如果已经是YYYYMMDD格式，直接返回
-        elif len(date_input) == 8:
-            return date_input
+        return _format_date_str(date_input)
     
     if isinstance(date_input, datetime):
-        return date_input.strftime('%Y%m%d')
+        return date_input.strftime(_YMD)
     
     return str(date_input)
 
 
+@lru_cache(maxsize=4096)
+def _format_date_str(date_str: str) -> str:
+    """
+    格式化日期字符串为YYYYMMDD格式（结果缓存，回测中反复出现的日期只解析一次）
+    
+    Args:
+        date_str: YYYYMMDD或YYYY-MM-DD格式的日期字符串
+        
+    Returns:
+        str: YYYYMMDD格式的日期字符串，无法解析时原样返回
+    """
+    # 如果是YYYY-MM-DD格式，转换为YYYYMMDD
+    if '-' in date_str:
+        try:
+            return datetime.strptime(date_str, _Y_M_D).strftime(_YMD)
+        except ValueError:
+            pass
+    # YYYYMMDD格式或无法识别的格式，直接返回
+    return date_str
+
+
+def get_today() -> str:
+    """
+    获取当天日期（批量处理时在入口处调用一次，把结果传给逐只股票的处理）
+    
+    Returns:
+        str: YYYYMMDD格式的当天日期
+    """
+    return datetime.now().strftime(_YMD)
+
+
 def get_trading_days_count(start_date: str, end_date: str) -> int:
     """
     估算交易日数量（简单估算，不考虑节假日）
@@ -54,8 +89,8 @@ def get_trading_days_count(start_date: str, end_date: str) -> int:
         int: 估算的交易日数量
     """
     try:
-        start = datetime.strptime(start_date, '%Y%m%d')
-        end = datetime.strptime(end_date, '%Y%m%d')
+        start = datetime.strptime(start_date, _YMD)
+        end = datetime.strptime(end_date, _YMD)
         days = (end - start).days
         # 简单估算：约70%的日期是交易日
         trading_days = int(days * 0.7)
@@ -74,21 +109,20 @@ def validate_stock_code(stock_code: str) -> bool:
     Returns:
         bool: 是否有效
     """
-    if not stock_code or '.' not in stock_code:
-        return False
-    
-    parts = stock_code.split('.')
-    if len(parts) != 2:
-        return False
-    
-    code, market = parts
-    if market not in ['SZ', 'SH']:
-        return False
-    
-    if not code.isdigit() or len(code) != 6:
-        return False
+    return bool(_STOCK_RE.fullmatch(stock_code or ''))
+
+
+def validate_stock_codes(codes: Iterable[str]) -> np.ndarray:
+    """
+    批量验证股票代码格式
     
-    return True
+    Args:
+        codes: 股票代码序列
+        
+    Returns:
+        np.ndarray: 布尔数组，与codes一一对应
+    """
+    return pd.Series(list(codes), dtype=object).str.fullmatch(_STOCK_RE, na=False).to_numpy(dtype=bool)
 
 
 def get_next_trading_date(date_str: str) -> str:
@@ -102,10 +136,10 @@ def get_next_trading_date(date_str: str) -> str:
         str: 下一个交易日 YYYYMMDD
     """
     try:
-        dt = datetime.strptime(date_str, '%Y%m%d')
+        dt = datetime.strptime(date_str, _YMD)
         # 简单加1天，实际应该考虑交易日历
         next_date = dt + timedelta(days=1)
-        return next_date.strftime('%Y%m%d')
+        return next_date.strftime(_YMD)
     except:
         return date_str
 
@@ -121,15 +155,18 @@ def format_number(num: float, decimals: int = 2) -> str:
     Returns:
         str: 格式化后的字符串
     """
-    if pd.isna(num):
+    # NaN判断：float走快速路径，int不可能为NaN，其余类型（None、pd.NA等）交给pd.isna
+    if isinstance(num, float):
+        if num != num:
+            return 'N/A'
+    elif not isinstance(num, int) and pd.isna(num):
         return 'N/A'
     
     # 确保至少显示两位小数（即使decimals=0）
-    actual_decimals = max(decimals, 2) if decimals == 0 else decimals
+    actual_decimals = decimals if decimals else 2
     
-    if abs(num) >= 1e8:
-        return f"{num / 1e8:.{actual_decimals}f}亿"
-    elif abs(num) >= 1e4:
-        return f"{num / 1e4:.{actual_decimals}f}万"
-    else:
-        return f"{num:.{actual_decimals}f}"
+    abs_num = abs(num)
+    for threshold, suffix in _NUMBER_UNITS:
+        if abs_num >= threshold:
+            return f"{num / threshold:.{actual_decimals}f}{suffix}"
+    return f"{num:.{actual_decimals}f}"
@@ -0,0 +1,78 @@
+# _kernels.py
+"""
+选股计算内核模块
+功能：技术评分的编译内核（numba加速，未安装numba时按纯Python执行）
+"""
+
+import numpy as np
+
+from ..core._njit import njit, prange
+
+
+@njit(parallel=True, cache=True)
+def technical_scores(close, volume, ma5, ma10, ma20, dif, dea, macd, k, d, points):
+    """
+    多只股票的技术评分：按股票维度并行，每只股票只读取最新一根K线和最近20根K线
+
+    命中标记的列顺序与selector._TECHNICAL_RULES一致：
+    站上MA5/MA10/MA20、DIF>DEA、MACD柱>0、KDJ正常区间且K>D、KDJ超卖、放量、强势上涨、上涨
+
+    Args:
+        close: 收盘价矩阵（float64，shape为 (股票数, K线数)，K线数不少于20）
+        volume: 成交量矩阵（float64，shape同close）
+        ma5, ma10, ma20: 最新均线值（(股票数,) 数组，下同）
+        dif, dea, macd: 最新MACD指标值
+        k, d: 最新KDJ指标值
+        points: 各规则分值（int64，长度与规则数一致）
+
+    Returns:
+        tuple: (得分数组, 命中标记矩阵)，命中标记矩阵shape为 (股票数, 规则数)
+    """
+    n_symbols, n_bars = close.shape
+    scores = np.zeros(n_symbols, np.int64)
+    flags = np.zeros((n_symbols, points.shape[0]), np.bool_)
+    start = max(n_bars - 20, 0)
+
+    for s in prange(n_symbols):
+        price = close[s, n_bars - 1]
+
+        # 1. 价格相对均线位置（与NaN比较结果恒为False）
+        if not (np.isnan(ma5[s]) or np.isnan(ma10[s])):
+            flags[s, 0] = price > ma5[s]
+            flags[s, 1] = price > ma10[s]
+            flags[s, 2] = price > ma20[s]
+
+        # 2. MACD信号
+        if not (np.isnan(dif[s]) or np.isnan(dea[s])):
+            flags[s, 3] = dif[s] > dea[s]
+            flags[s, 4] = macd[s] > 0
+
+        # 3. KDJ信号
+        if not (np.isnan(k[s]) or np.isnan(d[s])):
+            flags[s, 5] = 20 < k[s] < 80 and k[s] > d[s]
+            flags[s, 6] = k[s] < 30
+
+        # 4. 成交量：最近20根K线均量（跳过NaN）
+        total = 0.0
+        count = 0
+        for i in range(start, n_bars):
+            v = volume[s, i]
+            if not np.isnan(v):
+                total += v
+                count += 1
+        if count > 0:
+            flags[s, 7] = volume[s, n_bars - 1] > total / count * 1.2
+
+        # 5. 趋势强度：强势上涨与上涨互斥，用比较结果直接赋值，不走if/elif分支
+        recent_returns = (price / close[s, start] - 1) * 100
+        strong_up = recent_returns > 5
+        flags[s, 8] = strong_up
+        flags[s, 9] = (recent_returns > 0) > strong_up
+
+        # 命中标记乘分值累加（布尔转整数），无分支
+        score = 0
+        for j in range(points.shape[0]):
+            score += flags[s, j] * points[j]
+        scores[s] = score
+
+    return scores, flags
@@ -10,32 +10,259 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import warnings
-import sys
 import os
 import pickle
+import hashlib
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import count, repeat
+import queue
+import threading
 # 延迟导入lightgbm，避免在模块加载时失败
 # import lightgbm 
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.data.market_data import MarketDataManager
-from src.data.financial_data import FinancialDataManager
-from src.analysis.technical import TechnicalIndicators
-from src.analysis.fundamental import FundamentalAnalyzer
-from src.analysis.factor_calculator import FactorCalculator
-from src.core.utils import validate_stock_code
+from ..data.market_data import MarketDataManager
+from ..data.financial_data import FinancialDataManager
+from ..analysis.technical import TechnicalIndicators
+from ..analysis.fundamental import FundamentalAnalyzer
+from ..analysis.factor_calculator import FactorCalculator
+from ..core.utils import validate_stock_code, get_today
+from ..core.cache import DiskCache, next_market_close
+from ._kernels import technical_scores
 
 warnings.filterwarnings('ignore')
 
+# 技术评分规则：(规则名, 分值, 得分明细键, 得分明细值)
+_TECHNICAL_RULES = (
+    ('above_ma5', 10, 'price_vs_ma5', 'above'),
+    ('above_ma10', 10, 'price_vs_ma10', 'above'),
+    ('above_ma20', 10, 'price_vs_ma20', 'above'),
+    ('macd_bullish', 10, 'macd_signal', 'bullish'),
+    ('macd_positive', 10, 'macd_bar', 'positive'),
+    ('kdj_normal', 10, 'kdj_signal', 'normal'),
+    ('kdj_oversold', 10, 'kdj_position', 'oversold'),
+    ('volume_up', 15, 'volume', 'increasing'),
+    ('trend_strong_up', 15, 'trend', 'strong_up'),
+    ('trend_up', 8, 'trend', 'up'),
+)
+_RULE_POINTS = np.array([rule[1] for rule in _TECHNICAL_RULES], dtype=np.int64)
+
+# 选股用到的财务字段：筛选、评分和结果输出（roa用于ML选股的基本面筛选）
+_FINANCIAL_FIELDS = ('pe', 'pb', 'roe', 'roa', 'profit_growth', 'revenue_growth', 'market_cap')
+
+# ML选股排除的板块代码首位：创业板(3)、北交所(4、8)；科创板(68)单独按前缀判断
+_EXCLUDED_FIRST_DIGITS = frozenset('348')
+
+
+def _top_k_frame(columns: Dict[str, np.ndarray], sort_key: str, k: int) -> pd.DataFrame:
+    """
+    按sort_key降序取前k行，返回pandas DataFrame（同分时保持原顺序）
+    
+    安装了polars（及其转换pandas所需的pyarrow）时用LazyFrame完成排序截取，
+    否则使用pandas的nlargest（部分排序）。
+    
+    Args:
+        columns: {列名: 数组}
+        sort_key: 排序列名
+        k: 保留行数
+        
+    Returns:
+        DataFrame: 前k行，索引为0..k-1
+    """
+    try:
+        import polars as pl
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return pd.DataFrame(columns).nlargest(k, sort_key).reset_index(drop=True)
+    
+    top = (pl.DataFrame(columns).lazy()
+           .sort(sort_key, descending=True, maintain_order=True)
+           .head(k)
+           .collect())
+    return top.to_pandas()
+
+
+# 进程池子进程内复用的选股器实例（由_init_worker创建）
+_worker_selector = None
+
+
+def _init_worker(cache_dir: Optional[str]):
+    """进程池初始化：每个子进程只创建一次选股器及其数据管理器"""
+    global _worker_selector
+    _worker_selector = StockSelector(cache_dir=cache_dir)
+
+
+def _fetch_financial(stock_code: str, auto_download: bool = True,
+                     day: Optional[str] = None) -> Optional[Dict]:
+    """
+    子进程任务：获取单只股票的财务数据（模块级函数，便于进程池序列化）
+    
+    Args:
+        stock_code: 股票代码
+        auto_download: 本地无数据时是否自动下载
+        day: 当天日期 YYYYMMDD，由主进程统一传入
+        
+    Returns:
+        Dict: 财务数据，无数据或出错时为None
+    """
+    return _worker_selector._try_get_financial_data(stock_code, auto_download, day)
+
+
+@lru_cache(maxsize=4)
+def _unpickle_model(model_path: str, mtime: float):
+    """
+    反序列化模型文件，按 (路径, 修改时间) 缓存
+    
+    同一进程内创建多个MLStockSelector时共享同一个模型对象，只读取一次文件；
+    模型文件被替换后修改时间变化，自动重新加载
+    """
+    with open(model_path, 'rb') as f:
+        return pickle.load(f)
+
+
+# 进程池子进程内复用的因子计算器实例（由_init_factor_worker创建）
+_worker_factor_calculator = None
+
+
+def _init_factor_worker():
+    """进程池初始化：每个子进程只创建一次因子计算器及其数据管理器"""
+    global _worker_factor_calculator
+    _worker_factor_calculator = FactorCalculator()
+
+
+def _calc_factors(stock_code: str, end_date: str) -> np.ndarray:
+    """
+    子进程任务：计算单只股票的全部因子（模块级函数，便于进程池序列化）
+    
+    Args:
+        stock_code: 股票代码
+        end_date: 截止日期
+        
+    Returns:
+        np.ndarray: 因子值数组，列顺序与FACTOR_LIST一致
+    """
+    return _worker_factor_calculator.calculate_all_factors_as_array(stock_code, end_date)
+
 
 class StockSelector:
     """A股选股器：基于财务数据和技术指标选股"""
     
-    def __init__(self):
-        """初始化选股器"""
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        初始化选股器
+        
+        Args:
+            cache_dir: 磁盘缓存目录（如 './.cache'），为None时不缓存。
+                       财务数据缓存90天，行情数据缓存到写入后的下一个收盘时刻
+        """
         self.market_data_manager = MarketDataManager()
         self.financial_data_manager = FinancialDataManager()
         self.indicator_calculator = TechnicalIndicators()
         self.fundamental_analyzer = FundamentalAnalyzer()
+        
+        # 技术得分的进程内缓存：参数中包含当天日期，跨交易日自动失效
+        self._technical_score_cached = lru_cache(maxsize=8192)(self._compute_technical_score)
+        
+        # 财务数据的进程内缓存：{(股票代码, 日期): 财务数据}，日期变化时整体清空
+        self._fin_memo: Dict[Tuple[str, str], Dict] = {}
+        self._fin_memo_day = None
+        
+        self._cache_dir = cache_dir
+        self._fin_cache = None
+        self._px_cache = None
+        if cache_dir:
+            self._fin_cache = DiskCache(os.path.join(cache_dir, 'fin'), ttl=timedelta(days=90))
+            self._px_cache = DiskCache(os.path.join(cache_dir, 'px'), ttl=next_market_close)
+    
+    def _get_financial_data(self, stock_code: str, auto_download: bool = True,
+                            day: Optional[str] = None) -> Optional[Dict]:
+        """
+        获取财务数据，依次查找进程内缓存、磁盘缓存（启用时），最后才请求数据源
+        
+        Args:
+            stock_code: 股票代码
+            auto_download: 本地无数据时是否自动下载
+            day: 当天日期 YYYYMMDD（进程内缓存的键），为None时取当天；批量获取时由调用方传入
+            
+        Returns:
+            Dict: 财务数据，获取失败返回None（None不会被缓存）
+        """
+        day = day or get_today()
+        if day != self._fin_memo_day:
+            self._fin_memo = {}
+            self._fin_memo_day = day
+        
+        key = (stock_code, day)
+        data = self._fin_memo.get(key)
+        if data is not None:
+            return data
+        
+        def load():
+            return self.financial_data_manager.get_financial_data(stock_code, auto_download=auto_download)
+        
+        data = load() if self._fin_cache is None else self._fin_cache.get_or_load(stock_code, load)
+        if data:
+            self._fin_memo[key] = data
+        return data
+    
+    def _get_local_data(self, stock_code: str, period: str,
+                        start_time: str, end_time: str) -> Optional[pd.DataFrame]:
+        """获取行情数据（启用缓存时优先读取磁盘缓存）"""
+        if self._px_cache is None:
+            return self.market_data_manager.get_local_data(stock_code, period, start_time, end_time)
+        return self._px_cache.get_or_load(
+            f'{stock_code}_{period}_{start_time}_{end_time}',
+            lambda: self.market_data_manager.get_local_data(stock_code, period, start_time, end_time))
+    
+    def _get_market_data_bulk(self, fields: List[str], stock_codes: List[str], period: str,
+                              start_time: str, end_time: str) -> Dict[str, pd.DataFrame]:
+        """批量获取行情数据（启用缓存时按股票列表的哈希缓存整批结果）"""
+        def load():
+            return xtdata.get_market_data(
+                field_list=fields, stock_list=stock_codes, period=period,
+                start_time=start_time, end_time=end_time
+            )
+        
+        if self._px_cache is None:
+            return load()
+        digest = hashlib.md5(','.join(stock_codes + fields).encode()).hexdigest()[:16]
+        return self._px_cache.get_or_load(f'bulk_{period}_{start_time}_{end_time}_{digest}', load)
+    
+    def _preload_panel(self, stock_list: List[str], start_time: str, end_time: str,
+                       period: str = '1d',
+                       fields: Tuple[str, ...] = ('close', 'high', 'low', 'volume')) -> Dict[str, pd.DataFrame]:
+        """
+        一次调用取回多只股票的行情面板
+        
+        Args:
+            stock_list: 股票列表
+            start_time: 开始日期 YYYYMMDD
+            end_time: 结束日期 YYYYMMDD
+            period: 数据周期
+            fields: 字段列表
+            
+        Returns:
+            Dict: {字段: DataFrame(index=日期, columns=股票代码)}，获取失败时为空字典
+        """
+        try:
+            market_data = self._get_market_data_bulk(list(fields), list(stock_list), period,
+                                                     start_time, end_time)
+        except Exception as e:
+            print(f"[错误] 批量获取行情数据失败: {e}")
+            return {}
+        if not market_data:
+            return {}
+        # xtdata返回 index=股票代码、columns=日期，转置为按股票取列
+        return {field: frame.T for field, frame in market_data.items()}
+    
+    @staticmethod
+    def _slice_panel(panel: Dict[str, pd.DataFrame], stock_code: str) -> Optional[pd.DataFrame]:
+        """从行情面板中切出单只股票的数据（去掉无收盘价的K线），面板中没有该股票时返回None"""
+        if stock_code not in panel['close'].columns:
+            return None
+        data = pd.DataFrame({field: frame[stock_code] for field, frame in panel.items()})
+        return data[data['close'].notna()]
     
     def get_a_stock_list(self) -> List[str]:
         """
@@ -59,11 +286,10 @@ class StockSelector:
                         '000858.SZ', '002352.SZ', '600036.SH', '000063.SZ'
                     ]
             
-            # 过滤A股（确保格式正确）
-            a_stocks = []
-            for stock in stock_list:
-                if isinstance(stock, str) and (stock.endswith('.SZ') or stock.endswith('.SH')):
-                    a_stocks.append(stock)
+            # 过滤A股（确保格式正确）：整列字符串后缀匹配，非字符串元素转为str后不会匹配
+            codes = np.asarray(stock_list, dtype=str)
+            mask = np.char.endswith(codes, '.SZ') | np.char.endswith(codes, '.SH')
+            a_stocks = codes[mask].tolist()
             
             print(f"[成功] 获取到 {len(a_stocks)} 只A股")
             return a_stocks
@@ -73,108 +299,359 @@ class StockSelector:
             return []
     
     def get_technical_score(self, stock_code: str, period: str = "1d",
-                           lookback_days: int = 60) -> Optional[Dict]:
+                           lookback_days: int = 60, min_technical_score: float = 0,
+                           panel: Dict[str, pd.DataFrame] = None) -> Optional[Dict]:
         """
-        计算技术指标得分
+        计算技术指标得分（同一交易日内按 (股票代码, 周期, 回看天数) 缓存结果）
         
         Args:
             stock_code: 股票代码
             period: 数据周期
             lookback_days: 回看天数
+            min_technical_score: 最低技术得分。已确定达不到时提前结束计算，
+                                 此时返回的得分只包含已计算的规则（仍低于该值）
+            panel: _preload_panel预加载的行情面板，提供时直接从中切片该股票的数据，不再单独获取
             
         Returns:
             Dict: 技术指标得分
         """
         try:
-            # 获取历史数据
-            end_time = datetime.now().strftime('%Y%m%d')
-            start_time = (datetime.now() - timedelta(days=lookback_days + 30)).strftime('%Y%m%d')
-            
-            data = self.market_data_manager.get_local_data(stock_code, period, start_time, end_time)
-            
-            if data is None or data.empty or len(data) < 20:
-                return None
-            
-            # 计算技术指标
-            indicators = self.indicator_calculator.calculate_all(data)
-            
-            # 获取最新数据
-            latest_data = data.iloc[-1]
-            latest_ma = indicators['ma'].iloc[-1]
-            latest_macd = indicators['macd'].iloc[-1]
-            latest_kdj = indicators['kdj'].iloc[-1]
-            
-            score = 0
-            details = {}
-            
-            # 1. 价格相对均线位置（0-30分）
-            if not pd.isna(latest_ma['MA5']) and not pd.isna(latest_ma['MA10']):
-                if latest_data['close'] > latest_ma['MA5']:
-                    score += 10
-                    details['price_vs_ma5'] = 'above'
-                if latest_data['close'] > latest_ma['MA10']:
-                    score += 10
-                    details['price_vs_ma10'] = 'above'
-                if latest_data['close'] > latest_ma['MA20']:
-                    score += 10
-                    details['price_vs_ma20'] = 'above'
+            if panel is not None:
+                result = self._score_frame(self._slice_panel(panel, stock_code), min_technical_score)
+            else:
+                end_time = get_today()
+                result = self._technical_score_cached(stock_code, period, lookback_days, end_time,
+                                                      min_technical_score)
+        except Exception as e:
+            print(f"[错误] 计算 {stock_code} 技术得分失败: {e}")
+            return None
+        
+        if result is None:
+            return None
+        
+        # 缓存的是不可变元组，每次调用都解包为新的字典，调用方修改返回值不影响缓存
+        score, details, latest_price, ma5, ma10, ma20 = result
+        return {
+            'score': score,
+            'max_score': 100,
+            'details': dict(details),
+            'latest_price': latest_price,
+            'ma5': ma5,
+            'ma10': ma10,
+            'ma20': ma20,
+        }
+    
+    def _compute_technical_score(self, stock_code: str, period: str, lookback_days: int,
+                                 end_time: str, min_technical_score: float = 0) -> Optional[Tuple]:
+        """
+        获取行情并计算单只股票的技术得分（由 _technical_score_cached 缓存，参数均可哈希）
+        
+        Args:
+            stock_code: 股票代码
+            period: 数据周期
+            lookback_days: 回看天数
+            end_time: 截止日期 YYYYMMDD
+            min_technical_score: 最低技术得分，用于提前结束计算
             
-            # 2. MACD信号（0-20分）
-            if not pd.isna(latest_macd['DIF']) and not pd.isna(latest_macd['DEA']):
-                if latest_macd['DIF'] > latest_macd['DEA']:
-                    score += 10
-                    details['macd_signal'] = 'bullish'
-                if latest_macd['MACD'] > 0:
-                    score += 10
-                    details['macd_bar'] = 'positive'
+        Returns:
+            Tuple: (得分, 得分明细项元组, 最新价, MA5, MA10, MA20)，数据不足时返回None
+        """
+        # 获取历史数据
+        start_time = (datetime.strptime(end_time, '%Y%m%d')
+                      - timedelta(days=lookback_days + 30)).strftime('%Y%m%d')
+        
+        data = self._get_local_data(stock_code, period, start_time, end_time)
+        return self._score_frame(data, min_technical_score)
+    
+    def _score_frame(self, data: Optional[pd.DataFrame], min_technical_score: float = 0) -> Optional[Tuple]:
+        """
+        按单只股票的行情数据计算技术得分
+        
+        Args:
+            data: 行情数据，包含 high/low/close/volume 列
+            min_technical_score: 最低技术得分，用于提前结束计算
             
-            # 3. KDJ信号（0-20分）
-            if not pd.isna(latest_kdj['K']) and not pd.isna(latest_kdj['D']):
-                k = latest_kdj['K']
-                d = latest_kdj['D']
-                if 20 < k < 80 and k > d:  # 正常区间且K>D
-                    score += 10
-                    details['kdj_signal'] = 'normal'
-                if k < 30:  # 超卖区域
-                    score += 10
-                    details['kdj_position'] = 'oversold'
+        Returns:
+            Tuple: (得分, 得分明细项元组, 最新价, MA5, MA10, MA20)，数据不足时返回None
+        """
+        if data is None or data.empty or len(data) < 20:
+            return None
+        
+        # 价格与成交量只转换一次为ndarray，按1行矩阵计算，与批量评分共用同一套代码
+        high, low, close, volume = (data[field].to_numpy(dtype=np.float64)[np.newaxis]
+                                    for field in ('high', 'low', 'close', 'volume'))
+        
+        # 只计算评分用到的均线、MACD、KDJ在最新一根K线的值，不构建指标DataFrame
+        scores, rules, latest = self._score_staged(high, low, close, volume, min_technical_score)
+        details = tuple((key, value) for name, _, key, value in _TECHNICAL_RULES if rules[name][0])
+        ma5, ma10, ma20 = (float(latest[name][0]) for name in ('MA5', 'MA10', 'MA20'))
+        
+        return (
+            int(scores[0]),
+            details,
+            float(close[0, -1]),
+            None if np.isnan(ma5) else ma5,
+            None if np.isnan(ma10) else ma10,
+            None if np.isnan(ma20) else ma20,
+        )
+    
+    @staticmethod
+    def _score_latest_batch(close: np.ndarray, volume: np.ndarray,
+                            latest: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        计算多只股票的技术得分（满分100）
+        
+        Args:
+            close: 收盘价矩阵，shape为 (股票数, K线数)
+            volume: 成交量矩阵，shape同close
+            latest: 最新一根K线的指标值，{指标名: (股票数,) 数组}，
+                    至少包含 MA5、MA10、MA20、DIF、DEA、MACD、K、D
             
-            # 4. 成交量（0-15分）
-            avg_volume = data['volume'].tail(20).mean()
-            if latest_data['volume'] > avg_volume * 1.2:
-                score += 15
-                details['volume'] = 'increasing'
+        Returns:
+            Tuple: (得分数组, {规则名: 是否命中的布尔数组})，规则名见 _TECHNICAL_RULES
+        """
+        vectors = (np.ascontiguousarray(latest[name], dtype=np.float64)
+                   for name in ('MA5', 'MA10', 'MA20', 'DIF', 'DEA', 'MACD', 'K', 'D'))
+        scores, flags = technical_scores(
+            np.ascontiguousarray(close, dtype=np.float64),
+            np.ascontiguousarray(volume, dtype=np.float64),
+            *vectors, _RULE_POINTS
+        )
+        rules = {rule[0]: flags[:, j] for j, rule in enumerate(_TECHNICAL_RULES)}
+        return scores, rules
+    
+    def _score_staged(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                      volume: np.ndarray, min_technical_score: float = 0
+                      ) -> Tuple[np.ndarray, Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        分阶段计算技术得分，已不可能达到min_technical_score的股票提前结束
+        
+        第一阶段计算均线、成交量、趋势（共60分），之后依次计算MACD（20分）、KDJ（20分），
+        每个阶段只对 当前得分 + 剩余规则满分 >= min_technical_score 的股票继续计算。
+        提前结束的股票得分只是已计算规则的得分，但必然低于min_technical_score。
+        
+        Args:
+            high, low, close, volume: 价格、成交量矩阵，shape为 (股票数, K线数)
+            min_technical_score: 最低技术得分，不大于0时计算全部规则
             
-            # 5. 趋势强度（0-15分）
-            if len(data) >= 20:
-                recent_returns = (data['close'].iloc[-1] / data['close'].iloc[-20] - 1) * 100
-                if recent_returns > 5:
-                    score += 15
-                    details['trend'] = 'strong_up'
-                elif recent_returns > 0:
-                    score += 8
-                    details['trend'] = 'up'
+        Returns:
+            Tuple: (得分数组, {规则名: 布尔数组}, {指标名: 最新指标值数组})
+        """
+        n_symbols = close.shape[0]
+        latest = self.indicator_calculator.calculate_latest_batch(high, low, close, indicators=('ma',))
+        for name in ('DIF', 'DEA', 'MACD', 'K', 'D', 'J'):
+            latest[name] = np.full(n_symbols, np.nan)  # 未计算的指标为NaN，对应规则不得分
+        scores, rules = self._score_latest_batch(close, volume, latest)
+        
+        # (指标组, 本阶段之前尚未计分的规则满分)
+        for group, remaining in (('macd', 40), ('kdj', 20)):
+            alive = scores + remaining >= min_technical_score
+            if not alive.any():
+                break
+            if alive.all():
+                latest.update(self.indicator_calculator.calculate_latest_batch(
+                    high, low, close, indicators=(group,)))
+                scores, rules = self._score_latest_batch(close, volume, latest)
+                continue
             
-            return {
-                'score': score,
-                'max_score': 100,
-                'details': details,
-                'latest_price': float(latest_data['close']),
-                'ma5': float(latest_ma['MA5']) if not pd.isna(latest_ma['MA5']) else None,
-                'ma10': float(latest_ma['MA10']) if not pd.isna(latest_ma['MA10']) else None,
-                'ma20': float(latest_ma['MA20']) if not pd.isna(latest_ma['MA20']) else None,
-            }
+            part = self.indicator_calculator.calculate_latest_batch(
+                high[alive], low[alive], close[alive], indicators=(group,))
+            for name, values in part.items():
+                latest[name][alive] = values
+            scores[alive], part_rules = self._score_latest_batch(
+                close[alive], volume[alive], {name: values[alive] for name, values in latest.items()})
+            for name, flags in part_rules.items():
+                rules[name][alive] = flags
+        
+        return scores, rules, latest
+    
+    def get_technical_scores_bulk(self, stock_codes: List[str], period: str = "1d",
+                                  lookback_days: int = 60,
+                                  min_technical_score: float = 0) -> pd.DataFrame:
+        """
+        一次性获取多只股票的行情并计算技术得分
+        
+        所有股票的行情通过一次 xtdata.get_market_data 调用取回，按字段堆叠成
+        (股票数, K线数) 矩阵后统一计算指标，得分规则与get_technical_score一致。
+        
+        Args:
+            stock_codes: 股票代码列表
+            period: 数据周期
+            lookback_days: 回看天数
+            min_technical_score: 最低技术得分，已确定达不到的股票提前结束计算（见_score_staged）
             
+        Returns:
+            DataFrame: 以股票代码为索引，列为 score、latest_price、ma5、ma10、ma20，
+                       以及 _TECHNICAL_RULES 中各规则是否命中的布尔列；
+                       有效K线不足20根或无数据的股票不在结果中
+        """
+        columns = ['score', 'latest_price', 'ma5', 'ma10', 'ma20']
+        stock_codes = list(stock_codes)
+        if not stock_codes:
+            return pd.DataFrame(columns=columns)
+        
+        end_time = get_today()
+        start_time = (datetime.strptime(end_time, '%Y%m%d') - timedelta(days=lookback_days + 30)).strftime('%Y%m%d')
+        
+        fields = ['high', 'low', 'close', 'volume']
+        try:
+            market_data = self._get_market_data_bulk(fields, stock_codes, period, start_time, end_time)
         except Exception as e:
-            print(f"[错误] 计算 {stock_code} 技术得分失败: {e}")
+            print(f"[错误] 批量获取行情数据失败: {e}")
+            return pd.DataFrame(columns=columns)
+        
+        if not market_data or any(field not in market_data for field in fields):
+            return pd.DataFrame(columns=columns)
+        
+        # 各字段为 index=股票代码、columns=日期 的DataFrame，按同一股票顺序堆叠成矩阵
+        high, low, close, volume = (
+            market_data[field].reindex(index=stock_codes).to_numpy(dtype=np.float64)
+            for field in fields
+        )
+        
+        # 停牌/未上市的K线为NaN：把每行的有效K线稳定地移到行尾，
+        # 使每行末尾的连续K线与单只股票取到的数据一致
+        valid = ~np.isnan(close)
+        order = np.argsort(valid, axis=1, kind='stable')
+        high, low, close, volume = (np.take_along_axis(arr, order, axis=1)
+                                    for arr in (high, low, close, volume))
+        
+        keep = valid.sum(axis=1) >= 20
+        codes = [code for code, ok in zip(stock_codes, keep) if ok]
+        high, low, close, volume = high[keep], low[keep], close[keep], volume[keep]
+        if not codes:
+            return pd.DataFrame(columns=columns)
+        
+        scores, rules, latest = self._score_staged(high, low, close, volume, min_technical_score)
+        
+        return pd.DataFrame({
+            'score': scores,
+            'latest_price': close[:, -1],
+            'ma5': latest['MA5'],
+            'ma10': latest['MA10'],
+            'ma20': latest['MA20'],
+            **rules,
+        }, index=pd.Index(codes, name='stock_code'))
+    
+    def _try_get_financial_data(self, stock_code: str, auto_download: bool = True,
+                                day: Optional[str] = None) -> Optional[Dict]:
+        """获取财务数据，出错时返回None"""
+        try:
+            return self._get_financial_data(stock_code, auto_download, day)
+        except Exception:
             return None
     
+    def _iter_financial_threaded(self, stock_list: List[str], threads: int,
+                                 auto_download: bool = True, day: Optional[str] = None):
+        """
+        多线程获取财务数据：取数线程把结果放入有界队列，调用方边取边处理，网络等待与处理重叠
+        
+        Args:
+            stock_list: 股票列表
+            threads: 取数线程数
+            auto_download: 本地无数据时是否自动下载
+            day: 当天日期 YYYYMMDD
+            
+        Yields:
+            tuple: (股票在stock_list中的位置, 财务数据)，按完成顺序产出
+        """
+        tasks = queue.Queue()
+        for item in enumerate(stock_list):
+            tasks.put(item)
+        # 有界队列：处理跟不上时取数线程阻塞，避免结果无限堆积
+        results = queue.Queue(maxsize=64)
+        stop = threading.Event()
+        
+        def fetch():
+            while not stop.is_set():
+                try:
+                    i, stock_code = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                item = (i, self._try_get_financial_data(stock_code, auto_download, day))
+                while not stop.is_set():
+                    try:
+                        results.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+        
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for _ in range(threads):
+                pool.submit(fetch)
+            try:
+                for _ in range(len(stock_list)):
+                    yield results.get()
+            finally:
+                # 调用方提前结束时通知取数线程退出，保证线程池能正常关闭
+                stop.set()
+    
+    def _get_financial_frame(self, stock_list: List[str], workers: int = 1,
+                             threads: int = 1, auto_download: bool = True) -> pd.DataFrame:
+        """
+        获取多只股票的财务数据并整理为DataFrame
+        
+        Args:
+            stock_list: 股票列表
+            workers: 进程数，大于1时使用进程池并行获取
+            threads: 取数线程数，workers不大于1且threads大于1时使用多线程获取
+            auto_download: 本地无数据时是否自动下载
+            
+        Returns:
+            DataFrame: 以股票代码为索引，列为 _FINANCIAL_FIELDS 中的财务字段（float64，缺失为NaN），
+                       每行一只股票；无数据的股票不在结果中
+        """
+        total = len(stock_list)
+        day = get_today()
+        executor = None
+        fetched = None
+        if workers > 1 and total > workers:
+            # 使用spawn启动子进程：numba并行线程池（如TBB）不支持fork，fork后进程退出时可能卡死
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker, initargs=(self._cache_dir,))
+            fetched = enumerate(executor.map(_fetch_financial, stock_list, repeat(auto_download),
+                                             repeat(day), chunksize=32))
+        elif threads > 1 and total > 1:
+            fetched = self._iter_financial_threaded(stock_list, min(threads, total), auto_download, day)
+        else:
+            fetched = enumerate(map(self._try_get_financial_data, stock_list, repeat(auto_download),
+                                    repeat(day)))
+        
+        # 按股票位置写入预分配的数值矩阵，不构建逐只股票的字典列表
+        values = np.full((total, len(_FINANCIAL_FIELDS)), np.nan)
+        has_data = np.zeros(total, dtype=bool)
+        try:
+            for done, (i, financial_data) in enumerate(fetched, 1):
+                if done % 100 == 0:
+                    print(f"进度: {done}/{total} ({done/total*100:.1f}%)")
+                if not financial_data:
+                    continue
+                has_data[i] = True
+                row = [financial_data.get(field) for field in _FINANCIAL_FIELDS]
+                try:
+                    values[i] = row  # None按NaN写入
+                except (TypeError, ValueError):
+                    # 个别字段不是数值时逐个转换，无法转换的按缺失处理
+                    values[i] = pd.to_numeric(pd.Series(row, dtype=object), errors='coerce')
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if hasattr(fetched, 'close'):
+                fetched.close()
+        
+        codes = np.asarray(stock_list, dtype=object)[has_data]
+        return pd.DataFrame(values[has_data], index=pd.Index(codes, name='stock_code'),
+                            columns=list(_FINANCIAL_FIELDS))
+    
     def select_stocks(self, 
                      stock_list: List[str] = None,
                      financial_filters: Dict = None,
                      technical_filters: Dict = None,
                      min_total_score: float = 60.0,
-                     max_results: int = 50) -> pd.DataFrame:
+                     max_results: int = 50,
+                     workers: int = 1,
+                     threads: int = 8) -> pd.DataFrame:
         """
         选股主函数
         
@@ -184,6 +661,8 @@ class StockSelector:
             technical_filters: 技术筛选条件
             min_total_score: 最小总分（财务+技术）
             max_results: 最大返回结果数
+            workers: 获取财务数据的进程数，大于1时使用进程池并行（子进程各自连接数据源）
+            threads: 获取财务数据的线程数（workers不大于1时生效），取数与处理通过有界队列重叠
             
         Returns:
             DataFrame: 选股结果
@@ -212,126 +691,103 @@ class StockSelector:
                 'require_above_ma20': False
             }
         
-        results = []
         total = len(stock_list)
         
         print(f"\n开始选股，共 {total} 只股票...")
         print("=" * 60)
         
-        for i, stock_code in enumerate(stock_list, 1):
-            if i % 100 == 0:
-                print(f"进度: {i}/{total} ({i/total*100:.1f}%)")
-            
-            try:
-                # 1. 获取财务数据
-                financial_data = self.financial_data_manager.get_financial_data(stock_code)
-                
-                # 财务筛选
-                if not financial_data:
-                    continue
-                
-                # 应用财务筛选条件
-                pe = financial_data.get('pe')
-                pb = financial_data.get('pb')
-                roe = financial_data.get('roe')
-                profit_growth = financial_data.get('profit_growth')
-                
-                if pe is not None:
-                    if pe < financial_filters['min_pe'] or pe > financial_filters['max_pe']:
-                        continue
-                if pb is not None:
-                    if pb < financial_filters['min_pb'] or pb > financial_filters['max_pb']:
-                        continue
-                if roe is not None:
-                    if roe < financial_filters['min_roe']:
-                        continue
-                if profit_growth is not None:
-                    if profit_growth < financial_filters['min_profit_growth']:
-                        continue
-                
-                # 2. 计算财务得分
-                financial_score_data = self.fundamental_analyzer.calculate_financial_score(financial_data)
-                if financial_score_data is None:
-                    continue
-                
-                financial_score = financial_score_data['score']
-                
-                # 3. 获取技术得分
-                technical_score_data = self.get_technical_score(stock_code)
-                
-                if technical_score_data is None:
-                    continue
-                
-                technical_score = technical_score_data['score']
-                
-                # 技术筛选
-                if technical_score < technical_filters['min_technical_score']:
-                    continue
-                
-                if technical_filters['require_above_ma20']:
-                    if technical_score_data.get('ma20') is None:
-                        continue
-                    if technical_score_data['latest_price'] <= technical_score_data['ma20']:
-                        continue
-                
-                # 4. 计算总分
-                total_score = financial_score * 0.6 + technical_score * 0.4
-                
-                if total_score < min_total_score:
-                    continue
-                
-                # 5. 保存结果
-                result = {
-                    'stock_code': stock_code,
-                    'financial_score': financial_score,
-                    'technical_score': technical_score,
-                    'total_score': total_score,
-                    'pe': financial_data.get('pe'),
-                    'pb': financial_data.get('pb'),
-                    'roe': financial_data.get('roe'),
-                    'profit_growth': financial_data.get('profit_growth'),
-                    'revenue_growth': financial_data.get('revenue_growth'),
-                    'latest_price': technical_score_data.get('latest_price'),
-                    'market_cap': financial_data.get('market_cap'),
-                }
-                
-                results.append(result)
-                
-            except Exception as e:
-                # 跳过出错的股票
-                continue
+        # 1. 获取全部股票的财务数据，整列向量化筛选
+        financial_df = self._get_financial_frame(stock_list, workers, threads)
+        if financial_df.empty:
+            print("\n[错误] 未获取到财务数据")
+            return pd.DataFrame()
         
-        # 转换为DataFrame并排序
-        if results:
-            df = pd.DataFrame(results)
-            df = df.sort_values('total_score', ascending=False)
-            df = df.head(max_results)
-            
-            print(f"\n[成功] 选股完成，共选出 {len(df)} 只股票")
-            return df
-        else:
+        mask = self.fundamental_analyzer.filter_financial_data_batch(financial_df, financial_filters)
+        financial_df = financial_df[mask]
+        print(f"[信息] 财务筛选后: {len(financial_df)} 只")
+        if financial_df.empty:
             print("\n[错误] 未选出符合条件的股票")
             return pd.DataFrame()
+        
+        # 2. 批量计算财务得分
+        financial_score = self.fundamental_analyzer.calculate_financial_scores_batch(financial_df)['score'].to_numpy()
+        
+        # 3. 只对通过财务筛选的股票批量获取行情并计算技术得分，按股票代码对齐
+        technical = self.get_technical_scores_bulk(
+            financial_df.index.tolist(), min_technical_score=technical_filters['min_technical_score']
+        ).reindex(financial_df.index)
+        technical_score = technical['score'].to_numpy(dtype=np.float64)
+        latest_price = technical['latest_price'].to_numpy(dtype=np.float64)
+        
+        # 技术筛选（无行情数据的股票得分为NaN，比较结果为False，一并剔除）
+        keep = technical_score >= technical_filters['min_technical_score']
+        if technical_filters['require_above_ma20']:
+            keep &= latest_price > technical['ma20'].to_numpy(dtype=np.float64)
+        
+        # 4. 计算总分
+        total_score = financial_score * 0.6 + technical_score * 0.4
+        keep &= total_score >= min_total_score
+        
+        if not keep.any():
+            print("\n[错误] 未选出符合条件的股票")
+            return pd.DataFrame()
+        
+        # 5. 整理结果，取总分最高的max_results只
+        # 各列直接给定dtype：得分和财务比率用float32（缺失为NaN），
+        # 价格和市值保留float64（价格用于下单，市值数量级超出float32的有效位数）
+        selected = financial_df[keep]
+        df = _top_k_frame({
+            'stock_code': selected.index.to_numpy(dtype=object),
+            'financial_score': financial_score[keep].astype(np.float32),
+            'technical_score': technical_score[keep].astype(np.int64),
+            'total_score': total_score[keep].astype(np.float32),
+            'pe': selected['pe'].to_numpy(dtype=np.float32),
+            'pb': selected['pb'].to_numpy(dtype=np.float32),
+            'roe': selected['roe'].to_numpy(dtype=np.float32),
+            'profit_growth': selected['profit_growth'].to_numpy(dtype=np.float32),
+            'revenue_growth': selected['revenue_growth'].to_numpy(dtype=np.float32),
+            'latest_price': latest_price[keep].astype(np.float64),
+            'market_cap': selected['market_cap'].to_numpy(dtype=np.float64),
+        }, 'total_score', max_results)
+        
+        print(f"\n[成功] 选股完成，共选出 {len(df)} 只股票")
+        return df
     
-    def save_selection_result(self, result_df: pd.DataFrame, filename: str = None):
+    def save_selection_result(self, result_df: pd.DataFrame, filename: str = None,
+                              fmt: str = 'parquet'):
         """
         保存选股结果
         
         Args:
             result_df: 选股结果DataFrame
-            filename: 文件名，如果为None则自动生成
+            filename: 文件名，如果为None则自动生成；扩展名按fmt替换
+            fmt: 文件格式，'parquet'（zstd压缩，需要pyarrow，未安装时改存CSV）或 'csv'
         """
         if result_df.empty:
             print("[错误] 选股结果为空，无法保存")
             return
         
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                print("[警告] 未安装pyarrow，选股结果改为保存CSV")
+                fmt = 'csv'
+        
         if filename is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f'stock_selection_{timestamp}.csv'
+            filename = f'stock_selection_{timestamp}.{fmt}'
+        else:
+            root, ext = os.path.splitext(filename)
+            if ext.lower() in ('.csv', '.parquet'):
+                filename = f'{root}.{fmt}'
         
         os.makedirs('./data', exist_ok=True)
         filepath = f'./data/{filename}'
-        result_df.to_csv(filepath, index=False, encoding='utf-8-sig')
+        if fmt == 'parquet':
+            result_df.to_parquet(filepath, index=False, compression='zstd', engine='pyarrow')
+        else:
+            result_df.to_csv(filepath, index=False, encoding='utf-8-sig')
         print(f"[成功] 选股结果已保存: {filepath}")
 
 
@@ -355,11 +811,25 @@ class MLStockSelector(StockSelector):
         
         # ML模型类别（必须和训练时一致）
         self.model_classes = np.array([0, 0.3, 0.6, 0.9, 1.2, 1.5, 1.8, 2.1])
+        self._model_classes_f32 = self.model_classes.astype(np.float32)
+    
+    def _predict_scores(self, factors: np.ndarray) -> np.ndarray:
+        """
+        模型预测得分：各类别概率 @ 类别向量
+        
+        Args:
+            factors: 因子矩阵，shape为 (股票数, 因子数)，列顺序与FACTOR_LIST一致
+            
+        Returns:
+            np.ndarray: 每只股票的预测得分（float32）
+        """
+        # 连续的float32矩阵，LightGBM直接使用而不再转换；NaN保留，由模型按缺失值处理
+        X = np.ascontiguousarray(factors, dtype=np.float32)
+        predictions = self.model.predict_proba(X)
+        return predictions.astype(np.float32, copy=False) @ self._model_classes_f32
     
     def _load_model(self, model_path: str):
         """加载模型文件"""
-        import pickle
-        import os
         import sys
         
         # 检查必要的依赖
@@ -400,8 +870,7 @@ class MLStockSelector(StockSelector):
             model_path = os.path.join(project_root, model_path)
         
         try:
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
+            model = _unpickle_model(model_path, os.path.getmtime(model_path))
             print(f"[成功] 模型加载成功: {model_path}")
             return model
         except ModuleNotFoundError as e:
@@ -436,7 +905,7 @@ class MLStockSelector(StockSelector):
                 from xtquant import xtdata
                 # 尝试使用sector方式获取
                 stock_list = xtdata.get_stock_list_in_sector('沪深A股')
-                return [s for s in stock_list if isinstance(s, str) and (s.endswith('.SZ') or s.endswith('.SH'))]
+                return [s for s in stock_list if isinstance(s, str) and s[-3:] in ('.SZ', '.SH')]
             except:
                 # 如果失败，使用父类方法获取所有A股
                 return self.get_a_stock_list()
@@ -461,113 +930,55 @@ class MLStockSelector(StockSelector):
     
     def _filter_kcbj_stock(self, stock_list: List[str]) -> List[str]:
         """过滤科创、北交、创业板股票"""
-        filtered = []
-        for stock in stock_list:
-            # 过滤科创(68开头)、北交(4、8开头)、创业板(3开头)
-            if stock[0] not in ['3', '4', '8'] and not stock.startswith('68'):
-                filtered.append(stock)
-        return filtered
-    
-    def _filter_paused_stock(self, stock_list: List[str], end_date: str = None) -> List[str]:
-        """过滤停牌股票"""
-        try:
-            # 获取最新数据，如果获取失败可能是停牌
-            filtered = []
-            for stock in stock_list:
-                try:
-                    # 尝试获取最近1天的数据
-                    if end_date:
-                        data = self.market_data_manager.get_local_data(stock, '1d', end_date, end_date)
-                    else:
-                        # 使用当前日期
-                        today = datetime.now().strftime('%Y%m%d')
-                        data = self.market_data_manager.get_local_data(stock, '1d', today, today)
-                    
-                    if data is not None and not data.empty:
-                        filtered.append(stock)
-                except:
-                    continue
-            return filtered
-        except:
-            return stock_list
+        # 过滤科创(68开头)、北交(4、8开头)、创业板(3开头)
+        return [stock for stock in stock_list
+                if stock[0] not in _EXCLUDED_FIRST_DIGITS and not stock.startswith('68')]
     
-    def _filter_new_stock(self, stock_list: List[str], end_date: str = None) -> List[str]:
-        """过滤次新股（上市不足375天）"""
-        if end_date is None:
-            end_date = datetime.now().strftime('%Y%m%d')
-        
-        end_dt = datetime.strptime(end_date, '%Y%m%d')
-        filtered = []
+    def _filter_tradeable(self, stock_list: List[str], end_date: str = None,
+                          hold_stocks: List[str] = None) -> List[str]:
+        """
+        过滤当日不可交易的股票：停牌、涨停、跌停（涨跌停的已持仓股票保留）
         
-        for stock in stock_list:
-            try:
-                # 获取股票信息（需要适配XTquant API）
-                # 暂时跳过此过滤，因为XTquant可能不提供上市日期
-                filtered.append(stock)
-            except:
-                continue
+        Args:
+            stock_list: 股票列表
+            end_date: 日期 YYYYMMDD，为None时取当天
+            hold_stocks: 已持仓股票列表
+            
+        Returns:
+            List[str]: 可交易的股票列表，保持原顺序
+        """
+        if not stock_list:
+            return []
+        day = end_date or get_today()
         
-        return filtered
-    
-    def _filter_limitup_stock(self, stock_list: List[str], end_date: str = None, 
-                              hold_stocks: List[str] = None) -> List[str]:
-        """过滤涨停股票（已持仓的除外）"""
-        if hold_stocks is None:
-            hold_stocks = []
+        # 一次批量获取全部股票当日行情，按截面整列判断
+        panel = self._preload_panel(stock_list, day, day, fields=('close', 'preClose', 'volume'))
+        if not panel or panel['close'].empty:
+            return []
+        close, pre_close, volume = (
+            panel[field].iloc[-1].reindex(stock_list).to_numpy(dtype=float)
+            for field in ('close', 'preClose', 'volume')
+        )
         
-        filtered = []
-        for stock in stock_list:
-            if stock in hold_stocks:
-                filtered.append(stock)
-                continue
-            
-            try:
-                # 获取最新价格
-                if end_date:
-                    data = self.market_data_manager.get_local_data(stock, '1d', end_date, end_date)
-                else:
-                    today = datetime.now().strftime('%Y%m%d')
-                    data = self.market_data_manager.get_local_data(stock, '1d', today, today)
-                
-                if data is None or data.empty:
-                    continue
-                
-                # XTquant可能不直接提供涨停价，这里需要从市场数据判断
-                # 暂时允许所有股票，后续可以优化
-                filtered.append(stock)
-            except:
-                continue
+        # 无收盘价或成交量为0视为停牌
+        paused = np.isnan(close) | (volume == 0)
+        # 涨跌停价按昨收±10%四舍五入到分（加1e-6抵消如10.05*110的二进制误差）；
+        # 比较时留半个最小价位的余量
+        limit_up = np.floor(pre_close * 110 + 0.5 + 1e-6) / 100
+        limit_down = np.floor(pre_close * 90 + 0.5 + 1e-6) / 100
+        at_limit = (close >= limit_up - 0.005) | (close <= limit_down + 0.005)
         
-        return filtered
+        held = np.isin(stock_list, hold_stocks or [])
+        keep = ~paused & (held | ~at_limit)
+        return [stock for stock, ok in zip(stock_list, keep) if ok]
     
-    def _filter_limitdown_stock(self, stock_list: List[str], end_date: str = None,
-                               hold_stocks: List[str] = None) -> List[str]:
-        """过滤跌停股票（已持仓的除外）"""
-        if hold_stocks is None:
-            hold_stocks = []
-        
-        filtered = []
-        for stock in stock_list:
-            if stock in hold_stocks:
-                filtered.append(stock)
-                continue
-            
-            try:
-                if end_date:
-                    data = self.market_data_manager.get_local_data(stock, '1d', end_date, end_date)
-                else:
-                    today = datetime.now().strftime('%Y%m%d')
-                    data = self.market_data_manager.get_local_data(stock, '1d', today, today)
-                
-                if data is None or data.empty:
-                    continue
-                
-                # 暂时允许所有股票
-                filtered.append(stock)
-            except:
-                continue
+    def _filter_new_stock(self, stock_list: List[str], end_date: str = None) -> List[str]:
+        """过滤次新股（上市不足375天）"""
+        end_date = end_date or get_today()
         
-        return filtered
+        # 获取股票信息（需要适配XTquant API）
+        # 暂时跳过此过滤，因为XTquant可能不提供上市日期
+        return list(stock_list)
     
     def _get_fundamental_filtered(self, stock_list: List[str], end_date: str = None,
                                   min_roe: float = 0.15, min_roa: float = 0.10) -> List[str]:
@@ -583,72 +994,47 @@ class MLStockSelector(StockSelector):
         Returns:
             List[str]: 筛选后的股票列表（按市值升序）
         """
-        filtered_stocks = []
-        stock_data = []
-        checked_count = 0
-        passed_count = 0
-        no_data_count = 0
-        
         print(f"[信息] 开始基本面筛选（ROE>{min_roe*100}%, ROA>{min_roa*100}%），股票数量: {len(stock_list)}")
         
-        for stock_code in stock_list:
-            checked_count += 1
-            try:
-                financial_data = self.financial_data_manager.get_financial_data(stock_code, auto_download=False)
-                if not financial_data:
-                    no_data_count += 1
-                    continue
-                
-                roe = financial_data.get('roe', 0)
-                roa = financial_data.get('roa', 0)
-                market_cap = financial_data.get('market_cap', 0)
-                
-                # 基本面筛选
-                if roe and roe > min_roe and roa and roa > min_roa:
-                    passed_count += 1
-                    stock_data.append({
-                        'stock_code': stock_code,
-                        'market_cap': market_cap if market_cap else float('inf'),
-                        'roe': roe,
-                        'roa': roa
-                    })
-            except Exception as e:
-                continue
-            
-            # 每100只股票打印一次进度
-            if checked_count % 100 == 0:
-                print(f"  进度: {checked_count}/{len(stock_list)}, 通过: {passed_count}, 无数据: {no_data_count}")
+        # 并发取回全部股票的财务数据（不自动下载），整理为一张表后按列筛选
+        df = self._get_financial_frame(stock_list, threads=16, auto_download=False)
+        passed = df[(df['roe'] > min_roe) & (df['roa'] > min_roa)]
+        no_data_count = len(stock_list) - len(df)
         
-        print(f"[信息] 基本面筛选完成: 检查{checked_count}只，通过{passed_count}只，无数据{no_data_count}只")
+        print(f"[信息] 基本面筛选完成: 检查{len(stock_list)}只，通过{len(passed)}只，无数据{no_data_count}只")
         
         # 如果通过筛选的股票太少，放宽条件
-        if len(stock_data) < self.stock_num:
-            print(f"[警告] 通过筛选的股票数量({len(stock_data)})少于目标数量({self.stock_num})")
+        if len(passed) < self.stock_num:
+            print(f"[警告] 通过筛选的股票数量({len(passed)})少于目标数量({self.stock_num})")
             print(f"[提示] 建议降低筛选标准（当前: ROE>{min_roe*100}%, ROA>{min_roa*100}%）")
             # 可以在这里实现自动放宽条件的逻辑，暂时返回所有通过的股票
         
-        # 按市值升序排序，取前stock_num只
-        stock_data.sort(key=lambda x: x['market_cap'])
-        filtered_stocks = [s['stock_code'] for s in stock_data[:self.stock_num]]
+        # 按市值升序排序，取前stock_num只；市值缺失或为0的排在最后
+        # 行顺序即原股票列表顺序，稳定排序保证市值相同时仍按原顺序
+        market_cap = passed['market_cap'].replace(0, np.nan).fillna(np.inf)
+        filtered_stocks = market_cap.sort_values(kind='stable').index[:self.stock_num].tolist()
         
         if filtered_stocks:
             print(f"[信息] 最终选出 {len(filtered_stocks)} 只股票（按市值排序）")
         
         return filtered_stocks
     
-    def select_stocks_ml(self, end_date: str = None, index_code: str = None) -> Tuple[List[str], List[float]]:
+    def select_stocks_ml(self, end_date: str = None, index_code: str = None,
+                         workers: int = 1) -> Tuple[List[str], List[float]]:
         """
         ML选股主函数
         
         Args:
             end_date: 截止日期，格式 'YYYYMMDD'
             index_code: 指数代码（可选，用于获取成分股）
+            workers: 因子计算进程数（如 os.cpu_count()），大于1时用进程池计算因子，
+                     否则在线程池中计算
             
         Returns:
             Tuple[List[str], List[float]]: (选中的股票列表, 对应的模型得分列表)
         """
         if end_date is None:
-            end_date = datetime.now().strftime('%Y%m%d')
+            end_date = get_today()
         
         # 1. 获取初始股票池
         if index_code:
@@ -676,62 +1062,88 @@ class MLStockSelector(StockSelector):
         
         # 4. 计算因子并模型预测
         print("[信息] 开始计算因子...")
-        factor_results = {}
+        # 预分配 (股票数 x 因子数) 的float32矩阵，按股票位置逐行写入，直接作为模型输入
+        factors = np.full((len(filtered_list), len(self.factor_calculator.FACTOR_LIST)), np.nan,
+                          dtype=np.float32)
+        computed = np.zeros(len(filtered_list), dtype=bool)
+        progress = count(1)
         
-        for i, stock_code in enumerate(filtered_list, 1):
-            if i % 10 == 0:
-                print(f"  进度: {i}/{len(filtered_list)}")
+        if workers > 1 and len(filtered_list) > workers:
+            # 因子计算以CPU为主，用进程池绕开GIL；spawn启动，原因同_get_financial_frame
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_factor_worker)
             
-            try:
-                factors = self.factor_calculator.calculate_all_factors(stock_code, end_date)
-                factor_results[stock_code] = factors
-            except Exception as e:
-                # print(f"[警告] {stock_code} 因子计算失败: {e}")
-                continue
+            def submit(i, stock_code):
+                return pool.submit(_calc_factors, stock_code, end_date)
+            
+            # 子进程返回因子数组，需复制到factors的对应行
+            in_place = False
+        else:
+            # 因子计算先要获取行情和财务数据，线程池中各线程直接写入factors的对应行
+            pool = ThreadPoolExecutor(max_workers=16)
+            
+            def submit(i, stock_code):
+                return pool.submit(self.factor_calculator.calculate_all_factors_as_array,
+                                   stock_code, end_date, out=factors[i])
+            
+            in_place = True
+        
+        # 按完成顺序收集
+        with pool:
+            futures = {submit(i, stock_code): i for i, stock_code in enumerate(filtered_list)}
+            for future in as_completed(futures):
+                i = next(progress)
+                if i % 10 == 0:
+                    print(f"  进度: {i}/{len(filtered_list)}")
+                
+                # 计算失败的股票直接跳过（不在结果中）
+                if future.exception() is not None:
+                    # print(f"[警告] {filtered_list[futures[future]]} 因子计算失败: {future.exception()}")
+                    continue
+                row = futures[future]
+                if not in_place:
+                    factors[row] = future.result()
+                computed[row] = True
         
-        if not factor_results:
+        if not computed.any():
             print("[错误] 无有效因子数据")
             return [], []
         
-        # 5. 构建因子DataFrame
-        factor_df = pd.DataFrame(factor_results).T
-        factor_df = factor_df[self.factor_calculator.FACTOR_LIST]  # 确保列顺序正确
+        # 5. 只保留计算成功的行（保持筛选列表的顺序）
+        codes = [code for code, ok in zip(filtered_list, computed) if ok]
+        if not computed.all():
+            factors = factors[computed]
         
         # 6. 模型预测
         print("[信息] 模型预测中...")
         try:
-            # 模型预测概率
-            predictions = self.model.predict_proba(factor_df.values)
-            
-            # 计算得分：概率 @ 类别向量
-            scores = predictions @ self.model_classes
-            factor_df['total_score'] = scores
+            scores = self._predict_scores(factors)
         except Exception as e:
             print(f"[错误] 模型预测失败: {e}")
             return [], []
         
         # 7. 额外过滤（停牌、涨停、跌停）
-        filtered_list_2 = self._filter_paused_stock(factor_df.index.tolist(), end_date)
-        # 注意：涨停/跌停过滤需要实时数据，这里暂时跳过
-        
-        # 更新factor_df
-        factor_df = factor_df.loc[factor_df.index.isin(filtered_list_2)]
+        tradeable = np.isin(codes, self._filter_tradeable(codes, end_date))
         
-        if factor_df.empty:
+        if not tradeable.any():
             print(f"[信息] 过滤后无股票")
             return [], []
         
         # 8. 得分过滤
-        factor_df = factor_df[factor_df['total_score'] > self.score_threshold]
+        keep = np.flatnonzero(tradeable & (scores > self.score_threshold))
         
-        if factor_df.empty:
+        if keep.size == 0:
             print(f"[信息] 得分阈值过滤后无股票（阈值: {self.score_threshold}）")
             return [], []
         
-        # 9. 按得分排序，取前stock_num只
-        factor_df = factor_df.sort_values('total_score', ascending=False)
-        selected_stocks = factor_df.head(self.stock_num).index.tolist()
-        selected_scores = factor_df.head(self.stock_num)['total_score'].tolist()
+        # 9. 按得分排序，取前stock_num只（与select_stocks相同，有polars时由LazyFrame排序截取）
+        top = _top_k_frame({
+            'stock_code': np.asarray(codes, dtype=object)[keep],
+            'total_score': scores[keep],
+        }, 'total_score', self.stock_num)
+        selected_stocks = top['stock_code'].tolist()
+        selected_scores = top['total_score'].tolist()
         
         print(f"[成功] ML选股完成，选出 {len(selected_stocks)} 只股票")
         if selected_scores:
@@ -0,0 +1,172 @@
+# _kernels.py
+"""
+策略与风控计算内核模块
+功能：交叉信号、ATR、RSRS等策略与风控指标中的热点循环（numba加速，未安装numba时按纯Python执行）
+"""
+
+import numpy as np
+
+from ..core._njit import njit
+
+
+@njit(cache=True)
+def crossover_signals(fast, slow, gate, buy_lo, buy_hi, sell_lo, sell_hi):
+    """
+    单次遍历生成交叉信号：fast上穿slow且gate位于(buy_lo, buy_hi)时买入，
+    fast下穿slow且gate位于(sell_lo, sell_hi)时卖出
+
+    上穿指本根K线 fast>slow 且前一根 fast<=slow，下穿反之；
+    第一根K线没有前一根，信号为0；与NaN的比较结果为False。
+
+    Args:
+        fast: 快线数组（float32或float64）
+        slow: 慢线数组（float32或float64）
+        gate: 过滤条件数组（float32或float64，如MACD柱、K值）
+        buy_lo: 买入时gate的下界（不含），无下界传-inf
+        buy_hi: 买入时gate的上界（不含），无上界传inf
+        sell_lo: 卖出时gate的下界（不含）
+        sell_hi: 卖出时gate的上界（不含）
+
+    Returns:
+        np.ndarray: 信号数组（int64，1=买入，-1=卖出，0=持有）
+    """
+    n = fast.shape[0]
+    out = np.zeros(n, np.int64)
+    for i in range(1, n):
+        f = fast[i]
+        s = slow[i]
+        f_prev = fast[i - 1]
+        s_prev = slow[i - 1]
+        g = gate[i]
+        if f > s and f_prev <= s_prev:
+            if buy_lo < g < buy_hi:
+                out[i] = 1
+        elif f < s and f_prev >= s_prev:
+            if sell_lo < g < sell_hi:
+                out[i] = -1
+    return out
+
+
+@njit(cache=True)
+def wilder_smooth(x, n):
+    """
+    Wilder平滑的最新值：前n个值的算术平均作为初值，之后按 s = (s*(n-1) + x) / n 递推
+
+    Args:
+        x: 输入数组（float64，如真实波幅TR）
+        n: 平滑周期
+
+    Returns:
+        float: 最后一个元素处的平滑值；元素数不足n或含NaN时为NaN
+    """
+    size = x.shape[0]
+    if size < n:
+        return np.nan
+
+    s = 0.0
+    for i in range(n):
+        s += x[i]
+    s /= n
+
+    for i in range(n, size):
+        s = (s * (n - 1) + x[i]) / n
+
+    return s
+
+
+@njit(cache=True)
+def _run_start(a):
+    """每个位置所在的连续相等值段的起点下标"""
+    out = np.empty(a.shape[0], np.int64)
+    for j in range(a.shape[0]):
+        if j > 0 and a[j] == a[j - 1]:
+            out[j] = out[j - 1]
+        else:
+            out[j] = j
+    return out
+
+
+@njit(cache=True)
+def rolling_weighted_beta(highs, lows, volumes, n):
+    """
+    滑动窗口内最高价对最低价做成交量加权的一元回归（RSRS斜率）
+
+    窗口内成交量归一化为权重，成交量全为0（或含NaN）时退化为等权；
+    含NaN、最高价或最低价恒定、加权方差为0的窗口结果为NaN。
+    各窗口的加权和由前缀和相减得到，总计算量与窗口大小无关。
+
+    Args:
+        highs: 最高价数组（float64）
+        lows: 最低价数组（float64）
+        volumes: 成交量数组（float64）
+        n: 窗口大小
+
+    Returns:
+        tuple: (斜率数组, R²数组)，长度均为 len(highs) - n + 1
+    """
+    size = highs.shape[0]
+    n_windows = max(size - n + 1, 0)
+    betas = np.full(n_windows, np.nan)
+    r2s = np.full(n_windows, np.nan)
+    if n_windows == 0:
+        return betas, r2s
+
+    # 以首个有效最低价为原点平移价格，减小前缀和相减时的舍入误差
+    shift = 0.0
+    for j in range(size):
+        if not np.isnan(lows[j]):
+            shift = lows[j]
+            break
+
+    # 前缀和（首元素为0）：NaN个数，加权与等权的 Σw、Σwx、Σwy、Σwxx、Σwyy、Σwxy
+    nan_cnt = np.zeros(size + 1, np.int64)
+    vol_nan_cnt = np.zeros(size + 1, np.int64)
+    ws = np.zeros((6, size + 1))
+    us = np.zeros((6, size + 1))
+    for j in range(size):
+        x = lows[j] - shift
+        y = highs[j] - shift
+        v = volumes[j]
+        nan_cnt[j + 1] = nan_cnt[j]
+        vol_nan_cnt[j + 1] = vol_nan_cnt[j]
+        if np.isnan(x) or np.isnan(y):
+            nan_cnt[j + 1] += 1
+            x = 0.0
+            y = 0.0
+        if np.isnan(v):
+            vol_nan_cnt[j + 1] += 1
+            v = 0.0
+        terms = (1.0, x, y, x * x, y * y, x * y)
+        for k in range(6):
+            ws[k, j + 1] = ws[k, j] + v * terms[k]
+            us[k, j + 1] = us[k, j] + terms[k]
+
+    x_run = _run_start(lows)
+    y_run = _run_start(highs)
+
+    for i in range(n_windows):
+        e = i + n
+        if nan_cnt[e] - nan_cnt[i] > 0:
+            continue
+        if x_run[e - 1] <= i or y_run[e - 1] <= i:
+            continue
+
+        w_sum = ws[0, e] - ws[0, i]
+        sums = ws
+        if vol_nan_cnt[e] - vol_nan_cnt[i] > 0 or not w_sum > 0:
+            sums = us
+            w_sum = float(n)
+
+        xm = (sums[1, e] - sums[1, i]) / w_sum
+        ym = (sums[2, e] - sums[2, i]) / w_sum
+        sxx = (sums[3, e] - sums[3, i]) / w_sum - xm * xm
+        syy = (sums[4, e] - sums[4, i]) / w_sum - ym * ym
+        sxy = (sums[5, e] - sums[5, i]) / w_sum - xm * ym
+        # 前缀和相减有舍入误差，方差低于误差量级时视为0（如权重集中在一根K线上）
+        if sxx <= 1e-12 * sums[3, e] / w_sum or syy <= 1e-12 * sums[4, e] / w_sum:
+            continue
+
+        betas[i] = sxy / sxx
+        r2s[i] = sxy * sxy / (sxx * syy)
+
+    return betas, r2s
@@ -10,20 +10,12 @@ import numpy as np
 import pandas as pd
 from typing import Dict, Optional, Tuple
 import warnings
-import sys
-import os
 from datetime import datetime, timedelta
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.data.market_data import MarketDataManager
-
-try:
-    import statsmodels.api as sm
-    from statsmodels.regression.linear_model import WLS
-except ImportError:
-    print("[警告] statsmodels未安装，RSRS计算功能将不可用")
-    sm = None
-    WLS = None
+from ..data.market_data import MarketDataManager
+from ._kernels import wilder_smooth, rolling_weighted_beta
 
 warnings.filterwarnings('ignore')
 
@@ -43,6 +35,12 @@ class RiskController:
         self.atr_multiplier = atr_multiplier
         self.market_data_manager = MarketDataManager()
         self.stock_highs = {}  # 记录持仓股票的最高价
+        self._breadth_memo: Dict[Tuple[str, int], float] = {}  # {(截止日期, 周期): 市场宽度}
+        
+        # ATR的进程内缓存：按 (股票代码, 截止日期) 缓存，日内反复检查止损时不再重复读取历史行情
+        self._atr_cached = lru_cache(maxsize=4096)(self._compute_atr)
+        # 大盘RSRS按 (指数代码, 截止日期, n, m) 缓存，择时检查在同一交易日内只计算一次
+        self._market_rsrs_cached = lru_cache(maxsize=32)(self.calculate_rsrs)
         
     def calculate_rsrs(self, stock_code: str, end_date: str = None, 
                       n: int = 18, m: int = 600) -> float:
@@ -58,9 +56,6 @@ class RiskController:
         Returns:
             float: RSRS值
         """
-        if sm is None or WLS is None:
-            return 0.0
-        
         if end_date is None:
             end_date = datetime.now().strftime('%Y%m%d')
         
@@ -71,51 +66,27 @@ class RiskController:
         if data is None or len(data) < n + m:
             return 0.0
         
+        highs = data['high'].to_numpy(dtype=np.float64)
+        lows = data['low'].to_numpy(dtype=np.float64)
         # 获取成交量（用于加权）
-        volumes = data['volume'].values if 'volume' in data.columns else np.ones(len(data))
+        if 'volume' in data.columns:
+            volumes = data['volume'].to_numpy(dtype=np.float64)
+        else:
+            volumes = np.ones(len(data))
         
-        # 数据清洗
-        data = data.copy()
-        data.replace([np.inf, -np.inf], np.nan, inplace=True)
-        data = data.dropna()
+        # 数据清洗：去掉价格或成交量为NaN/inf的K线
+        good = np.isfinite(highs) & np.isfinite(lows) & np.isfinite(volumes)
+        if not good.all():
+            highs, lows, volumes = highs[good], lows[good], volumes[good]
         
-        if len(data) < n:
+        if len(highs) < n:
             return 0.0
         
-        highs = data['high'].values
-        lows = data['low'].values
-        
-        if len(volumes) != len(highs):
-            volumes = np.ones(len(highs))
-        
-        betas = []
-        r2_list = []
-        
-        # 滑动窗口计算
-        for i in range(len(highs) - n + 1):
-            window_highs = highs[i:i+n]
-            window_lows = lows[i:i+n]
-            
-            # 窗口有效性检查
-            if np.any(np.isnan(window_highs)) or np.any(np.isnan(window_lows)):
-                continue
-            if np.all(window_highs == window_highs[0]) or np.all(window_lows == window_lows[0]):
-                continue
-            
-            # 加权最小二乘法回归
-            X = sm.add_constant(window_lows)
-            weights = volumes[i:i+n] / np.sum(volumes[i:i+n]) if np.sum(volumes[i:i+n]) > 0 else None
-            
-            try:
-                if weights is not None:
-                    model = sm.WLS(window_highs, X, weights=weights)
-                else:
-                    model = sm.OLS(window_highs, X)
-                result = model.fit()
-                betas.append(result.params[1])
-                r2_list.append(result.rsquared)
-            except:
-                continue
+        # 滑动窗口计算：最高价对最低价做成交量加权的一元回归，无效窗口为NaN
+        betas, r2s = rolling_weighted_beta(highs, lows, volumes, n)
+        valid = ~np.isnan(betas)
+        betas = betas[valid]
+        r2_list = r2s[valid]
         
         # 结果计算
         if len(betas) == 0:
@@ -152,7 +123,9 @@ class RiskController:
         Returns:
             float: 市场RSRS值
         """
-        return self.calculate_rsrs(index_code, end_date, n, m)
+        if end_date is None:
+            end_date = datetime.now().strftime('%Y%m%d')
+        return self._market_rsrs_cached(index_code, end_date, n, m)
     
     def calculate_atr(self, stock_code: str, end_date: str = None) -> float:
         """
@@ -167,26 +140,32 @@ class RiskController:
         """
         if end_date is None:
             end_date = datetime.now().strftime('%Y%m%d')
-        
-        start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=self.atr_period + 30)).strftime('%Y%m%d')
+        return self._atr_cached(stock_code, end_date)
+    
+    def _compute_atr(self, stock_code: str, end_date: str) -> float:
+        """获取行情并计算ATR（由 _atr_cached 缓存）"""
+        # Wilder递推需要预热，取约4倍周期的交易日
+        start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=self.atr_period * 6)).strftime('%Y%m%d')
         data = self.market_data_manager.get_local_data(stock_code, '1d', start_date, end_date)
         
         if data is None or len(data) < self.atr_period + 1:
             return 0.0
         
-        # 计算真实波幅(TR)
-        high = data['high'].iloc[-self.atr_period:]
-        low = data['low'].iloc[-self.atr_period:]
-        prev_close = data['close'].iloc[-self.atr_period-1:-1]
-        
-        tr1 = high - low
-        tr2 = abs(high - prev_close.shift(1))
-        tr3 = abs(low - prev_close.shift(1))
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.mean()
-        
-        return float(atr) if not pd.isna(atr) else 0.0
+        # 计算真实波幅(TR)：从第二根K线起，前收取上一根K线的收盘价
+        high = data['high'].to_numpy(dtype=np.float64)[1:]
+        low = data['low'].to_numpy(dtype=np.float64)[1:]
+        prev_close = data['close'].to_numpy(dtype=np.float64)[:-1]
+        # TR = max(最高-最低, |最高-前收|, |最低-前收|)，在同一个数组上原地取最大，不堆叠三列临时矩阵
+        tr = high - low
+        gap = np.abs(high - prev_close)
+        np.maximum(tr, gap, out=tr)
+        np.abs(np.subtract(low, prev_close, out=gap), out=gap)
+        np.maximum(tr, gap, out=tr)
+        
+        # Wilder递推平滑：ATR_t = (ATR_{t-1} * (N-1) + TR_t) / N
+        atr = wilder_smooth(tr, self.atr_period)
+        
+        return float(atr) if not np.isnan(atr) else 0.0
     
     def calculate_stop_loss_level(self, stock_code: str, current_high: float, 
                                   end_date: str = None) -> float:
@@ -282,6 +261,11 @@ class RiskController:
             if end_date is None:
                 end_date = datetime.now().strftime('%Y%m%d')
             
+            # 同一截止日期的市场宽度只计算一次
+            memo_key = (end_date, count)
+            if memo_key in self._breadth_memo:
+                return self._breadth_memo[memo_key]
+            
             # 获取A股列表（作为中证全指的近似）
             try:
                 from xtquant import xtdata
@@ -300,38 +284,30 @@ class RiskController:
                 print("[警告] 无法获取股票列表，使用默认市场宽度")
                 return 50.0
             
-            # 限制股票数量以提高计算速度（可以后续优化）
-            stock_list = stock_list[:500] if len(stock_list) > 500 else stock_list
-            
-            # 获取所有股票的20日均线数据
+            # 获取所有股票的收盘价矩阵（一次批量调用）
             start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=count + 30)).strftime('%Y%m%d')
+            closes = self._load_close_matrix(stock_list, start_date, end_date)
             
-            above_ma20_count = 0
-            valid_count = 0
+            if closes is None or closes.shape[1] < count:
+                print("[警告] 无有效股票数据，使用默认市场宽度")
+                return 50.0
             
-            for stock_code in stock_list:
-                try:
-                    data = self.market_data_manager.get_local_data(stock_code, '1d', start_date, end_date)
-                    if data is None or len(data) < count:
-                        continue
-                    
-                    # 计算20日均线
-                    ma20 = data['close'].rolling(window=count).mean().iloc[-1]
-                    current_price = data['close'].iloc[-1]
-                    
-                    if not pd.isna(ma20) and current_price > ma20:
-                        above_ma20_count += 1
-                    valid_count += 1
-                    
-                except:
-                    continue
+            # 最近count日无缺失的股票参与统计，20日均线取最近count日收盘价的均值
+            tail = closes[:, -count:]
+            valid = ~np.isnan(tail).any(axis=1)
+            valid_count = int(valid.sum())
             
             if valid_count == 0:
                 print("[警告] 无有效股票数据，使用默认市场宽度")
                 return 50.0
             
+            tail = tail[valid]
+            ma20 = tail.mean(axis=1, dtype=np.float64)
+            above_ma20_count = int((tail[:, -1] > ma20).sum())
+            
             # 计算市场宽度（20日均线上方的股票占比 * 100）
             market_breadth = (above_ma20_count / valid_count) * 100
+            self._breadth_memo[memo_key] = market_breadth
             
             print(f"[市场宽度] 有效股票: {valid_count}, 20日均线上方: {above_ma20_count}, 市场宽度: {market_breadth:.2f}")
             return float(market_breadth)
@@ -340,6 +316,65 @@ class RiskController:
             print(f"[错误] 计算市场宽度失败: {e}")
             return 50.0  # 默认市场宽度
     
+    def _load_close_matrix(self, stock_list: list, start_date: str,
+                           end_date: str) -> Optional[np.ndarray]:
+        """
+        一次调用取回多只股票的收盘价
+        
+        Args:
+            stock_list: 股票列表
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            
+        Returns:
+            np.ndarray: 收盘价矩阵（float32，shape为 (股票数, 交易日数)），获取失败时为None
+        """
+        try:
+            from xtquant import xtdata
+            market_data = xtdata.get_market_data(
+                field_list=['close'], stock_list=list(stock_list), period='1d',
+                start_time=start_date, end_time=end_date
+            )
+        except Exception as e:
+            print(f"[警告] 批量获取收盘价失败，改为逐只读取本地数据: {e}")
+            market_data = None
+        if not market_data or market_data.get('close') is None:
+            return self._load_close_matrix_threaded(stock_list, start_date, end_date)
+        # xtdata返回 index=股票代码、columns=日期
+        return market_data['close'].to_numpy(dtype=np.float32)
+    
+    def _load_close_matrix_threaded(self, stock_list: list, start_date: str,
+                                    end_date: str) -> Optional[np.ndarray]:
+        """
+        批量接口不可用时，用线程池并发逐只读取本地数据，按日期对齐成收盘价矩阵
+        
+        Args:
+            stock_list: 股票列表
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            
+        Returns:
+            np.ndarray: 收盘价矩阵（float32，缺少的交易日为NaN），没有任何股票读取成功时为None
+        """
+        def load(stock_code):
+            return self.market_data_manager.get_local_data(stock_code, '1d', start_date, end_date)
+        
+        # 读取为I/O等待，线程池重叠各只股票的读取；读取失败的股票直接跳过
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            futures = [(stock_code, executor.submit(load, stock_code)) for stock_code in stock_list]
+        
+        closes = {}
+        for stock_code, future in futures:
+            if future.exception() is not None:
+                continue
+            data = future.result()
+            if data is not None and not data.empty:
+                closes[stock_code] = data['close']
+        
+        if not closes:
+            return None
+        return pd.DataFrame(closes).T.to_numpy(dtype=np.float32)
+    
     def _get_index_stocks(self, index_code: str, end_date: str) -> list:
         """
         获取指数成分股（需要实现）
@@ -10,11 +10,10 @@ import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple
 from enum import Enum
-import sys
-import os
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-from src.selection.selector import MLStockSelector
+from ..selection.selector import MLStockSelector
+from ..analysis._kernels import ema
+from ._kernels import crossover_signals
 
 
 class Signal(Enum):
@@ -24,6 +23,46 @@ class Signal(Enum):
     HOLD = 0     # 持有
 
 
+def _crosses(fast: np.ndarray, slow: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    判断fast相对slow的上穿、下穿
+    
+    Args:
+        fast: 快线数组
+        slow: 慢线数组，与fast等长
+        
+    Returns:
+        Tuple: (上穿布尔数组, 下穿布尔数组)。上穿指本根K线 fast>slow 且前一根 fast<=slow，
+               下穿反之；第一根K线没有前一根，恒为False；与NaN的比较结果为False
+    """
+    cross_up = np.zeros(len(fast), dtype=bool)
+    cross_down = np.zeros(len(fast), dtype=bool)
+    cross_up[1:] = (fast[1:] > slow[1:]) & (fast[:-1] <= slow[:-1])
+    cross_down[1:] = (fast[1:] < slow[1:]) & (fast[:-1] >= slow[:-1])
+    return cross_up, cross_down
+
+
+def _float_values(series: pd.Series) -> np.ndarray:
+    """
+    取出浮点数组供信号内核使用
+    
+    float32/float64列直接返回底层数组（上游已按float32构造的指标不会被放大复制），
+    其他类型转换为float64
+    """
+    if series.dtype in (np.float32, np.float64):
+        return series.to_numpy()
+    return series.to_numpy(dtype=np.float64)
+
+
+def _to_signals(buy: np.ndarray, sell: np.ndarray, index: pd.Index) -> pd.Series:
+    """由买入、卖出布尔数组构建信号序列（同时满足时以买入为准）"""
+    out = np.zeros(len(index), dtype=int)
+    out[sell] = Signal.SELL.value
+    out[buy] = Signal.BUY.value
+    # 新建的数组只在此处使用，直接作为Series的数据，不再复制一份
+    return pd.Series(out, index=index, copy=False)
+
+
 class SignalGenerator:
     """交易信号生成器基类"""
     
@@ -56,27 +95,14 @@ class MACDStrategy(SignalGenerator):
     def generate_signals(self, data: pd.DataFrame, indicators: Dict) -> pd.Series:
         """生成MACD策略信号"""
         macd_data = indicators['macd']
-        signals = pd.Series(0, index=data.index, dtype=int)
-        
-        dif = macd_data['DIF']
-        dea = macd_data['DEA']
-        macd = macd_data['MACD']
+        dif = _float_values(macd_data['DIF'])
+        dea = _float_values(macd_data['DEA'])
+        macd = _float_values(macd_data['MACD'])
         
-        # 计算金叉死叉
-        for i in range(1, len(data)):
-            # 金叉：DIF上穿DEA 且 MACD>0
-            if (dif.iloc[i] > dea.iloc[i] and 
-                dif.iloc[i-1] <= dea.iloc[i-1] and
-                macd.iloc[i] > self.dif_threshold):
-                signals.iloc[i] = Signal.BUY.value
-            
-            # 死叉：DIF下穿DEA 且 MACD<0
-            elif (dif.iloc[i] < dea.iloc[i] and 
-                  dif.iloc[i-1] >= dea.iloc[i-1] and
-                  macd.iloc[i] < self.dea_threshold):
-                signals.iloc[i] = Signal.SELL.value
-        
-        return signals
+        # 金叉：DIF上穿DEA 且 MACD>阈值；死叉：DIF下穿DEA 且 MACD<阈值
+        signals = crossover_signals(dif, dea, macd,
+                                    self.dif_threshold, np.inf, -np.inf, self.dea_threshold)
+        return pd.Series(signals, index=data.index, copy=False)
 
 
 class MAStrategy(SignalGenerator):
@@ -90,38 +116,28 @@ class MAStrategy(SignalGenerator):
         """
         self.ma_period = ma_period
         self.use_multiple_ma = use_multiple_ma
+        
+        # 构造时确定取线方式和均线列名，生成信号时不再分支判断、拼接列名
+        self._ma_key = f'MA{ma_period}'
+        self._lines = self._dual_lines if use_multiple_ma else self._single_lines
+    
+    def _dual_lines(self, data: pd.DataFrame, ma_data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """多均线策略：MA5上穿MA10买入，下穿卖出"""
+        return (_float_values(ma_data['MA5']),
+                _float_values(ma_data['MA10']))
+    
+    def _single_lines(self, data: pd.DataFrame, ma_data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """单均线策略：价格上穿均线买入，下穿卖出"""
+        return (_float_values(data['close']),
+                _float_values(ma_data[self._ma_key]))
     
     def generate_signals(self, data: pd.DataFrame, indicators: Dict) -> pd.Series:
         """生成均线策略信号"""
-        signals = pd.Series(0, index=data.index, dtype=int)
-        ma_data = indicators['ma']
-        close = data['close']
-        
-        if self.use_multiple_ma:
-            # 多均线策略：MA5上穿MA10买入
-            ma5 = ma_data['MA5']
-            ma10 = ma_data['MA10']
-            
-            for i in range(1, len(data)):
-                if (ma5.iloc[i] > ma10.iloc[i] and 
-                    ma5.iloc[i-1] <= ma10.iloc[i-1]):
-                    signals.iloc[i] = Signal.BUY.value
-                elif (ma5.iloc[i] < ma10.iloc[i] and 
-                      ma5.iloc[i-1] >= ma10.iloc[i-1]):
-                    signals.iloc[i] = Signal.SELL.value
-        else:
-            # 单均线策略：价格上穿均线买入
-            ma = ma_data[f'MA{self.ma_period}']
-            
-            for i in range(1, len(data)):
-                if (close.iloc[i] > ma.iloc[i] and 
-                    close.iloc[i-1] <= ma.iloc[i-1]):
-                    signals.iloc[i] = Signal.BUY.value
-                elif (close.iloc[i] < ma.iloc[i] and 
-                      close.iloc[i-1] >= ma.iloc[i-1]):
-                    signals.iloc[i] = Signal.SELL.value
+        fast, slow = self._lines(data, indicators['ma'])
         
-        return signals
+        # 上穿/下穿本身即为信号，不另设过滤条件
+        signals = crossover_signals(fast, slow, fast, -np.inf, np.inf, -np.inf, np.inf)
+        return pd.Series(signals, index=data.index, copy=False)
 
 
 class KDJStrategy(SignalGenerator):
@@ -139,25 +155,12 @@ class KDJStrategy(SignalGenerator):
     def generate_signals(self, data: pd.DataFrame, indicators: Dict) -> pd.Series:
         """生成KDJ策略信号"""
         kdj_data = indicators['kdj']
-        signals = pd.Series(0, index=data.index, dtype=int)
-        
-        k = kdj_data['K']
-        d = kdj_data['D']
+        k = _float_values(kdj_data['K'])
+        d = _float_values(kdj_data['D'])
         
-        for i in range(1, len(data)):
-            # 超卖区域，K上穿D买入
-            if (k.iloc[i] < self.oversold and 
-                k.iloc[i] > d.iloc[i] and 
-                k.iloc[i-1] <= d.iloc[i-1]):
-                signals.iloc[i] = Signal.BUY.value
-            
-            # 超买区域，K下穿D卖出
-            elif (k.iloc[i] > self.overbought and 
-                  k.iloc[i] < d.iloc[i] and 
-                  k.iloc[i-1] >= d.iloc[i-1]):
-                signals.iloc[i] = Signal.SELL.value
-        
-        return signals
+        # 超卖区域K上穿D买入，超买区域K下穿D卖出
+        signals = crossover_signals(k, d, k, -np.inf, self.oversold, self.overbought, np.inf)
+        return pd.Series(signals, index=data.index, copy=False)
 
 
 class CombinedStrategy(SignalGenerator):
@@ -175,25 +178,19 @@ class CombinedStrategy(SignalGenerator):
     
     def generate_signals(self, data: pd.DataFrame, indicators: Dict) -> pd.Series:
         """生成组合策略信号"""
-        signals = pd.Series(0, index=data.index, dtype=int)
+        if not self.strategies:
+            return pd.Series(0, index=data.index, dtype=int)
         
-        # 获取所有策略的信号
-        strategy_signals = []
-        for strategy in self.strategies:
-            sig = strategy.generate_signals(data, indicators)
-            strategy_signals.append(sig)
+        # 获取所有策略的信号，堆叠为 (策略数, K线数) 矩阵
+        votes = np.stack([strategy.generate_signals(data, indicators).to_numpy()
+                          for strategy in self.strategies])
         
         # 投票机制
-        for i in range(len(data)):
-            buy_votes = sum(1 for sig in strategy_signals if sig.iloc[i] == Signal.BUY.value)
-            sell_votes = sum(1 for sig in strategy_signals if sig.iloc[i] == Signal.SELL.value)
-            
-            if buy_votes >= self.vote_threshold:
-                signals.iloc[i] = Signal.BUY.value
-            elif sell_votes >= self.vote_threshold:
-                signals.iloc[i] = Signal.SELL.value
+        buy_votes = (votes == Signal.BUY.value).sum(axis=0)
+        sell_votes = (votes == Signal.SELL.value).sum(axis=0)
         
-        return signals
+        return _to_signals(buy_votes >= self.vote_threshold,
+                           sell_votes >= self.vote_threshold, data.index)
 
 
 class RSIStrategy(SignalGenerator):
@@ -211,32 +208,31 @@ class RSIStrategy(SignalGenerator):
         self.overbought = overbought
     
     def _calculate_rsi(self, data: pd.DataFrame) -> pd.Series:
-        """计算RSI指标"""
-        close = data['close']
-        delta = close.diff()
+        """计算RSI指标（Wilder平滑，等价于 ewm(alpha=1/period, adjust=False).mean()）"""
+        return pd.Series(self._rsi_values(data), index=data.index, copy=False)
+    
+    def _rsi_values(self, data: pd.DataFrame) -> np.ndarray:
+        """计算RSI指标数组（_calculate_rsi的numpy版本，信号计算直接使用）"""
+        close = data['close'].to_numpy(dtype=np.float64)
+        delta = np.diff(close, prepend=np.nan)
         
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.period).mean()
+        # clip保留首个NaN，不像where那样另建条件数组
+        alpha = 1.0 / self.period
+        gain = ema(np.clip(delta, 0, None), alpha)
+        loss = ema(np.clip(-delta, 0, None), alpha)
         
         rs = gain / (loss + 1e-8)
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return 100 - (100 / (1 + rs))
     
     def generate_signals(self, data: pd.DataFrame, indicators: Dict) -> pd.Series:
         """生成RSI策略信号"""
-        signals = pd.Series(0, index=data.index, dtype=int)
-        rsi = self._calculate_rsi(data)
+        rsi = self._rsi_values(data)
         
-        for i in range(1, len(data)):
-            # 超卖区域买入
-            if rsi.iloc[i] < self.oversold and rsi.iloc[i-1] >= self.oversold:
-                signals.iloc[i] = Signal.BUY.value
-            # 超买区域卖出
-            elif rsi.iloc[i] > self.overbought and rsi.iloc[i-1] <= self.overbought:
-                signals.iloc[i] = Signal.SELL.value
+        # 下穿超卖线买入，上穿超买线卖出
+        _, buy = _crosses(rsi, np.full(len(rsi), self.oversold))
+        sell, _ = _crosses(rsi, np.full(len(rsi), self.overbought))
         
-        return signals
+        return _to_signals(buy, sell, data.index)
 
 
 class MLMultiFactorStrategy(SignalGenerator):
@@ -258,7 +254,12 @@ class MLMultiFactorStrategy(SignalGenerator):
         self.stock_num = stock_num
         self.rebalance_freq = rebalance_freq
         self.rebalance_days = rebalance_days
-        self.current_holdings = []  # 当前持仓
+        self._holdings: Dict[str, None] = {}  # 当前持仓（按买入顺序的有序集合）
+    
+    @property
+    def current_holdings(self) -> List[str]:
+        """当前持仓列表"""
+        return list(self._holdings)
     
     def generate_signals(self, data: pd.DataFrame, indicators: Dict, 
                         end_date: str = None, context: Dict = None) -> pd.Series:
@@ -277,7 +278,7 @@ class MLMultiFactorStrategy(SignalGenerator):
         # 注意：ML策略是基于多股票选股的，单个股票的generate_signals不太适用
         # 这里返回持有信号，实际的选股和调仓逻辑应该在回测引擎中处理
         
-        signals = pd.Series(Signal.HOLD.value, index=data.index, dtype=int)
+        signals = np.full(len(data), Signal.HOLD.value, dtype=int)
         
         # 如果提供了context且有选股结果，则根据持仓状态生成信号
         if context and 'selected_stocks' in context:
@@ -288,17 +289,16 @@ class MLMultiFactorStrategy(SignalGenerator):
             if context.get('is_rebalance_day', False):
                 if stock_code in selected_stocks:
                     # 买入信号（如果未持仓）
-                    if stock_code not in self.current_holdings:
-                        signals.iloc[-1] = Signal.BUY.value
-                        self.current_holdings.append(stock_code)
+                    if stock_code not in self._holdings:
+                        signals[-1] = Signal.BUY.value
+                        self._holdings[stock_code] = None
                 else:
                     # 卖出信号（如果已持仓）
-                    if stock_code in self.current_holdings:
-                        signals.iloc[-1] = Signal.SELL.value
-                        if stock_code in self.current_holdings:
-                            self.current_holdings.remove(stock_code)
+                    if stock_code in self._holdings:
+                        signals[-1] = Signal.SELL.value
+                        del self._holdings[stock_code]
         
-        return signals
+        return pd.Series(signals, index=data.index, copy=False)
     
     def select_stocks_for_backtest(self, end_date: str = None) -> Tuple[List[str], List[float]]:
         """
@@ -314,4 +314,4 @@ class MLMultiFactorStrategy(SignalGenerator):
     
     def update_holdings(self, holdings: List[str]):
         """更新当前持仓"""
-        self.current_holdings = holdings
+        self._holdings = dict.fromkeys(holdings)
@@ -0,0 +1,27 @@
+# _kernels.py
+"""
+交易计算内核模块
+功能：调仓资金分配等计算（numba加速，未安装numba时按纯Python执行）
+"""
+
+import numpy as np
+
+from ..core._njit import njit
+
+
+@njit(cache=True)
+def allocate_by_score(scores, cash):
+    """
+    按得分比例分配资金，得分合计为0时平均分配
+
+    Args:
+        scores: 待买入股票的得分数组（float64）
+        cash: 可分配资金
+
+    Returns:
+        np.ndarray: 各股票的目标金额（float64）
+    """
+    total = scores.sum()
+    if total == 0.0:
+        return np.full(scores.shape[0], cash / scores.shape[0])
+    return scores * (cash / total)
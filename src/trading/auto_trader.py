@@ -8,6 +8,8 @@
 
 import sys
 import os
+import time
+from xtquant import xtdata
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from src.trading.trader import Trader
 from src.strategy.strategies import Signal, SignalGenerator
@@ -15,11 +17,46 @@ from src.data.market_data import MarketDataManager
 from src.analysis.technical import TechnicalIndicators
 from src.selection.selector import MLStockSelector
 from src.strategy.risk_control import RiskController
+import numpy as np
 import pandas as pd
 from typing import Dict, Optional, List, Tuple
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from src.core.config import TradeConfig
-from src.core.utils import validate_stock_code
+from src.core.utils import validate_stock_code, get_today
+from src.trading._kernels import allocate_by_score
+
+
+# 交易历史记录的列
+_TRADE_HISTORY_COLUMNS = ('time', 'action', 'stock_code', 'price', 'quantity', 'async_seq')
+
+
+@lru_cache(maxsize=8)
+def _date_ctx(end_date: str) -> Tuple[str, str, datetime]:
+    """
+    解析截止日期
+    
+    Args:
+        end_date: 截止日期 YYYYMMDD
+        
+    Returns:
+        Tuple: (截止日期, 前一自然日 YYYYMMDD, 截止日期的datetime)
+    """
+    end_dt = datetime.strptime(end_date, '%Y%m%d')
+    return end_date, (end_dt - timedelta(days=1)).strftime('%Y%m%d'), end_dt
+
+
+def _last(data: pd.DataFrame, column: str):
+    """取某列最后一个值（iat为按位置取标量的快速访问器）"""
+    return data[column].iat[-1]
+
+
+def _score_series(target_stocks: List[str], scores) -> pd.Series:
+    """把与股票列表对齐的得分转换为以股票代码为索引的float64序列（已是Series时直接返回）"""
+    if isinstance(scores, pd.Series):
+        return scores
+    return pd.Series(scores, index=target_stocks, dtype=np.float64)
 
 
 class AutoTrader:
@@ -35,7 +72,36 @@ class AutoTrader:
         self.trader = trader or Trader()
         self.data_manager = MarketDataManager()
         self.indicator_calculator = TechnicalIndicators()
-        self.trade_history = []  # 交易历史记录
+        # 交易历史记录：按列存储 {列名: [值, ...]}
+        self.trade_history = {column: [] for column in _TRADE_HISTORY_COLUMNS}
+        
+        # 持仓、账户查询的短时缓存：同一轮调仓/风控内多处查询只请求一次，下单成功后失效
+        self.cache_ttl = 2.0  # 秒
+        self._positions_cache = None
+        self._positions_ts = 0.0
+        self._account_cache = None
+        self._account_ts = 0.0
+    
+    def _get_positions_cached(self) -> Optional[pd.DataFrame]:
+        """查询持仓（cache_ttl秒内复用上次结果，查询失败不缓存）"""
+        now = time.monotonic()
+        if self._positions_cache is None or now - self._positions_ts >= self.cache_ttl:
+            self._positions_cache = self.trader.get_positions()
+            self._positions_ts = now
+        return self._positions_cache
+    
+    def _get_account_info_cached(self) -> Optional[Dict]:
+        """查询账户信息（cache_ttl秒内复用上次结果，查询失败不缓存）"""
+        now = time.monotonic()
+        if self._account_cache is None or now - self._account_ts >= self.cache_ttl:
+            self._account_cache = self.trader.get_account_info()
+            self._account_ts = now
+        return self._account_cache
+    
+    def _invalidate_cache(self):
+        """清空持仓、账户查询缓存"""
+        self._positions_cache = None
+        self._account_cache = None
     
     def connect(self) -> bool:
         """连接交易接口"""
@@ -67,7 +133,7 @@ class AutoTrader:
                      quantity: int = None) -> Optional[str]:
         """执行买入"""
         # 获取账户信息
-        account_info = self.trader.get_account_info()
+        account_info = self._get_account_info_cached()
         if account_info is None:
             print("[错误] 无法获取账户信息，买入失败")
             return None
@@ -103,14 +169,8 @@ class AutoTrader:
             async_seq = self.trader.buy(stock_code, price, quantity)
         
         if async_seq:
-            self.trade_history.append({
-                'time': datetime.now(),
-                'action': 'BUY',
-                'stock_code': stock_code,
-                'price': price,
-                'quantity': quantity,
-                'async_seq': async_seq
-            })
+            self._invalidate_cache()
+            self._record_trade('BUY', stock_code, price, quantity, async_seq)
         
         return async_seq
     
@@ -149,17 +209,48 @@ class AutoTrader:
         )
         
         if async_seq:
-            self.trade_history.append({
-                'time': datetime.now(),
-                'action': 'SELL',
-                'stock_code': stock_code,
-                'price': price,
-                'quantity': quantity,
-                'async_seq': async_seq
-            })
+            self._invalidate_cache()
+            self._record_trade('SELL', stock_code, price, quantity, async_seq)
         
         return async_seq
     
+    def _prefetch_bars(self, stock_codes: List[str], start_date: str, end_date: str,
+                       fields: Tuple[str, ...] = ('close', 'high')) -> Dict[str, pd.DataFrame]:
+        """
+        一次调用取回多只股票的日线
+        
+        Args:
+            stock_codes: 股票代码列表
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            fields: 字段列表
+            
+        Returns:
+            Dict: {字段: DataFrame(index=日期, columns=股票代码)}，获取失败时为空字典
+        """
+        try:
+            market_data = xtdata.get_market_data(
+                field_list=list(fields), stock_list=list(stock_codes), period='1d',
+                start_time=start_date, end_time=end_date
+            )
+        except Exception as e:
+            print(f"[警告] 批量获取行情失败，改为逐只获取: {e}")
+            return {}
+        if not market_data:
+            return {}
+        # xtdata返回 index=股票代码、columns=日期，转置为按股票取列
+        return {field: frame.T for field, frame in market_data.items()}
+    
+    def _get_bars(self, bars: Dict[str, pd.DataFrame], stock_code: str,
+                  start_date: str, end_date: str) -> Optional[pd.DataFrame]:
+        """从预取的日线中切出单只股票的数据（去掉无收盘价的K线），预取结果中没有该股票时单独获取"""
+        if bars and stock_code in bars['close'].columns:
+            data = pd.DataFrame({field: frame[stock_code] for field, frame in bars.items()})
+            data = data[data['close'].notna()]
+            if not data.empty:
+                return data
+        return self.data_manager.get_local_data(stock_code, '1d', start_date, end_date)
+    
     def run_strategy(self, stock_code: str, strategy: SignalGenerator,
                     period: str = "1d", lookback_days: int = 100) -> Dict:
         """
@@ -180,8 +271,7 @@ class AutoTrader:
         print(f"{'=' * 60}")
         
         # 获取数据
-        from datetime import timedelta
-        end_time = datetime.now().strftime('%Y%m%d')
+        end_time = get_today()
         start_time = (datetime.now() - timedelta(days=lookback_days)).strftime('%Y%m%d')
         
         data = self.data_manager.get_local_data(stock_code, period, start_time, end_time)
@@ -197,8 +287,8 @@ class AutoTrader:
         signals = strategy.generate_signals(data, indicators)
         
         # 获取最新信号
-        latest_signal = signals.iloc[-1]
-        latest_price = data['close'].iloc[-1]
+        latest_signal = signals.iat[-1]
+        latest_price = _last(data, 'close')
         
         print(f"\n最新信号: {latest_signal} ({'买入' if latest_signal == 1 else '卖出' if latest_signal == -1 else '持有'})")
         print(f"最新价格: {latest_price:.2f}")
@@ -227,16 +317,24 @@ class AutoTrader:
                 'message': '持有信号，未执行交易'
             }
     
+    def _record_trade(self, action: str, stock_code: str, price: Optional[float],
+                      quantity: Optional[int], async_seq):
+        """追加一条交易记录"""
+        values = (datetime.now(), action, stock_code, price, quantity, async_seq)
+        for column, value in zip(_TRADE_HISTORY_COLUMNS, values):
+            self.trade_history[column].append(value)
+    
     def get_trade_history(self) -> pd.DataFrame:
         """获取交易历史"""
-        if self.trade_history:
+        if self.trade_history['time']:
             return pd.DataFrame(self.trade_history)
         else:
             return pd.DataFrame()
     
     def clear_trade_history(self):
         """清空交易历史"""
-        self.trade_history = []
+        for values in self.trade_history.values():
+            values.clear()
 
 
 class MLAutoTrader(AutoTrader):
@@ -275,17 +373,21 @@ class MLAutoTrader(AutoTrader):
             Dict: 调仓结果
         """
         if end_date is None:
-            end_date = datetime.now().strftime('%Y%m%d')
+            end_date = get_today()
         
         print(f"\n{'=' * 60}")
         print(f"开始调仓 - {end_date}")
         print(f"{'=' * 60}")
         
-        # 获取当前持仓
-        positions_df = self.trader.get_positions()
+        # 获取当前持仓（调仓开始时丢弃旧缓存，重新查询）
+        self._invalidate_cache()
+        positions_df = self._get_positions_cached()
         current_holdings = []
+        market_values = {}
         if positions_df is not None and not positions_df.empty:
             current_holdings = positions_df['股票代码'].tolist()
+            if '持仓市值(元)' in positions_df.columns:
+                market_values = dict(zip(current_holdings, positions_df['持仓市值(元)']))
         
         print(f"当前持仓: {current_holdings}")
         print(f"目标持仓: {target_stocks}")
@@ -293,9 +395,11 @@ class MLAutoTrader(AutoTrader):
         # 1. 卖出不在目标列表的股票（昨日涨停的除外）
         sold_stocks = []
         cash_released = 0.0
+        target_set = set(target_stocks)
+        limit_up_set = set(self.yesterday_limit_up_list)
         
         for stock in current_holdings:
-            if stock not in target_stocks and stock not in self.yesterday_limit_up_list:
+            if stock not in target_set and stock not in limit_up_set:
                 print(f"\n卖出: {stock}（不在目标列表中）")
                 position = self.trader.get_position_by_code(stock)
                 if position:
@@ -303,8 +407,7 @@ class MLAutoTrader(AutoTrader):
                     async_seq = self._execute_sell(stock)
                     if async_seq:
                         # 估算释放的资金（使用持仓市值）
-                        position_value = positions_df[positions_df['股票代码'] == stock]['持仓市值(元)'].iloc[0] if '持仓市值(元)' in positions_df.columns else 0
-                        cash_released += position_value
+                        cash_released += market_values.get(stock, 0)
                         sold_stocks.append(stock)
         
         # 2. 买入新的股票（按得分分配资金）
@@ -322,11 +425,12 @@ class MLAutoTrader(AutoTrader):
             return {'success': True, 'sold': current_holdings, 'bought': [], 'reason': 'market_weak'}
         
         # 保存候选股列表供再投资使用
+        score_s = _score_series(target_stocks, scores)
         self.candidate_list = target_stocks
-        self.candidate_scores = scores
+        self.candidate_scores = score_s
         
         # 获取账户信息
-        account_info = self.trader.get_account_info()
+        account_info = self._get_account_info_cached()
         if account_info is None:
             print("[错误] 无法获取账户信息")
             return {'success': False, 'message': '无法获取账户信息'}
@@ -334,42 +438,20 @@ class MLAutoTrader(AutoTrader):
         available_cash = account_info.get('可用资金', 0) + cash_released
         
         # 计算需要买入的股票（排除已持仓的）
-        hold_stocks_updated = [s for s in current_holdings if s in target_stocks]
-        stocks_to_buy = [s for s in target_stocks if s not in hold_stocks_updated]
+        hold_stocks_updated = [s for s in current_holdings if s in target_set]
+        holdings_set = set(hold_stocks_updated)
+        stocks_to_buy = [s for s in target_stocks if s not in holdings_set]
         
         if not stocks_to_buy:
             print("\n[信息] 无需买入新股票")
             return {'success': True, 'sold': sold_stocks, 'bought': []}
         
-        # 按得分分配资金
-        bought_stocks = []
-        stock_scores_dict = {stock: score for stock, score in zip(target_stocks, scores)}
-        
-        # 只对需要买入的股票按得分分配
-        buy_scores = [stock_scores_dict[s] for s in stocks_to_buy]
-        total_score = sum(buy_scores)
-        
-        if total_score == 0:
-            # 如果得分全为0，平均分配
-            avg_amount = available_cash / len(stocks_to_buy)
-            for stock in stocks_to_buy:
-                if len(bought_stocks) >= (self.stock_num - len(hold_stocks_updated)):
-                    break
-                async_seq = self._execute_buy_by_amount(stock, avg_amount, end_date)
-                if async_seq:
-                    bought_stocks.append(stock)
-        else:
-            # 按得分比例分配
-            for stock in stocks_to_buy:
-                if len(bought_stocks) >= (self.stock_num - len(hold_stocks_updated)):
-                    break
-                
-                weight = stock_scores_dict[stock] / total_score
-                invest_amount = available_cash * weight
-                
-                async_seq = self._execute_buy_by_amount(stock, invest_amount, end_date)
-                if async_seq:
-                    bought_stocks.append(stock)
+        # 只对需要买入的股票按得分比例分配（得分全为0时平均分配）
+        buy_scores = score_s.loc[stocks_to_buy].to_numpy()
+        amounts = allocate_by_score(buy_scores, float(available_cash))
+        
+        bought_stocks = self._submit_buys(list(zip(stocks_to_buy, amounts.tolist())), end_date,
+                                          max_count=self.stock_num - len(hold_stocks_updated))
         
         print(f"\n调仓完成:")
         print(f"  卖出: {len(sold_stocks)} 只")
@@ -381,6 +463,35 @@ class MLAutoTrader(AutoTrader):
             'bought': bought_stocks
         }
     
+    def _submit_buys(self, plan: List[Tuple[str, float]], end_date: str = None,
+                     max_count: int = None) -> List[str]:
+        """
+        按计划顺序逐笔提交买单
+        
+        必须串行：Trader.buy按下单时查询到的可用资金截取买入金额，前一笔冻结的资金
+        要在后一笔查询时体现；共享的交易接口也未保证可多线程并发下单。
+        失败的股票由后续股票补足，直到成功数达到max_count或计划用完
+        
+        Args:
+            plan: [(股票代码, 目标金额)] 列表，按优先级排序
+            end_date: 截止日期
+            max_count: 最多买入的股票数，None表示不限
+            
+        Returns:
+            List[str]: 成功买入的股票列表（按计划顺序）
+        """
+        end_date = end_date or get_today()
+        bought_stocks = []
+        
+        for stock, amount in plan:
+            if max_count is not None and len(bought_stocks) >= max_count:
+                break
+            async_seq = self._execute_buy_by_amount(stock, amount, end_date)
+            if async_seq:
+                bought_stocks.append(stock)
+        
+        return bought_stocks
+    
     def _execute_buy_by_amount(self, stock_code: str, target_amount: float, 
                                end_date: str = None) -> Optional[int]:
         """
@@ -396,10 +507,7 @@ class MLAutoTrader(AutoTrader):
         """
         try:
             # 获取当前价格
-            if end_date:
-                today = end_date
-            else:
-                today = datetime.now().strftime('%Y%m%d')
+            today = end_date or get_today()
             
             data = self.data_manager.get_local_data(stock_code, '1d', today, today)
             if data is None or data.empty:
@@ -410,7 +518,7 @@ class MLAutoTrader(AutoTrader):
                 print(f"[警告] 无法获取 {stock_code} 的价格数据")
                 return None
             
-            current_price = data['close'].iloc[-1]
+            current_price = _last(data, 'close')
             
             # 计算最小金额（1手）
             min_amount = current_price * 100
@@ -421,6 +529,8 @@ class MLAutoTrader(AutoTrader):
             
             # 执行买入
             async_seq = self.trader.buy(stock_code, target_amount=target_amount)
+            if async_seq:
+                self._invalidate_cache()
             return async_seq
             
         except Exception as e:
@@ -438,64 +548,56 @@ class MLAutoTrader(AutoTrader):
             Tuple[List[str], float]: (触发风控的股票列表, 释放的现金总额)
         """
         if end_date is None:
-            end_date = datetime.now().strftime('%Y%m%d')
+            end_date = get_today()
         
-        positions_df = self.trader.get_positions()
+        positions_df = self._get_positions_cached()
         if positions_df is None or positions_df.empty:
             return [], 0.0
         
         triggered_stocks = []
         cash_released = 0.0
         
-        # 获取当前价格数据
-        for idx, row in positions_df.iterrows():
-            stock_code = row['股票代码']
-            
-            # 豁免昨日涨停股票
-            if stock_code in self.yesterday_limit_up_list:
+        # 一次取回所有持仓当日的价格数据
+        columns = positions_df.columns
+        stock_codes = positions_df['股票代码'].tolist()
+        costs = positions_df['成本价'].tolist() if '成本价' in columns else [None] * len(stock_codes)
+        market_values = positions_df['持仓市值(元)'].tolist() if '持仓市值(元)' in columns else [0] * len(stock_codes)
+        bars = self._prefetch_bars(stock_codes, end_date, end_date)
+        limit_up_set = set(self.yesterday_limit_up_list)
+        
+        # 豁免昨日涨停股票
+        rows = [(stock_code, cost, market_value)
+                for stock_code, cost, market_value in zip(stock_codes, costs, market_values)
+                if stock_code not in limit_up_set]
+        
+        # 各股票的止损、RSRS计算相互独立且主要耗时在读取历史行情，并发评估；下单仍按持仓顺序串行提交
+        # 注意：线程中调用的numba内核（ATR、RSRS）必须串行编译，parallel=True的内核在workqueue线程层下不可多线程并发调用
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(
+                lambda row: self._evaluate_risk(row[0], row[1], bars, end_date), rows))
+        
+        for (stock_code, _, market_value), result in zip(rows, results):
+            if result is None:
                 continue
+            action, current_price, current_high, position_cost, level = result
             
             try:
-                # 获取最新价格
-                data = self.data_manager.get_local_data(stock_code, '1d', end_date, end_date)
-                if data is None or data.empty:
-                    data = self.data_manager.get_local_data(stock_code, '1d')
-                
-                if data is None or data.empty:
-                    continue
-                
-                current_price = data['close'].iloc[-1]
-                current_high = data['high'].iloc[-1] if len(data) > 0 else current_price
-                position_cost = row.get('成本价', current_price)
-                
-                # 检查ATR止损
-                triggered, stop_loss_level = self.risk_controller.check_stop_loss(
-                    stock_code, current_price, position_cost, end_date
-                )
-                
-                if triggered:
-                    print(f"\n[ATR止损] {stock_code} 触发止损，现价: {current_price:.2f}, 止损位: {stop_loss_level:.2f}")
+                if action == 'stop_loss':
+                    print(f"\n[ATR止损] {stock_code} 触发止损，现价: {current_price:.2f}, 止损位: {level:.2f}")
                     async_seq = self._execute_sell(stock_code)
                     if async_seq:
                         triggered_stocks.append(stock_code)
-                        market_value = row.get('持仓市值(元)', 0)
                         cash_released += market_value
                         self.risk_controller.clear_stock_high(stock_code)
-                    continue
-                
-                # 检查RSRS风控
-                rsrs_value = self.risk_controller.calculate_rsrs(stock_code, end_date)
-                if rsrs_value < -0.7:
-                    print(f"\n[RSRS风控] {stock_code} RSRS值: {rsrs_value:.2f} < -0.7，卖出")
+                elif action == 'rsrs':
+                    print(f"\n[RSRS风控] {stock_code} RSRS值: {level:.2f} < -0.7，卖出")
                     async_seq = self._execute_sell(stock_code)
                     if async_seq:
                         triggered_stocks.append(stock_code)
-                        market_value = row.get('持仓市值(元)', 0)
                         cash_released += market_value
-                    continue
-                
-                # 更新最高价记录
-                self.risk_controller.update_stock_high(stock_code, current_high, position_cost)
+                else:
+                    # 更新最高价记录
+                    self.risk_controller.update_stock_high(stock_code, current_high, position_cost)
                 
             except Exception as e:
                 print(f"[警告] 检查 {stock_code} 风控失败: {e}")
@@ -509,6 +611,52 @@ class MLAutoTrader(AutoTrader):
         
         return triggered_stocks, cash_released
     
+    def _evaluate_risk(self, stock_code: str, cost: Optional[float],
+                       bars: Dict[str, pd.DataFrame], end_date: str) -> Optional[Tuple]:
+        """
+        评估单只持仓的风控状态（ATR止损优先，其次RSRS），不下单
+        
+        Args:
+            stock_code: 股票代码
+            cost: 持仓成本价，None表示未知
+            bars: _prefetch_bars预取的当日行情
+            end_date: 截止日期
+            
+        Returns:
+            Tuple: (动作, 现价, 当日最高价, 持仓成本, 止损位或RSRS值)，动作为 'stop_loss'/'rsrs'/'hold'；
+                   无价格数据或计算失败时为None
+        """
+        try:
+            # 获取最新价格
+            data = self._get_bars(bars, stock_code, end_date, end_date)
+            if data is None or data.empty:
+                data = self.data_manager.get_local_data(stock_code, '1d')
+            
+            if data is None or data.empty:
+                return None
+            
+            current_price = _last(data, 'close')
+            current_high = _last(data, 'high')
+            position_cost = current_price if cost is None else cost
+            
+            # 检查ATR止损
+            triggered, stop_loss_level = self.risk_controller.check_stop_loss(
+                stock_code, current_price, position_cost, end_date
+            )
+            if triggered:
+                return 'stop_loss', current_price, current_high, position_cost, stop_loss_level
+            
+            # 检查RSRS风控
+            rsrs_value = self.risk_controller.calculate_rsrs(stock_code, end_date)
+            if rsrs_value < -0.7:
+                return 'rsrs', current_price, current_high, position_cost, rsrs_value
+            
+            return 'hold', current_price, current_high, position_cost, rsrs_value
+            
+        except Exception as e:
+            print(f"[警告] 检查 {stock_code} 风控失败: {e}")
+            return None
+    
     def handle_limit_up_stocks(self, end_date: str = None) -> Tuple[List[str], float]:
         """
         处理涨停股票：昨日涨停继续持有，涨停打开则卖出
@@ -520,36 +668,47 @@ class MLAutoTrader(AutoTrader):
             Tuple[List[str], float]: (卖出的股票列表, 释放的现金)
         """
         if end_date is None:
-            end_date = datetime.now().strftime('%Y%m%d')
+            end_date = get_today()
         
-        positions_df = self.trader.get_positions()
+        positions_df = self._get_positions_cached()
         if positions_df is None or positions_df.empty:
             return [], 0.0
         
         sold_stocks = []
         cash_released = 0.0
-        
-        # 检查昨日涨停股票今日是否打开
-        for stock_code in self.yesterday_limit_up_list[:]:
-            if stock_code not in positions_df['股票代码'].tolist():
-                self.yesterday_limit_up_list.remove(stock_code)
+        holdings_set = set(positions_df['股票代码'])
+        if '持仓市值(元)' in positions_df.columns:
+            market_values = dict(zip(positions_df['股票代码'], positions_df['持仓市值(元)']))
+        else:
+            market_values = {}
+        
+        # 昨日涨停股票的今日、昨日价格数据各一次批量获取
+        _, yesterday, _ = _date_ctx(end_date)
+        watch_list = list(self.yesterday_limit_up_list)
+        today_bars = self._prefetch_bars(watch_list, end_date, end_date) if watch_list else {}
+        yesterday_bars = self._prefetch_bars(watch_list, yesterday, yesterday, ('close',)) if watch_list else {}
+        
+        # 检查昨日涨停股票今日是否打开（已不持有或已卖出的股票最后统一移出列表）
+        dropped = set()
+        for stock_code in watch_list:
+            if stock_code not in holdings_set:
+                dropped.add(stock_code)
                 continue
             
             try:
                 # 获取最新价格数据
-                data = self.data_manager.get_local_data(stock_code, '1d', end_date, end_date)
+                data = self._get_bars(today_bars, stock_code, end_date, end_date)
                 if data is None or data.empty:
                     continue
                 
-                current_price = data['close'].iloc[-1]
-                current_high = data['high'].iloc[-1]
+                current_price = _last(data, 'close')
+                current_high = _last(data, 'high')
                 
                 # 获取昨日数据判断昨日是否涨停
-                yesterday = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=1)).strftime('%Y%m%d')
-                yesterday_data = self.data_manager.get_local_data(stock_code, '1d', yesterday, yesterday)
+                yesterday_data = self._get_bars(yesterday_bars, stock_code, yesterday, yesterday)
                 
                 if yesterday_data is not None and not yesterday_data.empty:
-                    prev_close = yesterday_data['close'].iloc[-1]
+                    prev_close = _last(yesterday_data, 'close')
                     
                     # 判断涨停是否打开：当前价格 < 当前最高价，或涨幅<9.5%
                     if prev_close > 0:
@@ -557,14 +716,13 @@ class MLAutoTrader(AutoTrader):
                         # 如果涨停打开（价格不等于最高价，或涨幅小于9.5%）
                         if abs(current_price - current_high) > 0.01 or pct_change < 9.5:
                             print(f"[涨停打开] {stock_code} 涨停打开，卖出")
-                            position = positions_df[positions_df['股票代码'] == stock_code].iloc[0]
-                            market_value = position.get('持仓市值(元)', 0)
+                            market_value = market_values.get(stock_code, 0)
                             
                             async_seq = self._execute_sell(stock_code)
                             if async_seq:
                                 sold_stocks.append(stock_code)
                                 cash_released += market_value
-                                self.yesterday_limit_up_list.remove(stock_code)
+                                dropped.add(stock_code)
                                 print(f"  释放资金: {market_value:.2f} 元")
                             else:
                                 print(f"  卖出失败")
@@ -574,6 +732,9 @@ class MLAutoTrader(AutoTrader):
             except Exception as e:
                 print(f"[警告] 检查 {stock_code} 涨停状态失败: {e}")
         
+        if dropped:
+            self.yesterday_limit_up_list = [s for s in self.yesterday_limit_up_list if s not in dropped]
+        
         # 如果释放了资金，进行再投资
         if cash_released > 0 and self.check_market_timing(end_date):
             reinvested = self.reinvest(self.candidate_list, self.candidate_scores, cash_released, end_date)
@@ -589,36 +750,30 @@ class MLAutoTrader(AutoTrader):
         Args:
             end_date: 截止日期
         """
-        positions_df = self.trader.get_positions()
+        positions_df = self._get_positions_cached()
         if positions_df is None or positions_df.empty:
             self.yesterday_limit_up_list = []
             return
         
         # 获取昨日数据判断涨停
-        if end_date is None:
-            yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-        else:
-            yesterday = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=1)).strftime('%Y%m%d')
+        _, yesterday, _ = _date_ctx(end_date or get_today())
         
-        limit_up_stocks = []
-        for stock_code in positions_df['股票代码'].tolist():
-            try:
-                data = self.data_manager.get_local_data(stock_code, '1d', yesterday, yesterday)
-                if data is None or data.empty:
-                    continue
-                
-                # 判断是否涨停（收盘价接近最高价，且涨幅接近10%或20%）
-                close_price = data['close'].iloc[-1]
-                high_price = data['high'].iloc[-1]
-                prev_close = data['close'].iloc[-2] if len(data) > 1 else close_price
-                
-                # 简单的涨停判断：收盘价等于最高价，且涨幅>9.5%
-                if abs(close_price - high_price) < 0.01 and prev_close > 0:
-                    pct_change = (close_price / prev_close - 1) * 100
-                    if pct_change > 9.5:  # 接近涨停
-                        limit_up_stocks.append(stock_code)
-            except:
-                continue
+        # 一次取回所有持仓昨日的收盘价、最高价和前收盘价
+        stock_codes = positions_df['股票代码'].tolist()
+        bars = self._prefetch_bars(stock_codes, yesterday, yesterday, ('close', 'high', 'preClose'))
+        if not bars or bars['close'].empty:
+            self.yesterday_limit_up_list = []
+            return
+        
+        close = bars['close'].iloc[-1]
+        high = bars['high'].iloc[-1]
+        prev_close = bars['preClose'].iloc[-1]
+        
+        # 简单的涨停判断：收盘价等于最高价，且涨幅>9.5%（整列比较，NaN的比较结果为False）
+        near_high = (close - high).abs() < 0.01
+        pct_change = (close / prev_close.where(prev_close > 0) - 1) * 100
+        limit_up = near_high & (pct_change > 9.5)
+        limit_up_stocks = limit_up.index[limit_up.to_numpy()].tolist()
         
         self.yesterday_limit_up_list = limit_up_stocks
     
@@ -641,7 +796,7 @@ class MLAutoTrader(AutoTrader):
         
         Args:
             target_stocks: 候选股票列表
-            scores: 对应的模型得分
+            scores: 对应的模型得分（列表，或以股票代码为索引的Series）
             available_cash: 可用现金
             end_date: 截止日期
             
@@ -652,13 +807,14 @@ class MLAutoTrader(AutoTrader):
             return []
         
         # 获取当前持仓
-        positions_df = self.trader.get_positions()
+        positions_df = self._get_positions_cached()
         current_holdings = []
         if positions_df is not None and not positions_df.empty:
             current_holdings = positions_df['股票代码'].tolist()
         
         # 排除已持仓的股票
-        buy_candidates = [s for s in target_stocks if s not in current_holdings]
+        holdings_set = set(current_holdings)
+        buy_candidates = [s for s in target_stocks if s not in holdings_set]
         if not buy_candidates:
             return []
         
@@ -668,27 +824,10 @@ class MLAutoTrader(AutoTrader):
             return []
         
         # 按得分分配资金
-        bought_stocks = []
-        stock_scores_dict = {stock: score for stock, score in zip(target_stocks, scores)}
-        
         buy_candidates = buy_candidates[:available_slots]
-        candidate_scores = [stock_scores_dict[s] for s in buy_candidates]
-        total_score = sum(candidate_scores)
-        
-        if total_score == 0:
-            # 平均分配
-            avg_amount = available_cash / len(buy_candidates)
-            for stock in buy_candidates:
-                async_seq = self._execute_buy_by_amount(stock, avg_amount, end_date)
-                if async_seq:
-                    bought_stocks.append(stock)
-        else:
-            # 按得分分配
-            for stock in buy_candidates:
-                weight = stock_scores_dict[stock] / total_score
-                invest_amount = available_cash * weight
-                async_seq = self._execute_buy_by_amount(stock, invest_amount, end_date)
-                if async_seq:
-                    bought_stocks.append(stock)
+        candidate_scores = _score_series(target_stocks, scores).loc[buy_candidates].to_numpy()
+        amounts = allocate_by_score(candidate_scores, float(available_cash))
+        
+        bought_stocks = self._submit_buys(list(zip(buy_candidates, amounts.tolist())), end_date)
         
         return bought_stocks
@@ -348,15 +348,16 @@ class Trader:
                     print("-" * 100)
                     
                     # 格式化数据行
-                    for _, row in df.iterrows():
-                        stock_code = str(row['股票代码'])
-                        volume = int(row['总持仓(股)'])
-                        can_use = int(row['可用(股)'])
-                        frozen = int(row['冻结(股)'])
-                        cost_price = f"{row['成本价']:.2f}"
-                        open_price = f"{row['开仓价']:.2f}"
-                        market_value = f"{row['市值(元)']:,.2f}"
-                        profit = f"{row['盈亏(元)']:,.2f}"
+                    for (stock_code, volume, can_use, frozen, cost, open_, value,
+                         pnl) in df[list(widths)].itertuples(index=False, name=None):
+                        stock_code = str(stock_code)
+                        volume = int(volume)
+                        can_use = int(can_use)
+                        frozen = int(frozen)
+                        cost_price = f"{cost:.2f}"
+                        open_price = f"{open_:.2f}"
+                        market_value = f"{value:,.2f}"
+                        profit = f"{pnl:,.2f}"
                         
                         line = (
                             f"{stock_code:<{widths['股票代码']}}"
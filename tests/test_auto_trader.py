@@ -4,8 +4,12 @@
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock
-from src.trading.auto_trader import AutoTrader
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock, MagicMock, patch
+from src.trading.auto_trader import AutoTrader, MLAutoTrader, _date_ctx
+from src.trading._kernels import allocate_by_score
+from src.strategy import _kernels as strategy_kernels
 
 
 class TestAutoTrader:
@@ -18,3 +22,163 @@ class TestAutoTrader:
         
         auto_trader = AutoTrader(trader=mock_trader)
         assert auto_trader.trader is not None
+    
+    def test_positions_cached_until_order(self):
+        """有效期内复用持仓、账户查询结果，下单成功后重新查询"""
+        mock_trader = MagicMock()
+        mock_trader.get_account_info.return_value = {'可用资金': 100000.0}
+        mock_trader.buy.return_value = 1
+        auto_trader = AutoTrader(trader=mock_trader)
+        
+        auto_trader._get_positions_cached()
+        auto_trader._get_positions_cached()
+        assert mock_trader.get_positions.call_count == 1
+        
+        auto_trader._execute_buy('000001.SZ', 10.0, 1)
+        auto_trader._get_positions_cached()
+        auto_trader._get_account_info_cached()
+        assert mock_trader.get_positions.call_count == 2
+        assert mock_trader.get_account_info.call_count == 2
+    
+    def test_trade_history(self):
+        """成交记录按列保存，可转换为DataFrame并清空"""
+        mock_trader = MagicMock()
+        mock_trader.get_account_info.return_value = {'可用资金': 100000.0}
+        mock_trader.buy.return_value = 7
+        auto_trader = AutoTrader(trader=mock_trader)
+        assert auto_trader.get_trade_history().empty
+        
+        auto_trader._execute_buy('000001.SZ', 10.0, 1)
+        history = auto_trader.get_trade_history()
+        
+        assert list(history.columns) == ['time', 'action', 'stock_code', 'price', 'quantity', 'async_seq']
+        assert history.iloc[0]['action'] == 'BUY'
+        assert history.iloc[0]['async_seq'] == 7
+        
+        auto_trader.clear_trade_history()
+        assert auto_trader.get_trade_history().empty
+    
+    def test_date_ctx(self):
+        """测试截止日期解析"""
+        end_date, yesterday, end_dt = _date_ctx('20240301')
+        assert end_date == '20240301'
+        assert yesterday == '20240229'
+        assert end_dt.day == 1
+        assert _date_ctx('20240301') is _date_ctx('20240301')
+
+
+class TestAllocateByScore:
+    """测试资金分配内核"""
+    
+    def test_allocate_by_score(self):
+        """按得分比例分配，得分全为0时平均分配"""
+        np.testing.assert_allclose(allocate_by_score(np.array([1.0, 3.0]), 100.0), [25.0, 75.0])
+        np.testing.assert_allclose(allocate_by_score(np.zeros(4), 100.0), [25.0] * 4)
+
+
+@pytest.fixture
+def ml_trader():
+    """交易接口、数据与风控均为Mock的ML自动交易器"""
+    trader = MLAutoTrader(trader=MagicMock(), selector=MagicMock())
+    trader.data_manager = MagicMock()
+    trader.risk_controller = MagicMock()
+    trader.risk_controller.check_market_timing.return_value = False
+    trader.trader.get_positions.return_value = pd.DataFrame({
+        '股票代码': ['000001.SZ', '000002.SZ'],
+        '成本价': [10.0, 20.0],
+        '持仓市值(元)': [1000.0, 2000.0],
+    })
+    return trader
+
+
+class TestMLAutoTrader:
+    """测试ML自动交易器"""
+    
+    @patch('src.trading.auto_trader.xtdata')
+    def test_check_risk_control_batched(self, mock_xtdata, ml_trader):
+        """持仓价格一次批量获取，批量结果中缺失的股票单独获取"""
+        mock_xtdata.get_market_data.return_value = {
+            'close': pd.DataFrame({'20240110': [9.0]}, index=['000001.SZ']),
+            'high': pd.DataFrame({'20240110': [9.5]}, index=['000001.SZ']),
+        }
+        ml_trader.data_manager.get_local_data.return_value = pd.DataFrame({'close': [21.0], 'high': [22.0]})
+        ml_trader.risk_controller.check_stop_loss.side_effect = lambda code, *args: (code == '000001.SZ', 9.5)
+        ml_trader.risk_controller.calculate_rsrs.return_value = 0.0
+        
+        with patch.object(ml_trader, '_execute_sell', return_value=1) as mock_sell:
+            triggered, cash = ml_trader.check_risk_control('20240110')
+        
+        assert triggered == ['000001.SZ']
+        assert cash == 1000.0
+        mock_sell.assert_called_once_with('000001.SZ')
+        mock_xtdata.get_market_data.assert_called_once()
+        ml_trader.data_manager.get_local_data.assert_called_once_with('000002.SZ', '1d', '20240110', '20240110')
+        ml_trader.risk_controller.update_stock_high.assert_called_once_with('000002.SZ', 22.0, 20.0)
+    
+    def test_risk_kernels_serial(self):
+        """风控线程池中调用的内核不能以parallel=True编译"""
+        for kernel in (strategy_kernels.wilder_smooth, strategy_kernels.rolling_weighted_beta):
+            assert not getattr(kernel, 'targetoptions', {}).get('parallel', False)
+    
+    @patch('src.trading.auto_trader.xtdata')
+    def test_handle_limit_up_stocks(self, mock_xtdata, ml_trader):
+        """涨停打开的持仓卖出，已不在持仓中的股票移出涨停列表"""
+        def get_market_data(field_list, stock_list, period, start_time, end_time):
+            close = 10.5 if start_time == '20240110' else 10.0
+            return {field: pd.DataFrame({start_time: [close if field == 'close' else 11.0]},
+                                        index=['000001.SZ'])
+                    for field in field_list}
+        
+        mock_xtdata.get_market_data.side_effect = get_market_data
+        ml_trader.yesterday_limit_up_list = ['000001.SZ', '000009.SZ']
+        
+        with patch.object(ml_trader, '_execute_sell', return_value=1):
+            sold, cash = ml_trader.handle_limit_up_stocks('20240110')
+        
+        assert sold == ['000001.SZ']
+        assert cash == 1000.0
+        assert ml_trader.yesterday_limit_up_list == []
+        assert mock_xtdata.get_market_data.call_count == 2
+    
+    @patch('src.trading.auto_trader.xtdata')
+    def test_update_limit_up_list(self, mock_xtdata, ml_trader):
+        """收盘价等于最高价且涨幅超过9.5%的持仓记为昨日涨停"""
+        codes = ['000001.SZ', '000002.SZ']
+        mock_xtdata.get_market_data.return_value = {
+            'close': pd.DataFrame({'20240109': [11.0, 21.0]}, index=codes),
+            'high': pd.DataFrame({'20240109': [11.0, 21.0]}, index=codes),
+            'preClose': pd.DataFrame({'20240109': [10.0, 20.0]}, index=codes),
+        }
+        
+        ml_trader.update_limit_up_list('20240110')
+        
+        assert ml_trader.yesterday_limit_up_list == ['000001.SZ']
+        mock_xtdata.get_market_data.assert_called_once()
+    
+    def test_submit_buys_refills_failed_orders(self, ml_trader):
+        """下单失败时按顺序用后续股票补足，达到上限后不再下单"""
+        attempted = []
+        
+        def buy(stock_code, amount, end_date):
+            attempted.append(stock_code)
+            return None if stock_code == 'B' else 1
+        
+        plan = [('A', 1.0), ('B', 1.0), ('C', 1.0), ('D', 1.0)]
+        with patch.object(ml_trader, '_execute_buy_by_amount', side_effect=buy):
+            bought = ml_trader._submit_buys(plan, '20240110', max_count=2)
+        
+        assert bought == ['A', 'C']
+        assert attempted == ['A', 'B', 'C']
+    
+    def test_reinvest_with_score_series(self, ml_trader):
+        """调仓保存的得分序列可直接用于再投资，资金按得分比例分配"""
+        ml_trader.stock_num = 4
+        scores = pd.Series([1.0, 3.0, 5.0], index=['000001.SZ', '000003.SZ', '000004.SZ'])
+        
+        with patch.object(ml_trader, '_submit_buys', return_value=['000003.SZ']) as mock_submit:
+            bought = ml_trader.reinvest(scores.index.tolist(), scores, 1000.0, '20240110')
+        
+        assert bought == ['000003.SZ']
+        plan = mock_submit.call_args[0][0]
+        assert [stock for stock, _ in plan] == ['000003.SZ', '000004.SZ']
+        np.testing.assert_allclose([amount for _, amount in plan], [375.0, 625.0])
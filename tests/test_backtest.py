@@ -5,9 +5,12 @@
 
 import pytest
 import pandas as pd
+import numpy as np
 from src.backtest.engine import BacktestEngine
+from src.backtest._loops import run_backtest_loop, run_backtest_batch
 from src.backtest.analyzer import PerformanceAnalyzer
 from src.strategy.strategies import Signal
+from src.core._njit import NUMBA_AVAILABLE
 
 
 class TestBacktestEngine:
@@ -20,6 +23,22 @@ class TestBacktestEngine:
         assert engine.commission_rate == 0.0001
         assert engine.slippage_rate == 0.001
     
+    def test_backtest_engine_warmup(self, sample_stock_data):
+        """测试预编译回测内核：预编译后回测不再触发新的编译"""
+        BacktestEngine.warmup()
+        if not NUMBA_AVAILABLE:
+            return
+        compiled = list(run_backtest_loop.signatures)
+        assert compiled
+        assert run_backtest_batch.signatures
+        
+        engine = BacktestEngine()
+        signals = pd.Series(0, index=sample_stock_data.index)
+        signals.iloc[10] = Signal.BUY.value
+        signals.iloc[50] = Signal.SELL.value
+        engine.run(sample_stock_data, signals)
+        assert list(run_backtest_loop.signatures) == compiled
+    
     def test_backtest_engine_run(self, sample_stock_data):
         """测试回测执行"""
         engine = BacktestEngine(initial_capital=100000.0)
@@ -34,6 +53,26 @@ class TestBacktestEngine:
         assert 'position' in result.columns
         assert 'equity' in result.columns
         assert result['equity'].iloc[0] == 100000.0
+    
+    def test_backtest_engine_run_batch(self, sample_stock_data):
+        """测试批量回测与逐只回测一致"""
+        engine = BacktestEngine(initial_capital=100000.0)
+        np.random.seed(1)
+        close_2d = np.vstack([sample_stock_data['close'].to_numpy(),
+                              sample_stock_data['close'].to_numpy()[::-1]])
+        signals_2d = np.random.choice([0, 0, 0, Signal.BUY.value, Signal.SELL.value],
+                                      size=close_2d.shape)
+        
+        equity, positions, trades = engine.run_batch(close_2d, signals_2d)
+        
+        assert equity.shape == positions.shape == close_2d.shape
+        for s in range(close_2d.shape[0]):
+            data = pd.DataFrame({'close': close_2d[s]}, index=sample_stock_data.index)
+            result = engine.run(data, pd.Series(signals_2d[s], index=data.index, dtype=int))
+            np.testing.assert_array_equal(equity[s], result['equity'].to_numpy())
+            np.testing.assert_array_equal(positions[s], result['position'].to_numpy())
+            assert trades[s]['action'].tolist() == engine.trades['action'].tolist()
+            np.testing.assert_array_equal(trades[s]['price'], engine.trades['price'])
 
 
 class TestPerformanceAnalyzer:
@@ -59,3 +98,22 @@ class TestPerformanceAnalyzer:
         assert '总收益率' in performance
         assert '年化收益率' in performance
         assert '夏普比率' in performance
+    
+    def test_win_rate_ignores_redundant_signals(self, sample_stock_data):
+        """测试胜率统计：忽略空仓卖出、重复买卖信号和末尾未平仓的买入"""
+        engine = BacktestEngine()
+        analyzer = PerformanceAnalyzer()
+        signals = pd.Series(0, index=sample_stock_data.index, dtype=int)
+        for i in (5, 30, 35, 60):
+            signals.iloc[i] = Signal.SELL.value
+        for i in (10, 15, 40, 80):
+            signals.iloc[i] = Signal.BUY.value
+        
+        backtest_result = engine.run(sample_stock_data, signals)
+        performance = analyzer.analyze(backtest_result)
+        
+        # 有效交易只有 10->30 和 40->60 两笔
+        close = sample_stock_data['close']
+        wins = sum(close.iloc[exit_] > close.iloc[entry] for entry, exit_ in ((10, 30), (40, 60)))
+        assert performance['交易次数'] == '2'
+        assert performance['胜率'] == f"{wins / 2 * 100:.2f}%"
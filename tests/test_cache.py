@@ -0,0 +1,57 @@
+# tests/test_cache.py
+"""
+磁盘缓存模块测试
+"""
+
+import os
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+from src.core.cache import DiskCache, next_market_close
+
+
+class TestDiskCache:
+    """测试磁盘缓存"""
+    
+    def test_set_and_get(self, tmp_path):
+        """测试写入和读取"""
+        cache = DiskCache(str(tmp_path / 'fin'))
+        df = pd.DataFrame({'close': [1.0, 2.0]})
+        
+        cache.set('000001.SZ', df)
+        
+        pd.testing.assert_frame_equal(cache.get('000001.SZ'), df)
+        assert cache.get('600000.SH') is None
+    
+    def test_expired(self, tmp_path):
+        """测试过期后不再命中"""
+        cache = DiskCache(str(tmp_path), ttl=timedelta(days=1))
+        cache.set('key', {'pe': 10})
+        assert cache.get('key') == {'pe': 10}
+        
+        # 把文件修改时间改到两天前
+        path = os.path.join(str(tmp_path), 'key.pkl')
+        old = (datetime.now() - timedelta(days=2)).timestamp()
+        os.utime(path, (old, old))
+        assert cache.get('key') is None
+    
+    def test_get_or_load(self, tmp_path):
+        """测试未命中时调用loader，空数据不缓存"""
+        cache = DiskCache(str(tmp_path))
+        calls = []
+        
+        def loader():
+            calls.append(1)
+            return {'roe': 12.0}
+        
+        assert cache.get_or_load('a', loader) == {'roe': 12.0}
+        assert cache.get_or_load('a', loader) == {'roe': 12.0}
+        assert len(calls) == 1
+        
+        assert cache.get_or_load('b', lambda: {}) == {}
+        assert cache.get('b') is None
+    
+    def test_next_market_close(self):
+        """测试行情缓存的过期时间"""
+        assert next_market_close(datetime(2024, 1, 2, 10, 0)) == datetime(2024, 1, 2, 15, 0)
+        assert next_market_close(datetime(2024, 1, 2, 16, 0)) == datetime(2024, 1, 3, 15, 0)
@@ -30,7 +30,7 @@ class TestChartConfig:
         config = ChartConfig()
         assert 'ma_periods' in config.INDICATORS
         assert 'macd_fast' in config.INDICATORS
-        assert isinstance(config.INDICATORS['ma_periods'], list)
+        assert isinstance(config.INDICATORS['ma_periods'], tuple)
 
 
 class TestBacktestConfig:
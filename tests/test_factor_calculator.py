@@ -0,0 +1,101 @@
+"""
+多因子计算模块测试
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from src.analysis._kernels import return_moments
+from src.analysis.factor_calculator import FactorCalculator
+
+
+class TestReturnMoments:
+    """测试收益率统计量内核"""
+    
+    def test_return_moments_match_pandas(self, sample_stock_data):
+        """测试内核结果与pandas一致"""
+        close = sample_stock_data['close']
+        periods = np.array([10, 20, 60], dtype=np.int64)
+        stats = return_moments(close.to_numpy(dtype=np.float64), periods)
+        
+        for row, period in zip(stats, periods):
+            returns = close.pct_change().iloc[-period:].dropna()
+            assert row[0] == len(returns)
+            assert row[1] == pytest.approx(returns.mean())
+            assert row[2] == pytest.approx(returns.var())
+            assert row[3] == pytest.approx(returns.skew())
+            assert row[4] == pytest.approx(returns.kurtosis())
+    
+    def test_return_moments_short_series(self):
+        """测试数据不足时返回NaN"""
+        stats = return_moments(np.array([10.0, 10.5]), np.array([20], dtype=np.int64))
+        assert stats[0, 0] == 1
+        assert np.isnan(stats[0, 2])
+
+
+class TestFactorCalculator:
+    """测试因子计算器"""
+    
+    @patch('src.analysis.factor_calculator.FinancialDataManager')
+    @patch('src.analysis.factor_calculator.MarketDataManager')
+    def test_batch_calculate_factors(self, mock_market, mock_financial):
+        """测试批量计算因子：行列标签正确，数据不足的股票整行为NaN"""
+        dates = pd.date_range(start='2024-01-01', periods=200, freq='D')
+        np.random.seed(0)
+        close = 20 * (1 + np.random.randn(200) * 0.02).cumprod()
+        long_data = pd.DataFrame({
+            'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+            'volume': np.random.randint(1000000, 5000000, 200).astype(float)
+        }, index=dates)
+        
+        def get_local_data(stock_code, period, start_date, end_date):
+            return long_data if stock_code != '000002.SZ' else long_data.iloc[:50]
+        
+        mock_market.return_value.get_local_data.side_effect = get_local_data
+        mock_financial.return_value.get_financial_data.return_value = None
+        
+        calculator = FactorCalculator()
+        result = calculator.batch_calculate_factors(['000001.SZ', '000002.SZ'], end_date='20240719')
+        
+        assert list(result.index) == ['000001.SZ', '000002.SZ']
+        assert list(result.columns) == FactorCalculator.FACTOR_LIST
+        assert result.loc['000002.SZ'].isna().all()
+        assert result.loc['000001.SZ'].notna().all()
+        assert result.loc['000001.SZ', 'price_no_fq'] == pytest.approx(close[-1])
+    
+    @patch('src.analysis.factor_calculator.FinancialDataManager')
+    @patch('src.analysis.factor_calculator.MarketDataManager')
+    def test_calculate_mfi(self, mock_market, mock_financial, sample_stock_data):
+        """测试MFI：按当日与前一日典型价格逐日比较"""
+        period = 14
+        tail = sample_stock_data.iloc[-period - 1:]
+        tp = ((tail['high'] + tail['low'] + tail['close']) / 3).tolist()
+        volume = tail['volume'].tolist()
+        positive = sum(tp[t] * volume[t] for t in range(1, len(tp)) if tp[t] > tp[t - 1])
+        negative = sum(tp[t] * volume[t] for t in range(1, len(tp)) if tp[t] < tp[t - 1])
+        expected = 100 - 100 / (1 + positive / negative)
+        
+        mfi = FactorCalculator()._calculate_mfi(sample_stock_data, period=period)
+        
+        assert mfi == pytest.approx(expected)
+        assert 0.0 < mfi < 100.0
+    
+    @patch('src.analysis.factor_calculator.FinancialDataManager')
+    @patch('src.analysis.factor_calculator.MarketDataManager')
+    def test_last_window_factors_match_rolling(self, mock_market, mock_financial, sample_stock_data):
+        """测试末端窗口计算的布林/成交量均线因子与rolling().iloc[-1]一致"""
+        close = sample_stock_data['close']
+        volume = sample_stock_data['volume']
+        calculator = FactorCalculator()
+        
+        ma = close.rolling(window=20).mean().iloc[-1]
+        std = close.rolling(window=20).std().iloc[-1]
+        assert calculator._calculate_boll_down(sample_stock_data) == pytest.approx(ma - 2 * std)
+        assert calculator._calculate_bbic(sample_stock_data) == pytest.approx((close.iloc[-1] - ma) / std)
+        assert calculator._calculate_tvma(sample_stock_data) == pytest.approx(
+            volume.rolling(window=6).mean().iloc[-1])
+        
+        gapped = sample_stock_data.copy()
+        gapped.iloc[-3, gapped.columns.get_loc('volume')] = np.nan
+        assert calculator._calculate_tvma(gapped) == 0.0
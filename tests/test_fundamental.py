@@ -4,6 +4,8 @@
 """
 
 import pytest
+import numpy as np
+import pandas as pd
 from src.analysis.fundamental import FundamentalAnalyzer
 
 
@@ -40,6 +42,41 @@ class TestFundamentalAnalyzer:
         assert result is not None
         assert result['score'] < 50
     
+    def test_calculate_financial_score_boundaries(self):
+        """测试PE/PB区间边界上的得分标签"""
+        analyzer = FundamentalAnalyzer()
+        cases = [
+            ({'pe': 15.0}, 10, {'pe': 'normal'}),
+            ({'pe': 30.0}, 0, {}),
+            ({'pe': 50.0}, 0, {}),
+            ({'pe': 50.5}, -10, {'pe': 'high'}),
+            ({'pb': 2.0}, 8, {'pb': 'normal'}),
+            ({'pb': 5.0}, 0, {}),
+            ({'pb': 10.0}, 0, {}),
+            ({'pb': 10.5}, -5, {'pb': 'high'}),
+        ]
+        
+        for financial_data, score, details in cases:
+            result = analyzer.calculate_financial_score(financial_data)
+            assert result['score'] == score, financial_data
+            assert result['details'] == details, financial_data
+    
+    def test_calculate_financial_scores_batch(self):
+        """测试批量财务得分与逐只计算一致"""
+        analyzer = FundamentalAnalyzer()
+        rows = [
+            {'pe': 12.0, 'pb': 1.5, 'roe': 25.0, 'profit_growth': 35.0, 'revenue_growth': 25.0},
+            {'pe': 50.0, 'pb': 10.0, 'roe': 20.0, 'profit_growth': 30.0, 'revenue_growth': 5.0},
+            {'pe': 15.0, 'pb': -1.0, 'roe': np.nan, 'profit_growth': 0.0},
+            {'pe': 60.0, 'pb': 12.0, 'roe': 3.0, 'profit_growth': -5.0},
+        ]
+        df = pd.DataFrame(rows, index=['A', 'B', 'C', 'D'])
+        
+        result = analyzer.calculate_financial_scores_batch(df)
+        expected = [analyzer.calculate_financial_score(row)['score'] for row in rows]
+        assert list(result.index) == ['A', 'B', 'C', 'D']
+        assert result['score'].tolist() == expected
+    
     def test_filter_financial_data_pass(self):
         """测试财务数据筛选通过"""
         analyzer = FundamentalAnalyzer()
@@ -64,3 +101,18 @@ class TestFundamentalAnalyzer:
         
         result = analyzer.filter_financial_data(financial_data, filters)
         assert result == False
+    
+    def test_filter_financial_data_batch(self):
+        """测试批量财务筛选与逐只筛选一致"""
+        analyzer = FundamentalAnalyzer()
+        rows = [
+            {'pe': 20.0, 'pb': 3.0, 'roe': 15.0},
+            {'pe': 50.0, 'pb': 3.0, 'roe': 15.0},
+            {'pe': np.nan, 'pb': 3.0, 'roe': 5.0},
+            {'pe': 25.0, 'pb': np.nan, 'roe': np.nan},
+        ]
+        filters = {'max_pe': 30, 'min_roe': 10}
+        
+        mask = analyzer.filter_financial_data_batch(pd.DataFrame(rows), filters)
+        expected = [analyzer.filter_financial_data(row, filters) for row in rows]
+        assert mask.tolist() == expected == [True, False, False, True]
@@ -0,0 +1,195 @@
+# tests/test_risk_control.py
+"""
+风控模块测试
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import patch
+from src.strategy.risk_control import RiskController
+from src.strategy._kernels import wilder_smooth, rolling_weighted_beta
+
+
+@pytest.fixture
+def controller():
+    """数据管理器被替换的风控控制器"""
+    with patch('src.strategy.risk_control.MarketDataManager'):
+        yield RiskController(atr_period=3)
+
+
+class TestKernels:
+    """测试风控计算内核"""
+    
+    def test_wilder_smooth(self):
+        """前n个值取均值作初值，之后递推"""
+        x = np.array([1.0, 2.0, 3.0, 6.0, 9.0])
+        expected = 2.0
+        for v in (6.0, 9.0):
+            expected = (expected * 2 + v) / 3
+        assert wilder_smooth(x, 3) == pytest.approx(expected)
+    
+    def test_wilder_smooth_short(self):
+        """数据不足一个周期返回NaN"""
+        assert np.isnan(wilder_smooth(np.array([1.0, 2.0]), 3))
+
+    
+    def test_rolling_weighted_beta_invalid_windows(self):
+        """含NaN或价格恒定的窗口为NaN，成交量全为0时等权"""
+        lows = np.array([1.0, 1.0, 1.0, 2.0, np.nan, 3.0])
+        highs = lows * 2 + 1
+        volumes = np.zeros(6)
+        betas, r2s = rolling_weighted_beta(highs, lows, volumes, 3)
+        
+        assert len(betas) == 4
+        assert np.isnan(betas[0])
+        assert betas[1] == pytest.approx(2.0)
+        assert r2s[1] == pytest.approx(1.0)
+        assert np.isnan(betas[2]) and np.isnan(betas[3])
+
+
+class TestCalculateATR:
+    """测试ATR计算"""
+    
+    def test_calculate_atr(self, controller):
+        """TR取三者最大值并做Wilder平滑"""
+        data = pd.DataFrame({
+            'high': [10.0, 11.0, 10.5, 12.0, 11.5],
+            'low': [9.0, 10.0, 9.5, 10.5, 10.0],
+            'close': [9.5, 10.8, 10.0, 11.8, 10.2],
+        })
+        controller.market_data_manager.get_local_data.return_value = data
+        
+        # TR: [1.5, 1.3, 2.0, 1.8]
+        expected = (1.5 + 1.3 + 2.0) / 3
+        expected = (expected * 2 + 1.8) / 3
+        assert controller.calculate_atr('000001.SZ', '20240110') == pytest.approx(expected)
+    
+    def test_calculate_atr_insufficient_data(self, controller):
+        """数据不足返回0"""
+        controller.market_data_manager.get_local_data.return_value = pd.DataFrame(
+            {'high': [1.0], 'low': [1.0], 'close': [1.0]})
+        assert controller.calculate_atr('000001.SZ', '20240110') == 0.0
+    
+    def test_calculate_atr_cached(self, controller):
+        """同一股票同一截止日期只读取一次行情"""
+        data = pd.DataFrame({'high': np.full(10, 11.0), 'low': np.full(10, 10.0), 'close': np.full(10, 10.5)})
+        controller.market_data_manager.get_local_data.return_value = data
+        
+        assert controller.calculate_stop_loss_level('000001.SZ', 12.0, '20240110') == pytest.approx(10.0)
+        assert controller.calculate_stop_loss_level('000001.SZ', 12.0, '20240110') == pytest.approx(10.0)
+        assert controller.market_data_manager.get_local_data.call_count == 1
+        
+        controller.calculate_atr('000001.SZ', '20240111')
+        assert controller.market_data_manager.get_local_data.call_count == 2
+
+class TestMarketBreadth:
+    """测试市场宽度"""
+    
+    @patch('xtquant.xtdata')
+    def test_market_breadth(self, mock_xtdata, controller):
+        """一次批量取收盘价，含缺失值的股票不参与统计"""
+        mock_xtdata.get_stock_list_in_sector.return_value = ['A.SZ', 'B.SZ', 'C.SZ']
+        closes = pd.DataFrame(
+            [[1.0, 2.0, 3.0], [3.0, 2.0, 1.0], [np.nan, 2.0, 3.0]],
+            index=['A.SZ', 'B.SZ', 'C.SZ'], columns=['d1', 'd2', 'd3'])
+        mock_xtdata.get_market_data.return_value = {'close': closes}
+        
+        assert controller.calculate_market_breadth('20240110', count=3) == pytest.approx(50.0)
+        mock_xtdata.get_market_data.assert_called_once()
+        
+        # 同一截止日期直接返回缓存结果
+        assert controller.calculate_market_breadth('20240110', count=3) == pytest.approx(50.0)
+        mock_xtdata.get_market_data.assert_called_once()
+    
+    @patch('xtquant.xtdata')
+    def test_market_breadth_no_data(self, mock_xtdata, controller):
+        """无行情数据时返回默认值且不缓存"""
+        mock_xtdata.get_stock_list_in_sector.return_value = ['A.SZ']
+        mock_xtdata.get_market_data.return_value = {}
+        
+        controller.market_data_manager.get_local_data.return_value = None
+        
+        assert controller.calculate_market_breadth('20240110') == 50.0
+        assert controller._breadth_memo == {}
+    
+    @patch('xtquant.xtdata')
+    def test_market_breadth_local_fallback(self, mock_xtdata, controller):
+        """批量接口失败时并发读取本地数据，按日期对齐，读取失败的股票跳过"""
+        mock_xtdata.get_stock_list_in_sector.return_value = ['A.SZ', 'B.SZ', 'C.SZ', 'D.SZ']
+        mock_xtdata.get_market_data.side_effect = RuntimeError('bulk unavailable')
+        local = {
+            'A.SZ': pd.DataFrame({'close': [1.0, 2.0, 3.0]}, index=['d1', 'd2', 'd3']),
+            'B.SZ': pd.DataFrame({'close': [3.0, 2.0, 1.0]}, index=['d1', 'd2', 'd3']),
+            'C.SZ': pd.DataFrame({'close': [2.0, 3.0]}, index=['d2', 'd3']),
+        }
+        
+        def get_local_data(stock_code, period, start_date, end_date):
+            if stock_code == 'D.SZ':
+                raise IOError('read failed')
+            return local[stock_code]
+        
+        controller.market_data_manager.get_local_data.side_effect = get_local_data
+        
+        assert controller.calculate_market_breadth('20240110', count=3) == pytest.approx(50.0)
+
+
+class TestCalculateRSRS:
+    """测试RSRS计算"""
+    
+    def test_calculate_rsrs(self, controller):
+        """加权回归的斜率与R²与最小二乘解一致"""
+        rng = np.random.default_rng(0)
+        size, n, m = 60, 10, 40
+        low = 10 + rng.normal(0, 1, size).cumsum()
+        high = low + rng.uniform(0.1, 1.0, size)
+        volume = rng.uniform(1e4, 1e5, size)
+        controller.market_data_manager.get_local_data.return_value = pd.DataFrame(
+            {'high': high, 'low': low, 'volume': volume})
+        
+        betas, r2s = [], []
+        for i in range(size - n + 1):
+            sw = np.sqrt(volume[i:i+n])
+            X = np.column_stack([np.ones(n), low[i:i+n]])
+            y = high[i:i+n]
+            coef = np.linalg.lstsq(X * sw[:, None], y * sw, rcond=None)[0]
+            w = volume[i:i+n] / volume[i:i+n].sum()
+            resid = y - X @ coef
+            ym = (w * y).sum()
+            betas.append(coef[1])
+            r2s.append(1 - (w * resid ** 2).sum() / (w * (y - ym) ** 2).sum())
+        betas = np.array(betas)
+        expected = (betas[-1] - betas[-m:].mean()) / betas[-m:].std() * r2s[-1] * betas[-1]
+        
+        assert controller.calculate_rsrs('000001.SZ', '20240110', n=n, m=m) == pytest.approx(expected)
+    
+    def test_calculate_rsrs_insufficient_data(self, controller):
+        """数据不足返回0"""
+        controller.market_data_manager.get_local_data.return_value = pd.DataFrame(
+            {'high': [1.0, 2.0], 'low': [0.5, 1.0], 'volume': [1.0, 1.0]})
+        assert controller.calculate_rsrs('000001.SZ', '20240110', n=18, m=600) == 0.0
+    
+    def test_calculate_rsrs_drops_invalid_rows(self, controller):
+        """价格或成交量非有限值的K线被剔除，其余K线保留原成交量权重"""
+        rng = np.random.default_rng(1)
+        size = 40
+        low = 10 + rng.normal(0, 1, size).cumsum()
+        data = pd.DataFrame({'high': low + rng.uniform(0.1, 1.0, size), 'low': low,
+                             'volume': rng.uniform(1e4, 1e5, size)})
+        dirty = data.copy()
+        dirty.loc[5, 'high'] = np.inf
+        dirty.loc[9, 'volume'] = np.nan
+        
+        controller.market_data_manager.get_local_data.return_value = data.drop(index=[5, 9])
+        expected = controller.calculate_rsrs('000001.SZ', '20240110', n=8, m=20)
+        controller.market_data_manager.get_local_data.return_value = dirty
+        
+        assert controller.calculate_rsrs('000001.SZ', '20240110', n=8, m=20) == pytest.approx(expected)
+    
+    def test_market_rsrs_cached(self, controller):
+        """同一指数同一截止日期只计算一次大盘RSRS"""
+        controller.market_data_manager.get_local_data.return_value = None
+        
+        controller.calculate_market_rsrs('20240110')
+        controller.calculate_market_rsrs('20240110')
+        assert controller.market_data_manager.get_local_data.call_count == 1
@@ -4,8 +4,13 @@
 """
 
 import pytest
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, Mock
-from src.selection.selector import StockSelector
+import os
+import pickle
+from src.selection.selector import StockSelector, MLStockSelector, _unpickle_model
 
 
 class TestStockSelector:
@@ -29,3 +34,356 @@ class TestStockSelector:
         stock_list = selector.get_a_stock_list()
         assert isinstance(stock_list, list)
         assert len(stock_list) >= 0
+    
+    @patch('src.selection.selector.xtdata')
+    def test_get_a_stock_list_filters_suffix(self, mock_xtdata):
+        """测试只保留.SZ/.SH后缀的代码"""
+        selector = StockSelector()
+        mock_xtdata.get_stock_list_in_sector.return_value = [
+            '000001.SZ', '830799.BJ', None, '600000.SH', 'SZ'
+        ]
+        
+        assert selector.get_a_stock_list() == ['000001.SZ', '600000.SH']
+    
+    @patch('src.selection.selector.xtdata')
+    def test_get_technical_scores_bulk(self, mock_xtdata, sample_stock_data):
+        """测试批量技术得分与逐只计算一致"""
+        selector = StockSelector()
+        short = sample_stock_data.iloc[70:]
+        frames = {'000001.SZ': sample_stock_data, '600000.SH': short,
+                  '000002.SZ': sample_stock_data.iloc[:10]}
+        
+        # 模拟 get_market_data 的返回：{字段: DataFrame(index=股票, columns=日期)}
+        mock_xtdata.get_market_data.return_value = {
+            field: pd.DataFrame({code: data[field] for code, data in frames.items()}).T
+            for field in ('high', 'low', 'close', 'volume')
+        }
+        
+        result = selector.get_technical_scores_bulk(list(frames) + ['600519.SH'])
+        
+        mock_xtdata.get_market_data.assert_called_once()
+        assert list(result.index) == ['000001.SZ', '600000.SH']
+        for code in result.index:
+            selector.market_data_manager.get_local_data = Mock(return_value=frames[code])
+            expected = selector.get_technical_score(code)
+            assert result.loc[code, 'score'] == expected['score']
+            assert result.loc[code, 'latest_price'] == expected['latest_price']
+            assert result.loc[code, 'ma20'] == pytest.approx(expected['ma20'])
+            assert result.loc[code, 'trend_up'] == (expected['details'].get('trend') == 'up')
+            assert result.loc[code, 'above_ma5'] == ('price_vs_ma5' in expected['details'])
+    
+    def test_score_latest_batch(self):
+        """测试技术评分规则（含NaN指标）"""
+        close = np.vstack([np.linspace(10, 11, 20), np.linspace(11, 10, 20)])
+        volume = np.vstack([np.r_[np.ones(19), 2.0], np.ones(20)])
+        latest = {
+            'MA5': np.array([10.5, np.nan]), 'MA10': np.array([10.4, 10.5]),
+            'MA20': np.array([10.6, 10.5]), 'DIF': np.array([0.2, 0.1]),
+            'DEA': np.array([0.1, 0.2]), 'MACD': np.array([0.2, -0.2]),
+            'K': np.array([50.0, 25.0]), 'D': np.array([40.0, 30.0]),
+        }
+        
+        scores, rules = StockSelector._score_latest_batch(close, volume, latest)
+        
+        # 第1只：站上三条均线、MACD多头、KDJ正常、放量、涨幅10%（强势）
+        assert scores[0] == 10 * 3 + 10 * 2 + 10 + 15 + 15
+        # 第2只：MA5为NaN不计均线分，仅KDJ超卖得分
+        assert scores[1] == 10
+        assert rules['kdj_oversold'].tolist() == [False, True]
+        assert not rules['trend_up'].any()
+    
+    @patch('src.selection.selector.xtdata')
+    def test_bulk_fetch_uses_disk_cache(self, mock_xtdata, sample_stock_data, tmp_path):
+        """测试启用磁盘缓存后重复批量取数只访问一次行情接口"""
+        selector = StockSelector(cache_dir=str(tmp_path))
+        mock_xtdata.get_market_data.return_value = {
+            field: sample_stock_data[[field]].T.set_axis(['000001.SZ'])
+            for field in ('high', 'low', 'close', 'volume')
+        }
+        
+        first = selector.get_technical_scores_bulk(['000001.SZ'])
+        second = selector.get_technical_scores_bulk(['000001.SZ'])
+        
+        assert mock_xtdata.get_market_data.call_count == 1
+        pd.testing.assert_frame_equal(first, second)
+    
+    @patch('src.selection.selector.xtdata')
+    def test_select_stocks(self, mock_xtdata, sample_stock_data):
+        """测试选股主流程：财务筛选、技术得分查找与总分排序"""
+        selector = StockSelector()
+        codes = ['000001.SZ', '600000.SH', '600519.SH']
+        mock_xtdata.get_market_data.return_value = {
+            field: pd.DataFrame({code: sample_stock_data[field] for code in codes}).T
+            for field in ('high', 'low', 'close', 'volume')
+        }
+        financials = {
+            '000001.SZ': {'pe': 10, 'pb': 1.0, 'roe': 20, 'profit_growth': 30, 'revenue_growth': 25},
+            '600000.SH': {'pe': 80, 'pb': 1.0, 'roe': 20, 'profit_growth': 30},  # PE超出范围
+            '600519.SH': {'pe': 30, 'pb': 8.0, 'roe': 12, 'profit_growth': 5, 'revenue_growth': 5},
+        }
+        selector.financial_data_manager.get_financial_data = Mock(
+            side_effect=lambda code, auto_download=True: financials.get(code))
+        
+        result = selector.select_stocks(codes, technical_filters={'min_technical_score': 0,
+                                                                  'require_above_ma20': False},
+                                        min_total_score=0)
+        
+        assert list(result['stock_code']) == ['000001.SZ', '600519.SH']
+        assert result['total_score'].is_monotonic_decreasing
+        assert result['total_score'].dtype == np.float32
+        assert result['technical_score'].dtype == np.int64
+        assert result['latest_price'].dtype == np.float64
+        assert np.isnan(result.loc[1, 'market_cap'])
+        # 只为通过财务筛选的股票获取行情
+        assert mock_xtdata.get_market_data.call_args.kwargs['stock_list'] == ['000001.SZ', '600519.SH']
+        for code, score in zip(result['stock_code'], result['financial_score']):
+            assert score == selector.fundamental_analyzer.calculate_financial_score(financials[code])['score']
+        technical = selector.get_technical_scores_bulk(codes)
+        assert (result['technical_score'] == technical.loc['000001.SZ', 'score']).all()
+    
+    @patch('src.selection.selector.xtdata')
+    def test_get_technical_score_from_panel(self, mock_xtdata, sample_stock_data):
+        """测试从预加载面板切片计算技术得分，与单独获取一致"""
+        selector = StockSelector()
+        mock_xtdata.get_market_data.return_value = {
+            field: sample_stock_data[[field]].T.set_axis(['000001.SZ'])
+            for field in ('close', 'high', 'low', 'volume')
+        }
+        panel = selector._preload_panel(['000001.SZ'], '20240101', '20240501')
+        selector.market_data_manager.get_local_data = Mock(return_value=sample_stock_data)
+        
+        assert selector.get_technical_score('000001.SZ', panel=panel) == \
+            selector.get_technical_score('000001.SZ')
+        assert selector.get_technical_score('600000.SH', panel=panel) is None
+    
+    def test_get_technical_score_cached(self, sample_stock_data):
+        """测试同一交易日内重复计算技术得分只获取一次行情"""
+        selector = StockSelector()
+        selector.market_data_manager.get_local_data = Mock(return_value=sample_stock_data)
+        
+        first = selector.get_technical_score('000001.SZ')
+        first['details'].clear()
+        second = selector.get_technical_score('000001.SZ')
+        
+        assert selector.market_data_manager.get_local_data.call_count == 1
+        assert second['score'] == first['score']
+        assert second['details'] or second['score'] == 0
+    
+    def test_get_financial_data_memoized(self):
+        """测试同一天内重复获取财务数据只请求一次，获取失败的结果不缓存"""
+        selector = StockSelector()
+        financials = {'000001.SZ': {'roe': 20}, '600000.SH': None}
+        selector.financial_data_manager.get_financial_data = Mock(
+            side_effect=lambda code, auto_download=True: financials[code])
+        
+        for _ in range(2):
+            assert selector._get_financial_data('000001.SZ') == {'roe': 20}
+            assert selector._get_financial_data('600000.SH', auto_download=False) is None
+        
+        assert selector.financial_data_manager.get_financial_data.call_count == 3
+    
+    def test_financial_frame_reads_date_once(self):
+        """测试批量获取财务数据时当天日期只在入口计算一次"""
+        selector = StockSelector()
+        selector.financial_data_manager.get_financial_data = Mock(return_value={'pe': 10})
+        
+        with patch('src.selection.selector.get_today', return_value='20240110') as mock_today:
+            df = selector._get_financial_frame(['000001.SZ', '600000.SH', '600519.SH'], threads=2)
+        
+        assert len(df) == 3
+        mock_today.assert_called_once()
+        assert set(key[1] for key in selector._fin_memo) == {'20240110'}
+    
+    def test_save_selection_result(self, tmp_path, monkeypatch):
+        """测试保存选股结果（未安装pyarrow时改存CSV）"""
+        monkeypatch.chdir(tmp_path)
+        selector = StockSelector()
+        result = pd.DataFrame({'stock_code': ['000001.SZ'], 'total_score': [80.0]})
+        
+        selector.save_selection_result(result, 'result.csv', fmt='csv')
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'data' / 'result.csv'), result)
+        
+        selector.save_selection_result(result, 'result.csv')
+        try:
+            import pyarrow  # noqa: F401
+            saved = pd.read_parquet(tmp_path / 'data' / 'result.parquet')
+        except ImportError:
+            saved = pd.read_csv(tmp_path / 'data' / 'result.csv')
+        pd.testing.assert_frame_equal(saved, result)
+    
+    def test_get_financial_frame(self):
+        """测试财务数据整理为数值矩阵（缺失、非数值按NaN处理）"""
+        selector = StockSelector()
+        financials = {
+            '000001.SZ': {'pe': 10, 'roe': None, 'market_cap': 1e10},
+            '600000.SH': {},
+            '600519.SH': {'pe': 'N/A', 'pb': '8.5'},
+        }
+        selector.financial_data_manager.get_financial_data = Mock(
+            side_effect=lambda code, auto_download=True: financials.get(code))
+        
+        df = selector._get_financial_frame(list(financials) + ['000002.SZ'])
+        
+        assert list(df.index) == ['000001.SZ', '600519.SH']
+        assert df.loc['000001.SZ', 'pe'] == 10
+        assert np.isnan(df.loc['000001.SZ', 'roe'])
+        assert np.isnan(df.loc['600519.SH', 'pe'])
+        assert df.loc['600519.SH', 'pb'] == 8.5
+        
+        # 多线程取数结果与逐只获取一致（行顺序仍按stock_list）
+        threaded = selector._get_financial_frame(list(financials) + ['000002.SZ'], threads=4)
+        pd.testing.assert_frame_equal(threaded, df)
+    
+    def test_score_staged_early_exit(self):
+        """测试分阶段评分：达到阈值的股票得分不变，提前结束的股票得分低于阈值"""
+        selector = StockSelector()
+        rng = np.random.default_rng(0)
+        close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (40, 60)), axis=1)
+        high = close * 1.01
+        low = close * 0.99
+        volume = rng.uniform(1e6, 2e6, close.shape)
+        
+        full, full_rules, _ = selector._score_staged(high, low, close, volume)
+        staged, _, _ = selector._score_staged(high, low, close, volume, min_technical_score=50)
+        
+        reached = full >= 50
+        assert reached.any() and not reached.all()
+        assert (staged[reached] == full[reached]).all()
+        assert (staged[~reached] < 50).all()
+        assert (full == StockSelector._score_latest_batch(
+            close, volume, selector.indicator_calculator.calculate_latest_batch(high, low, close))[0]).all()
+
+
+def _make_ml_selector(stock_num=2):
+    """不加载模型，直接构造ML选股器（只测试数据处理部分）"""
+    selector = MLStockSelector.__new__(MLStockSelector)
+    StockSelector.__init__(selector)
+    selector.stock_num = stock_num
+    selector.score_threshold = 0.61
+    return selector
+
+
+class TestMLStockSelector:
+    """测试ML选股器的数据处理部分"""
+    
+    def test_get_fundamental_filtered(self):
+        """测试基本面筛选：ROE/ROA阈值、按市值升序取前stock_num只"""
+        selector = _make_ml_selector(stock_num=2)
+        financials = {
+            '000001.SZ': {'roe': 0.20, 'roa': 0.12, 'market_cap': 3e10},
+            '000002.SZ': {'roe': 0.10, 'roa': 0.12, 'market_cap': 1e9},   # ROE不达标
+            '600000.SH': {'roe': 0.18, 'roa': 0.11, 'market_cap': 2e10},
+            '600036.SH': {'roe': 0.30, 'roa': 0.20, 'market_cap': 5e10},
+            '600519.SH': None,
+            '601398.SH': {'roe': 0.25, 'roa': 0.15, 'market_cap': None},  # 市值缺失排在最后
+        }
+        selector.financial_data_manager.get_financial_data = Mock(
+            side_effect=lambda code, auto_download=True: financials[code])
+        
+        assert selector._get_fundamental_filtered(list(financials)) == ['600000.SH', '000001.SZ']
+        
+        selector.stock_num = 5
+        assert selector._get_fundamental_filtered(list(financials)) == \
+            ['600000.SH', '000001.SZ', '600036.SH', '601398.SH']
+        assert all(call.kwargs == {'auto_download': False}
+                   for call in selector.financial_data_manager.get_financial_data.call_args_list)
+    
+    @patch('src.selection.selector.xtdata')
+    def test_filter_tradeable(self, mock_xtdata):
+        """测试可交易过滤：停牌、涨停、跌停被剔除，已持仓的涨跌停股票保留"""
+        selector = _make_ml_selector()
+        codes = ['000001.SZ', '000002.SZ', '600000.SH', '600036.SH', '600519.SH', '601398.SH']
+        mock_xtdata.get_market_data.return_value = {
+            field: pd.DataFrame({'20240105': values}, index=codes[:-1])
+            for field, values in {
+                # 正常、停牌（无价）、停牌（无量）、涨停、跌停
+                'close': [10.0, np.nan, 8.0, 11.06, 9.05],
+                'preClose': [10.0, 5.0, 8.0, 10.05, 10.05],
+                'volume': [1000, 0, 0, 500, 500],
+            }.items()
+        }
+        
+        assert selector._filter_tradeable(codes, '20240105') == ['000001.SZ']
+        assert selector._filter_tradeable(codes, '20240105', hold_stocks=['600036.SH', '000002.SZ']) == \
+            ['000001.SZ', '600036.SH']
+        assert mock_xtdata.get_market_data.call_count == 2
+    
+    def test_predict_scores(self):
+        """测试模型预测得分：float32连续输入，概率 @ 类别向量"""
+        selector = _make_ml_selector()
+        selector.model_classes = np.array([0, 0.3, 0.6, 0.9, 1.2, 1.5, 1.8, 2.1])
+        selector._model_classes_f32 = selector.model_classes.astype(np.float32)
+        proba = np.full((2, 8), 0.125)
+        proba[1] = [0, 0, 0, 0, 0, 0, 0.5, 0.5]
+        selector.model = Mock()
+        selector.model.predict_proba.return_value = proba
+        factors = np.array([[1.0, 2.0], [np.nan, 3.0]])
+        
+        scores = selector._predict_scores(factors)
+        
+        X = selector.model.predict_proba.call_args[0][0]
+        assert X.dtype == np.float32 and X.flags['C_CONTIGUOUS']
+        assert np.isnan(X[1, 0])
+        assert scores.dtype == np.float32
+        np.testing.assert_allclose(scores, proba @ selector.model_classes, rtol=1e-6)
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_select_stocks_ml(self, workers):
+        """测试ML选股流程：因子计算失败的股票剔除，不可交易和低于阈值的不入选，按得分取前stock_num只"""
+        selector = _make_ml_selector(stock_num=2)
+        selector.model_classes = np.array([0.0, 1.0])
+        selector._model_classes_f32 = selector.model_classes.astype(np.float32)
+        codes = ['000001.SZ', '000002.SZ', '600000.SH', '600036.SH', '600519.SH']
+        selector._get_index_stocks = Mock(return_value=codes)
+        selector._filter_kcbj_stock = selector._filter_st_stock = lambda stocks: stocks
+        selector._get_fundamental_filtered = Mock(side_effect=lambda stocks, end_date: stocks)
+        selector._filter_tradeable = Mock(side_effect=lambda stocks, end_date: stocks[1:])
+        
+        # 第一个因子即“上涨概率”，600036.SH的因子计算失败
+        probability = {'000001.SZ': 0.9, '000002.SZ': 0.7, '600000.SH': 0.5, '600519.SH': 0.8}
+        
+        def calculate(stock_code, end_date, out=None):
+            if stock_code not in probability:
+                raise ValueError('数据不足')
+            if out is None:
+                out = np.empty(2)
+            out[:] = probability[stock_code]
+            return out
+        
+        selector.factor_calculator = Mock(FACTOR_LIST=['f1', 'f2'])
+        selector.factor_calculator.calculate_all_factors_as_array.side_effect = calculate
+        selector.model = Mock()
+        selector.model.predict_proba.side_effect = lambda X: np.column_stack([1 - X[:, 0], X[:, 0]])
+        
+        # 进程池替换为同进程的线程池，子进程初始化函数创建的因子计算器即上面的Mock
+        class InlineProcessPool(ThreadPoolExecutor):
+            def __init__(self, max_workers, mp_context, initializer):
+                super().__init__(max_workers, initializer=initializer)
+        
+        with patch('src.selection.selector.ProcessPoolExecutor', InlineProcessPool), \
+                patch('src.selection.selector.FactorCalculator', return_value=selector.factor_calculator):
+            stocks, scores = selector.select_stocks_ml(end_date='20240105', workers=workers)
+        
+        assert stocks == ['600519.SH', '000002.SZ']
+        assert scores == pytest.approx([0.8, 0.7])
+        assert selector._filter_tradeable.call_args[0][0] == ['000001.SZ', '000002.SZ', '600000.SH', '600519.SH']
+    
+    def test_filter_kcbj_stock(self):
+        """测试过滤科创、北交、创业板股票"""
+        selector = _make_ml_selector()
+        codes = ['000001.SZ', '300750.SZ', '430047.BJ', '830799.BJ', '688981.SH', '600519.SH', '601398.SH']
+        
+        assert selector._filter_kcbj_stock(codes) == ['000001.SZ', '600519.SH', '601398.SH']
+    
+    def test_unpickle_model_shared(self, tmp_path):
+        """测试模型文件只反序列化一次，文件修改后重新加载"""
+        path = tmp_path / 'model.pkl'
+        path.write_bytes(pickle.dumps({'classes': [0, 1]}))
+        mtime = os.path.getmtime(path)
+        
+        first = _unpickle_model(str(path), mtime)
+        assert _unpickle_model(str(path), mtime) is first
+        
+        path.write_bytes(pickle.dumps({'classes': [0, 1, 2]}))
+        os.utime(path, (mtime + 10, mtime + 10))
+        assert _unpickle_model(str(path), os.path.getmtime(path)) == {'classes': [0, 1, 2]}
@@ -4,8 +4,12 @@
 """
 
 import pytest
+import numpy as np
 import pandas as pd
-from src.strategy.strategies import Signal, MACDStrategy, MAStrategy, KDJStrategy, SignalGenerator
+from unittest.mock import patch
+from src.strategy._kernels import crossover_signals
+from src.strategy.strategies import (Signal, MACDStrategy, MAStrategy, KDJStrategy, RSIStrategy, SignalGenerator,
+                                     CombinedStrategy, MLMultiFactorStrategy)
 
 
 class TestSignal:
@@ -18,6 +22,30 @@ class TestSignal:
         assert Signal.HOLD.value == 0
 
 
+class TestCrossoverSignals:
+    """测试交叉信号内核"""
+    
+    def test_crossover_signals_gate(self):
+        """交叉点的gate不在区间内时不发出信号"""
+        fast = np.array([0.0, 2.0, 0.0, 2.0, 0.0])
+        slow = np.ones(5)
+        gate = np.array([0.0, 5.0, -5.0, -5.0, 5.0])
+        
+        signals = crossover_signals(fast, slow, gate, 0.0, np.inf, -np.inf, 0.0)
+        
+        assert signals.tolist() == [0, 1, -1, 0, 0]
+    
+    def test_float32_indicators(self, sample_stock_data, sample_indicators):
+        """float32指标与float64指标生成相同的信号"""
+        indicators32 = {name: frame.astype(np.float32) for name, frame in sample_indicators.items()}
+        
+        for strategy in (MACDStrategy(), KDJStrategy()):
+            expected = strategy.generate_signals(sample_stock_data, sample_indicators)
+            signals = strategy.generate_signals(sample_stock_data, indicators32)
+            assert signals.dtype == int
+            assert (signals == expected).all()
+
+
 class TestMACDStrategy:
     """测试MACD策略"""
     
@@ -51,6 +79,47 @@ class TestMAStrategy:
         
         assert isinstance(signals, pd.Series)
         assert len(signals) == len(sample_stock_data)
+    
+    def test_ma_strategy_crossovers(self):
+        """测试多均线上穿/下穿信号：首根K线和含NaN的K线不产生信号"""
+        index = pd.date_range('2024-01-01', periods=7)
+        data = pd.DataFrame({'close': np.ones(7)}, index=index)
+        indicators = {'ma': pd.DataFrame({
+            'MA5': [1.0, 3.0, 3.0, 1.0, np.nan, 3.0, 2.0],
+            'MA10': [2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0],
+        }, index=index)}
+        
+        signals = MAStrategy(use_multiple_ma=True).generate_signals(data, indicators)
+        
+        assert signals.tolist() == [0, 1, 0, -1, 0, 0, 0]
+        assert signals.dtype == int
+
+
+class TestRSIStrategy:
+    """测试RSI策略"""
+    
+    def test_rsi_matches_wilder_ewm(self, sample_stock_data):
+        """测试RSI采用Wilder平滑（ewm alpha=1/period）"""
+        delta = sample_stock_data['close'].diff()
+        gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        loss = (-delta).clip(lower=0).ewm(alpha=1 / 14, adjust=False).mean()
+        expected = 100 - 100 / (1 + gain / (loss + 1e-8))
+        
+        rsi = RSIStrategy(period=14)._calculate_rsi(sample_stock_data)
+        
+        pd.testing.assert_series_equal(rsi, expected, check_names=False)
+    
+    def test_rsi_strategy_generate_signals(self, sample_stock_data):
+        """测试下穿超卖线买入、上穿超买线卖出"""
+        strategy = RSIStrategy()
+        signals = strategy.generate_signals(sample_stock_data, {})
+        rsi = strategy._calculate_rsi(sample_stock_data)
+        
+        assert signals.dtype == int
+        for i in np.flatnonzero(signals.to_numpy() == Signal.BUY.value):
+            assert rsi.iloc[i] < 30 <= rsi.iloc[i - 1]
+        for i in np.flatnonzero(signals.to_numpy() == Signal.SELL.value):
+            assert rsi.iloc[i] > 70 >= rsi.iloc[i - 1]
 
 
 class TestKDJStrategy:
@@ -68,3 +137,55 @@ class TestKDJStrategy:
         
         assert isinstance(signals, pd.Series)
         assert len(signals) == len(sample_stock_data)
+
+
+class _FixedStrategy(SignalGenerator):
+    """返回固定信号的测试策略"""
+    
+    def __init__(self, values):
+        self.values = values
+    
+    def generate_signals(self, data, indicators):
+        return pd.Series(self.values, index=data.index, dtype=int)
+
+
+class TestCombinedStrategy:
+    """测试组合策略"""
+    
+    def test_combined_strategy_votes(self):
+        """达到票数阈值才发出信号，买入优先"""
+        data = pd.DataFrame({'close': np.ones(5)})
+        strategy = CombinedStrategy([
+            _FixedStrategy([1, 1, -1, 0, 1]),
+            _FixedStrategy([1, -1, -1, 0, -1]),
+            _FixedStrategy([0, 1, -1, 1, -1]),
+        ], vote_threshold=2)
+        
+        signals = strategy.generate_signals(data, {})
+        
+        assert signals.tolist() == [1, 1, -1, 0, -1]
+        assert signals.dtype == int
+
+
+class TestMLMultiFactorStrategy:
+    """测试ML多因子策略"""
+    
+    @patch('src.strategy.strategies.MLStockSelector')
+    def test_holdings_tracking(self, mock_selector):
+        """调仓日买入选中股票、卖出落选的持仓"""
+        strategy = MLMultiFactorStrategy('model.pkl')
+        strategy.update_holdings(['000002.SZ'])
+        data = pd.DataFrame({'close': np.ones(3)})
+        context = {'is_rebalance_day': True, 'selected_stocks': ['000001.SZ']}
+        
+        signals = strategy.generate_signals(data, {}, context={**context, 'stock_code': '000001.SZ'})
+        assert signals.iloc[-1] == Signal.BUY.value
+        
+        signals = strategy.generate_signals(data, {}, context={**context, 'stock_code': '000002.SZ'})
+        assert signals.iloc[-1] == Signal.SELL.value
+        assert strategy.current_holdings == ['000001.SZ']
+        
+        # 已持仓的股票不重复买入
+        signals = strategy.generate_signals(data, {}, context={**context, 'stock_code': '000001.SZ'})
+        assert signals.iloc[-1] == Signal.HOLD.value
+
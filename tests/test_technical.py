@@ -24,6 +24,17 @@ class TestTechnicalIndicators:
         assert 'MA20' in ma_data.columns
         assert len(ma_data) == len(sample_stock_data)
     
+    def test_calculate_ma_match_pandas_rolling(self, sample_stock_data):
+        """测试均线内核结果与pandas rolling一致（含窗口内缺失值）"""
+        calculator = TechnicalIndicators()
+        data = sample_stock_data.copy()
+        data.iloc[30, data.columns.get_loc('close')] = np.nan
+        ma_data = calculator.calculate_moving_averages(data)
+        
+        for period in (5, 10, 20):
+            expected = data['close'].rolling(window=period).mean()
+            np.testing.assert_allclose(ma_data[f'MA{period}'], expected, rtol=1e-10)
+    
     def test_calculate_macd(self, sample_stock_data):
         """测试MACD指标计算"""
         calculator = TechnicalIndicators()
@@ -44,6 +55,32 @@ class TestTechnicalIndicators:
         assert 'D' in kdj_data.columns
         assert 'J' in kdj_data.columns
     
+    def test_macd_kdj_match_pandas_ewm(self, sample_stock_data):
+        """测试EMA内核结果与pandas ewm一致"""
+        calculator = TechnicalIndicators()
+        close = sample_stock_data['close']
+        ema_fast = close.ewm(span=12, adjust=False).mean()
+        ema_slow = close.ewm(span=26, adjust=False).mean()
+        dif = ema_fast - ema_slow
+        dea = dif.ewm(span=9, adjust=False).mean()
+        
+        macd_data = calculator.calculate_macd(sample_stock_data)
+        np.testing.assert_allclose(macd_data['DIF'], dif, rtol=1e-10)
+        np.testing.assert_allclose(macd_data['DEA'], dea, rtol=1e-10)
+        
+        kdj_data = calculator.calculate_kdj(sample_stock_data)
+        assert kdj_data['K'].iloc[:8].isna().all()
+        assert kdj_data['K'].iloc[8:].notna().all()
+    
+    def test_float32_indicators(self, sample_stock_data):
+        """测试float32精度下指标与float64结果接近"""
+        indicators_64 = TechnicalIndicators().calculate_all(sample_stock_data)
+        indicators_32 = TechnicalIndicators(dtype=np.float32).calculate_all(sample_stock_data)
+        
+        for name in ('ma', 'macd', 'kdj'):
+            assert (indicators_32[name].dtypes == np.float32).all()
+            np.testing.assert_allclose(indicators_32[name], indicators_64[name], rtol=1e-4, atol=1e-3)
+    
     def test_calculate_all(self, sample_stock_data):
         """测试计算所有指标"""
         calculator = TechnicalIndicators()
@@ -53,6 +90,51 @@ class TestTechnicalIndicators:
         assert 'ma' in indicators
         assert 'macd' in indicators
         assert 'kdj' in indicators
+    
+    def test_calculate_all_batch(self, sample_stock_data):
+        """测试多进程批量计算指标"""
+        calculator = TechnicalIndicators()
+        data_dict = {'000001.SZ': sample_stock_data, '600000.SH': sample_stock_data * 1.1}
+        
+        results = calculator.calculate_all_batch(data_dict, workers=2)
+        
+        assert set(results) == set(data_dict)
+        for symbol, data in data_dict.items():
+            expected = calculator.calculate_all(data)
+            pd.testing.assert_frame_equal(results[symbol]['macd'], expected['macd'])
+    
+    def test_calculate_latest_batch(self, sample_stock_data):
+        """测试批量计算最新指标值（行首NaN补齐的股票与单独计算一致）"""
+        calculator = TechnicalIndicators()
+        short = sample_stock_data.iloc[30:]
+        
+        def padded(field):
+            row = np.full(len(sample_stock_data), np.nan)
+            row[-len(short):] = short[field].to_numpy()
+            return np.vstack([sample_stock_data[field].to_numpy(), row])
+        
+        latest = calculator.calculate_latest_batch(padded('high'), padded('low'), padded('close'))
+        
+        for s, data in enumerate([sample_stock_data, short]):
+            indicators = calculator.calculate_all(data)
+            for key in ('ma', 'macd', 'kdj'):
+                for column, value in indicators[key].iloc[-1].items():
+                    assert latest[column][s] == pytest.approx(value, rel=1e-12)
+    
+    def test_calculate_subset_and_last(self, sample_stock_data):
+        """测试只计算部分指标组、只计算最新值"""
+        calculator = TechnicalIndicators()
+        full = calculator.calculate_all(sample_stock_data)
+        
+        subset = calculator.calculate_subset(sample_stock_data, names=('macd',))
+        assert list(subset) == ['macd']
+        pd.testing.assert_frame_equal(subset['macd'], full['macd'])
+        
+        last = calculator.calculate_last(sample_stock_data, names=('ma', 'kdj'))
+        expected = {**full['ma'].iloc[-1], **full['kdj'].iloc[-1]}
+        assert set(last) == set(expected)
+        for name, value in expected.items():
+            assert last[name] == pytest.approx(value, rel=1e-12)
 
 
 class TestChartPlotter:
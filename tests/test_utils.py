@@ -6,8 +6,8 @@
 import pytest
 from datetime import datetime
 from src.core.utils import (
-    format_date, validate_stock_code, get_next_trading_date,
-    format_number, get_trading_days_count
+    format_date, validate_stock_code, validate_stock_codes, get_next_trading_date,
+    format_number, get_trading_days_count, get_today
 )
 
 
@@ -32,6 +32,14 @@ class TestFormatDate:
         assert format_date(None) is None
 
 
+class TestGetToday:
+    """测试获取当天日期"""
+    
+    def test_get_today(self):
+        """测试返回YYYYMMDD格式的当天日期"""
+        assert get_today() == datetime.now().strftime('%Y%m%d')
+
+
 class TestValidateStockCode:
     """测试股票代码验证"""
     
@@ -53,6 +61,13 @@ class TestValidateStockCode:
         """测试无效代码"""
         assert validate_stock_code('12345.SZ') == False
         assert validate_stock_code('abc.SZ') == False
+    
+    def test_validate_stock_codes_batch(self):
+        """测试批量验证"""
+        codes = ['002352.SZ', '600519.SH', '002352', '002352.BJ', '12345.SZ', '600519.SH\n', None]
+        result = validate_stock_codes(codes)
+        assert result.tolist() == [True, True, False, False, False, False, False]
+        assert result.tolist() == [validate_stock_code(code) for code in codes]
 
 
 class TestGetNextTradingDate: